@@ -11,10 +11,20 @@ from lsst.ts.wep.Utility import getModulePath
 # Get the path of module
 modulePath = getModulePath(startIdx=0)
 
+# Build with OpenMP to let the kernels use multiple threads. Set the environment variable 
+# WEP_USE_OPENMP=0 for the compiler without OpenMP support. The number of threads is set 
+# by cyMath.setNumThreads() at run time.
+if (os.environ.get("WEP_USE_OPENMP", "1") != "0"):
+    openmpArgs = ["-fopenmp"]
+else:
+    openmpArgs = []
+
 extension = Extension(
            "cyMath",
            sources = [os.path.join(modulePath, "python", "lsst", "ts", "wep", "cwfs", "include", "cyMath.pyx")], 
            include_dirs = [numpy.get_include()], # Use numpy
+           extra_compile_args = openmpArgs,
+           extra_link_args = openmpArgs,
 )
 
 setup(
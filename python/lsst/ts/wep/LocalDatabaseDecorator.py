@@ -32,6 +32,11 @@ class LocalDatabaseDecorator(LocalDatabase):
         # Commit the change to database
         self.connection.commit()
 
+        # Create the spatial index of (ra, decl) for the box query and the unique index to 
+        # ignore the repeated stars in the insertion
+        self.createSpatialIndex(tableName)
+        self.createUniqueIndex(tableName)
+
     def insertDataByFile(self, aFilter, tableName, skyFilePath, skiprows=1):
         """
         
@@ -50,22 +55,17 @@ class LocalDatabaseDecorator(LocalDatabase):
         self.__checkFilterType(aFilter)
 
         # Get the data
-        skyData = np.loadtxt(skyFilePath, skiprows=skiprows)
-
-        # Add the star
-        command = "Insert"
-        for ii in range(len(skyData)):
-
-            # Insert data
-            command = "INSERT INTO " + tableName + \
-                      " (simobjid, ra, decl, " + aFilter + "mag, bright_star) " + \
-                      "VALUES (?, ?, ?, ?, ?)"
-
-            simobjID, ra, decl, mag = skyData[ii]
+        skyData = np.loadtxt(skyFilePath, skiprows=skiprows, ndmin=2)
 
-            task = (int(simobjID), ra, decl, mag, 0)
+        # Add the stars in a single transaction. The repeated star is ignored if the table has 
+        # the unique index.
+        command = "INSERT OR IGNORE INTO " + tableName + \
+                  " (simobjid, ra, decl, " + aFilter + "mag, bright_star) " + \
+                  "VALUES (?, ?, ?, ?, 0)"
 
-            self.cursor.execute(command, task)
+        taskList = zip(skyData[:, 0].astype(int).tolist(), skyData[:, 1].tolist(), 
+                       skyData[:, 2].tolist(), skyData[:, 3].tolist())
+        self.cursor.executemany(command, taskList)
 
         # Commit the change to database
         self.connection.commit()
@@ -79,7 +79,9 @@ class LocalDatabaseDecorator(LocalDatabase):
             tableName {[str]} -- Table name.
         """
         
-        # Delete the table
+        # Delete the spatial index and table
+        self.dropSpatialIndex(tableName)
+
         command = "DROP TABLE IF EXISTS %s" % tableName
         self.cursor.execute(command)
 
@@ -154,6 +156,7 @@ class LocalDatabaseDecoratorTest(unittest.TestCase):
 
         self.db.createTable(aFilter, tableName)
         self.assertTrue(self.db.checkTableInDb(tableName))
+        self.assertTrue(self.db.hasSpatialIndex(tableName))
 
         try:
             self.db.createTable(aFilter, tableName)
@@ -164,8 +167,14 @@ class LocalDatabaseDecoratorTest(unittest.TestCase):
         skyFilePath = os.path.join(self.modulePath, "test", "skyComCamInfo.txt")
         self.db.insertDataByFile(aFilter, tableName, skyFilePath)
 
+        # The repeated stars are ignored
+        self.db.insertDataByFile(aFilter, tableName, skyFilePath)
+        self.db.cursor.execute("SELECT COUNT(*) FROM %s" % tableName)
+        self.assertEqual(self.db.cursor.fetchall()[0][0], 4)
+
         self.db.deleteTable(tableName)
         self.assertFalse(self.db.checkTableInDb(tableName))
+        self.assertFalse(self.db.hasSpatialIndex(tableName))
 
 if __name__ == "__main__":
 
@@ -577,6 +577,10 @@ class SourceProcessor(object):
         # Get all files in the image directory in a sorted order
         fileList = sorted(os.listdir(imageFolderPath))
 
+        # Use the binary stamp (".npy") instead of the text file if both exist
+        npyFileNameSet = set([os.path.splitext(afile)[0] for afile in fileList 
+                              if afile.endswith(".npy")])
+
         # Get the available donut files
         intraFileList = []
         extraFileList = []
@@ -584,6 +588,8 @@ class SourceProcessor(object):
 
             # Get the file name
             fileName, fileExtension = os.path.splitext(afile)
+            if (fileExtension != ".npy" and fileName in npyFileNameSet):
+                continue
 
             # Split the file name for the analysis
             fileNameStr = fileName.split("_")
@@ -1,10 +1,12 @@
-import os, unittest
+import os, shutil, tempfile, unittest
 import numpy as np
+from multiprocessing import Pool
 from astropy.io.fits import getheader
 
 from lsst.sims.utils import ObservationMetaData
 
 from lsst.ts.wep.bsc.BrightStarDatabase import BrightStarDatabase
+from lsst.ts.wep.bsc.BscManifest import BscManifest
 from lsst.ts.wep.bsc.CameraData import LsstCamera, ComCam 
 from lsst.ts.wep.bsc.Filter import Filter
 from lsst.ts.wep.LocalDatabaseDecorator import LocalDatabaseDecorator
@@ -27,6 +29,7 @@ class SourceSelector(object):
         self.db = None
         self.tableName = None
         self.name = None
+        self.dbInfo = None
 
         self.camera = None
         self.cameraMJD = None
@@ -125,6 +128,9 @@ class SourceSelector(object):
 
         self.db.connect(*kwargs)
 
+        # Keep the information to connect the database in the worker process
+        self.dbInfo = kwargs
+
     def disconnect(self):
         """
         
@@ -201,7 +207,7 @@ class SourceSelector(object):
             stars = self.db.query(tableName, cameraFilter, wavefrontSensor[0], wavefrontSensor[1], 
                                     wavefrontSensor[2], wavefrontSensor[3])
 
-            starsQueried = len(stars.RA)
+            starsQueried = stars.getNumOfStar()
             print("\t\tStars queried: %d" % starsQueried)
 
             # Populate detector information for the stars
@@ -214,7 +220,7 @@ class SourceSelector(object):
             self.camera.removeStarsNotOnDetectorSimple(stars, obs, offset)
             starMap[detector] = stars
 
-            starsOnDetector = len(stars.RA)
+            starsOnDetector = stars.getNumOfStar()
             print("\t\tStars on detector: %d" % starsOnDetector)
 
             # Check the candidate of bright stars based on the magnitude
@@ -276,7 +282,7 @@ class SourceSelector(object):
         for detector, singleNeighborStarMap in neighborStarMap.items():
             self.db.insertData(self.getFilter(), singleNeighborStarMap)
 
-    def generateBSC(self, localDb):
+    def generateBSC(self, localDb, raRange=(0, 360), decRange=(-90, 90), delta=0.2, tableName=None):
         """
         
         Generate the bright star catalog.
@@ -284,26 +290,22 @@ class SourceSelector(object):
         Arguments:
             localDb {[database]} -- Local database to put the bright star catalog.
         
+        Keyword Arguments:
+            raRange {[tuple]} -- Range of boresight RA in degree. (default: {(0, 360)})
+            decRange {[tuple]} -- Range of boresight Dec in degree. (default: {(-90, 90)})
+            delta {[float]} -- Step of boresight in degree. (default: {0.2})
+            tableName {[str]} -- Table name to query. The local database can be the source 
+                                 if this is given. (default: {None})
+        
         Raises:
             ValueError -- Not remote UW database.
             TypeError -- Not ComCam type camera.
         """
 
-        # Check the database is the UW database or not
-        if (self.name != self.UWdb):
-            raise ValueError("Can not generate BSC from '%s'." % self.name)
-
-        # Check the camera is comcam or not
-        if (not isinstance(self.camera, ComCam)):
-            raise TypeError("Camera should be ComCam type.")
+        self.__checkBscSource(tableName)
 
         # Boresight (unit: degree)
-        delta = 0.2
-        RaArray = np.arange(0, 360, delta)
-        DecArray = np.append(np.arange(-90, 90, delta), 90)
-
-        # Set the rotation angle
-        cameraRotation = 0.0
+        RaArray, DecArray = self.__getPointingGrid(raRange, decRange, delta)
 
         # Set the filter in localDb to be the same as the remote UW database
         localDb.setFilter(self.getFilter())
@@ -312,13 +314,213 @@ class SourceSelector(object):
         for RA in RaArray:
             for Dec in DecArray:
                 # Do the query
-                neighborStarMap, starMap, wavefrontSensors = self.getTargetStar((RA, Dec), cameraRotation, 
+                neighborStarMap, starMap, wavefrontSensors = self.getTargetStar((RA, Dec), 0.0, 
                                                                                 orientation="center", 
-                                                                                offset=self.maxDistance)
+                                                                                offset=self.maxDistance, 
+                                                                                tableName=tableName)
 
                 # Write data into the local database
                 localDb.insertToBSC(neighborStarMap)
 
+    def generateBSCSharded(self, localDb, workDir, numOfProc=1, numOfRaPerTile=5, raRange=(0, 360), 
+                           decRange=(-90, 90), delta=0.2, tableName=None):
+        """
+        
+        Generate the bright star catalog by the tiles of sky in parallel. Each tile is a strip 
+        of boresight RA with all boresight Dec. The result of each tile is saved in the working 
+        directory and merged into the local database in the order of RA, so the catalog is 
+        the same as generateBSC(). The generation resumes from the progress in the working 
+        directory and the tiles merged into the local database already.
+        
+        Arguments:
+            localDb {[SourceSelector]} -- Local database to put the bright star catalog.
+            workDir {[str]} -- Working directory to keep the progress and result of tiles.
+        
+        Keyword Arguments:
+            numOfProc {[int]} -- Number of processes. (default: {1})
+            numOfRaPerTile {[int]} -- Number of boresight RA in a tile. (default: {5})
+            raRange {[tuple]} -- Range of boresight RA in degree. (default: {(0, 360)})
+            decRange {[tuple]} -- Range of boresight Dec in degree. (default: {(-90, 90)})
+            delta {[float]} -- Step of boresight in degree. (default: {0.2})
+            tableName {[str]} -- Table name to query. The local database can be the source 
+                                 if this is given. (default: {None})
+        
+        Returns:
+            [int] -- Number of inserted stars.
+        
+        Raises:
+            ValueError -- Not remote UW database.
+            TypeError -- Not ComCam type camera.
+            ValueError -- Not local database to put the bright star catalog.
+        """
+
+        self.__checkBscSource(tableName)
+
+        # Check the database to put the catalog is the local database or not
+        if (localDb.name != self.LocalDb):
+            raise ValueError("Can not insert data into '%s'." % localDb.name)
+
+        # Boresight (unit: degree)
+        RaArray, DecArray = self.__getPointingGrid(raRange, decRange, delta)
+
+        # Split the sky into the strips of RA
+        taskList = []
+        for ii in range(0, len(RaArray), int(numOfRaPerTile)):
+            raList = RaArray[ii:ii+int(numOfRaPerTile)]
+            tileId = "%09.4f_%09.4f" % (raList[0], raList[-1])
+            taskList.append((tileId, raList, DecArray))
+
+        tileIdList = [task[0] for task in taskList]
+
+        # Set the filter in localDb to be the same as the remote UW database
+        cameraFilter = self.getFilter()
+        localDb.setFilter(cameraFilter)
+
+        # Open the progress manifest
+        config = {"cameraType": self.camera.name, "dbType": self.name, "filter": cameraFilter, 
+                  "cameraMJD": self.cameraMJD, "maxDistance": self.maxDistance, 
+                  "maxNeighboringStar": self.maxNeighboringStar, "tableName": tableName, 
+                  "raRange": raRange, "decRange": decRange, "delta": delta, 
+                  "numOfRaPerTile": numOfRaPerTile}
+        manifest = BscManifest(workDir)
+        manifest.open(config, tileIdList)
+
+        # The tiles in local database are merged already
+        mergedTileSet = localDb.db.getMergedTile(cameraFilter)
+        unprocessedTileSet = set(manifest.getUnprocessedTile(skipTileSet=mergedTileSet))
+        unprocessedTaskList = [task for task in taskList if task[0] in unprocessedTileSet]
+
+        # Merge the tiles processed in the previous run
+        mergeIndex, numOfStar = self.__mergeBscTile(localDb, manifest, tileIdList, 0, mergedTileSet)
+
+        # Process the tiles
+        pool = None
+        if (numOfProc > 1 and len(unprocessedTaskList) > 1):
+            workerConfig = dict(config, dbInfo=self.dbInfo)
+            pool = Pool(int(numOfProc), initializer=_initBscWorker, initargs=(workerConfig,))
+            resultIter = pool.imap_unordered(_processBscTile, unprocessedTaskList)
+        else:
+            resultIter = ((task[0], self.getNeighborStarOfTile(task[1], task[2], tableName=tableName)) 
+                          for task in unprocessedTaskList)
+
+        try:
+            for tileId, neighborStarMapList in resultIter:
+                manifest.saveTileResult(tileId, neighborStarMapList)
+
+                # Merge the processed tiles in order
+                mergeIndex, numOfStarMerged = self.__mergeBscTile(localDb, manifest, tileIdList, 
+                                                                  mergeIndex, mergedTileSet)
+                numOfStar += numOfStarMerged
+        finally:
+            if (pool is not None):
+                pool.terminate()
+                pool.join()
+
+        return numOfStar
+
+    def getNeighborStarOfTile(self, raList, decList, tableName=None):
+        """
+        
+        Get the neighboring stars of boresights in a tile of sky to generate the bright star 
+        catalog.
+        
+        Arguments:
+            raList {[list]} -- Boresight RA in degree.
+            decList {[list]} -- Boresight Dec in degree.
+        
+        Keyword Arguments:
+            tableName {[str]} -- Table name to query. (default: {None})
+        
+        Returns:
+            [list] -- Neighboring stars (NeighboringStar) in the order of RA, Dec, and detector.
+        """
+
+        neighborStarMapList = []
+        for RA in raList:
+            for Dec in decList:
+                neighborStarMap = self.getTargetStar((RA, Dec), 0.0, orientation="center", 
+                                                     offset=self.maxDistance, tableName=tableName)[0]
+                neighborStarMapList.extend(neighborStarMap.values())
+
+        return neighborStarMapList
+
+    def __mergeBscTile(self, localDb, manifest, tileIdList, mergeIndex, mergedTileSet):
+        """
+        
+        Merge the processed tiles into the local database in order until the first tile not 
+        processed yet.
+        
+        Arguments:
+            localDb {[SourceSelector]} -- Local database to put the bright star catalog.
+            manifest {[BscManifest]} -- Progress manifest.
+            tileIdList {[list]} -- Tile IDs in the order to merge.
+            mergeIndex {[int]} -- Index of the next tile to merge.
+            mergedTileSet {[set]} -- Tiles merged into the local database already.
+        
+        Returns:
+            [int] -- Index of the next tile to merge.
+            [int] -- Number of inserted stars.
+        """
+
+        numOfStar = 0
+        while (mergeIndex < len(tileIdList)):
+
+            tileId = tileIdList[mergeIndex]
+            if (tileId not in mergedTileSet):
+                if (not manifest.isProcessed(tileId)):
+                    break
+
+                # Insert the tile and record it as merged in a single transaction
+                numOfStar += localDb.db.insertDataList(localDb.getFilter(), 
+                                                       manifest.loadTileResult(tileId), tileId=tileId)
+                mergedTileSet.add(tileId)
+
+            mergeIndex += 1
+
+        return mergeIndex, numOfStar
+
+    def __checkBscSource(self, tableName):
+        """
+        
+        Check the source to generate the bright star catalog.
+        
+        Arguments:
+            tableName {[str]} -- Table name to query.
+        
+        Raises:
+            ValueError -- Not remote UW database.
+            TypeError -- Not ComCam type camera.
+        """
+
+        # Check the database is the UW database or not. The local database can be used as 
+        # the stand-in of UW database with the table name.
+        if (self.name != self.UWdb) and not (self.name == self.LocalDb and tableName is not None):
+            raise ValueError("Can not generate BSC from '%s'." % self.name)
+
+        # Check the camera is comcam or not
+        if (not isinstance(self.camera, ComCam)):
+            raise TypeError("Camera should be ComCam type.")
+
+    def __getPointingGrid(self, raRange, decRange, delta):
+        """
+        
+        Get the boresights to generate the bright star catalog.
+        
+        Arguments:
+            raRange {[tuple]} -- Range of boresight RA in degree.
+            decRange {[tuple]} -- Range of boresight Dec in degree.
+            delta {[float]} -- Step of boresight in degree.
+        
+        Returns:
+            [ndarray] -- Boresight RA in degree.
+            [ndarray] -- Boresight Dec in degree.
+        """
+
+        RaArray = np.arange(raRange[0], raRange[1], delta)
+        DecArray = np.append(np.arange(decRange[0], decRange[1], delta), decRange[1])
+
+        return RaArray, DecArray
+
     def searchRaDecl(self, ra, decl):
         """
         
@@ -485,6 +687,47 @@ class SourceSelector(object):
             if (trimmedCandidateStarNum != 0):
                 print("Trimmed candidate stars on %s: %d." % (detector, trimmedCandidateStarNum))
 
+# Source selector of worker process to generate the bright star catalog
+_bscWorker = None
+
+def _initBscWorker(config):
+    """
+    
+    Initialize the worker process to generate the bright star catalog.
+    
+    Arguments:
+        config {[dict]} -- Configuration of source selector from generateBSCSharded().
+    """
+
+    global _bscWorker
+
+    selector = SourceSelector()
+    selector.configSelector(cameraType=config["cameraType"], dbType=config["dbType"], 
+                            aFilter=config["filter"], cameraMJD=config["cameraMJD"])
+    selector.connect(*config["dbInfo"])
+    selector.maxDistance = config["maxDistance"]
+    selector.maxNeighboringStar = config["maxNeighboringStar"]
+
+    _bscWorker = (selector, config["tableName"])
+
+def _processBscTile(task):
+    """
+    
+    Get the neighboring stars of a tile of sky in the worker process.
+    
+    Arguments:
+        task {[tuple]} -- Tile ID, boresight RA, and boresight Dec.
+    
+    Returns:
+        [str] -- Tile ID.
+        [list] -- Neighboring stars (NeighboringStar) of tile.
+    """
+
+    tileId, raList, decList = task
+    selector, tableName = _bscWorker
+
+    return tileId, selector.getNeighborStarOfTile(raList, decList, tableName=tableName)
+
 def calcPixPos(fitsFilePath, raList, decList, extLayer=0):
     """
     
@@ -664,6 +907,79 @@ class SourceSelectorTest(unittest.TestCase):
         xPosList, yPosList = calcPixPos(fitsFilePath, raList, decList)
         self.assertEqual((xPosList[0], yPosList[0]), (2000, 2036))
 
+class SourceSelectorBscTest(unittest.TestCase):
+    """
+    Test the generation of bright star catalog with the local database as the stand-in of 
+    remote UW database.
+    """
+
+    def setUp(self):
+
+        self.workDir = tempfile.mkdtemp()
+
+        # Use the stars in the test database as the source
+        srcDbAdress = os.path.join(self.workDir, "src.db3")
+        shutil.copy(os.path.join(getModulePath(), "test", "bsc.db3"), srcDbAdress)
+
+        self.srcDb = SourceSelector()
+        self.srcDb.configSelector(cameraType="comcam", dbType="LocalDb", aFilter="u")
+        self.srcDb.connect(srcDbAdress)
+        self.srcDb.configNbrCriteria(63, 2.5, maxNeighboringStar=99)
+
+        # Local databases to put the bright star catalog
+        self.serialDb = self.__createLocalDb("serial.db3")
+        self.shardedDb = self.__createLocalDb("sharded.db3")
+
+    def __createLocalDb(self, fileName):
+
+        localDb = SourceSelector()
+        localDb.configSelector(cameraType="comcam", dbType="LocalDb", aFilter="u")
+        localDb.connect(os.path.join(self.workDir, fileName))
+        localDb.db.createTable("u", "BrightStarCatalogU")
+
+        return localDb
+
+    def tearDown(self):
+
+        # Disconnect database
+        for db in (self.srcDb, self.serialDb, self.shardedDb):
+            db.disconnect()
+
+        shutil.rmtree(self.workDir)
+
+    def testGenerateBSCSharded(self):
+
+        # Boresights of (RA, Dec) = (0.2-0.8, 30-30.4) degree
+        kwargs = {"raRange": (0.2, 1.0), "decRange": (30, 30.4), "delta": 0.2, 
+                  "tableName": "BrightStarCatalogU"}
+
+        self.srcDb.generateBSC(self.serialDb, **kwargs)
+
+        tileDir = os.path.join(self.workDir, "tile")
+        numOfStar = self.srcDb.generateBSCSharded(self.shardedDb, tileDir, numOfProc=2, 
+                                                  numOfRaPerTile=1, **kwargs)
+
+        # The catalog is the same as the serial generation
+        command = "SELECT id, simobjid, ra, decl, umag, bright_star FROM BrightStarCatalogU"
+        serialData = self.serialDb.db.cursor.execute(command).fetchall()
+        shardedData = self.shardedDb.db.cursor.execute(command).fetchall()
+        self.assertGreater(len(serialData), 0)
+        self.assertEqual(numOfStar, len(serialData))
+        self.assertEqual(shardedData, serialData)
+        self.assertEqual(len(self.shardedDb.db.getMergedTile("u")), 4)
+
+        # Nothing to do in the rerun
+        numOfStar = self.srcDb.generateBSCSharded(self.shardedDb, tileDir, numOfProc=2, 
+                                                  numOfRaPerTile=1, **kwargs)
+        self.assertEqual(numOfStar, 0)
+
+        # The manifest can not be used for the different configuration
+        self.assertRaises(ValueError, self.srcDb.generateBSCSharded, self.shardedDb, tileDir, 
+                          numOfRaPerTile=2, **kwargs)
+
+        # The local database needs the table name to be the source
+        self.assertRaises(ValueError, self.srcDb.generateBSC, self.serialDb)
+
 if __name__ == "__main__":
 
     # Do the unit test
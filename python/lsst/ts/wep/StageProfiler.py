@@ -0,0 +1,401 @@
+import os, time, json, tracemalloc, unittest
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+class StageProfiler(object):
+
+    def __init__(self, traceMemory=False):
+        """
+
+        Initialize the StageProfiler class. The profiler records the wall time, CPU time,
+        and call count of each stage in the wavefront estimation pipeline (WEP). The stages
+        run under a donut are also recorded for that donut.
+
+        Keyword Arguments:
+            traceMemory {[bool]} -- Record the peak memory of each stage by tracemalloc. It
+                                    slows down the allocations and needs python 3.9 or
+                                    later. (default: {False})
+        """
+
+        self.stageMap = OrderedDict()
+        self.donutMap = OrderedDict()
+        self.donutId = None
+
+        self.traceMemory = traceMemory
+
+        # Traced memory in byte of the stages in progress: [memory at start, peak]
+        self.memoryStack = []
+
+    def reset(self):
+        """
+
+        Reset the records.
+        """
+
+        self.stageMap = OrderedDict()
+        self.donutMap = OrderedDict()
+        self.donutId = None
+        self.memoryStack = []
+
+    def record(self, stageName, wallTime, cpuTime, peakMemKb=None):
+        """
+
+        Record a call of stage.
+
+        Arguments:
+            stageName {[str]} -- Stage name.
+            wallTime {[float]} -- Wall time in second.
+            cpuTime {[float]} -- CPU time of process in second.
+
+        Keyword Arguments:
+            peakMemKb {[float]} -- Peak traced memory in kB allocated during the call above
+                                   the memory at its start. None if the memory is not
+                                   traced. (default: {None})
+        """
+
+        recordMapList = [self.stageMap]
+        if (self.donutId is not None):
+            recordMapList.append(self.donutMap.setdefault(self.donutId, OrderedDict()))
+
+        for recordMap in recordMapList:
+            self.__addStat(recordMap, stageName, {"count": 1, "wallTime": wallTime,
+                                                  "cpuTime": cpuTime, "peakMemKb": peakMemKb})
+
+    def merge(self, profiler):
+        """
+
+        Merge the records of another profiler such as the one in the worker process.
+
+        Arguments:
+            profiler {[StageProfiler]} -- Profiler to merge.
+        """
+
+        for stageName, stat in profiler.stageMap.items():
+            self.__addStat(self.stageMap, stageName, stat)
+
+        for donutId, stageMap in profiler.donutMap.items():
+            recordMap = self.donutMap.setdefault(donutId, OrderedDict())
+            for stageName, stat in stageMap.items():
+                self.__addStat(recordMap, stageName, stat)
+
+    def __addStat(self, recordMap, stageName, stat):
+        """
+
+        Add the statistics of stage to the records.
+
+        Arguments:
+            recordMap {[OrderedDict]} -- Records of stages.
+            stageName {[str]} -- Stage name.
+            stat {[dict]} -- Statistics of stage.
+        """
+
+        statRecord = recordMap.setdefault(stageName, {"count": 0, "wallTime": 0.0,
+                                                      "cpuTime": 0.0, "peakMemKb": None})
+        statRecord["count"] += stat["count"]
+        statRecord["wallTime"] += stat["wallTime"]
+        statRecord["cpuTime"] += stat["cpuTime"]
+
+        if (stat["peakMemKb"] is not None):
+            if (statRecord["peakMemKb"] is None):
+                statRecord["peakMemKb"] = stat["peakMemKb"]
+            else:
+                statRecord["peakMemKb"] = max(statRecord["peakMemKb"], stat["peakMemKb"])
+
+    def startMemoryScope(self):
+        """
+
+        Start to trace the peak memory of a stage. The peak of the stage in progress is kept
+        before the peak of tracemalloc is reset for the new stage.
+        """
+
+        current, peak = tracemalloc.get_traced_memory()
+        if (self.memoryStack):
+            self.memoryStack[-1][1] = max(self.memoryStack[-1][1], peak)
+
+        tracemalloc.reset_peak()
+        self.memoryStack.append([current, current])
+
+    def stopMemoryScope(self):
+        """
+
+        Stop to trace the peak memory of the latest stage.
+
+        Returns:
+            [float] -- Peak memory in kB above the memory at the start of stage.
+        """
+
+        peak = tracemalloc.get_traced_memory()[1]
+        start, peakBefore = self.memoryStack.pop()
+        peak = max(peak, peakBefore)
+
+        # The peak of nested stage is the peak of outer stage as well
+        if (self.memoryStack):
+            self.memoryStack[-1][1] = max(self.memoryStack[-1][1], peak)
+
+        return (peak-start)/1024
+
+    def toDict(self):
+        """
+
+        Get the records in a dictionary.
+
+        Returns:
+            [dict] -- Records of stages ("stage") and donuts ("donut").
+        """
+
+        donutMap = OrderedDict([(str(donutId), stageMap)
+                                for donutId, stageMap in self.donutMap.items()])
+
+        return {"stage": self.stageMap, "donut": donutMap}
+
+    def writeJson(self, filePath):
+        """
+
+        Write the records to a JSON file.
+
+        Arguments:
+            filePath {[str]} -- Path of JSON file.
+        """
+
+        with open(filePath, "w") as fid:
+            json.dump(self.toDict(), fid, indent=2)
+
+# Profiler in use. The stages are not recorded if it is None.
+_profiler = None
+
+# tracemalloc is started by enableProfiler() or not
+_isTracemallocStarted = False
+
+# tracemalloc.reset_peak() to trace the peak memory of each stage needs python 3.9
+_isPeakMemorySupported = hasattr(tracemalloc, "reset_peak")
+
+def enableProfiler(profiler=None):
+    """
+
+    Enable the recording of stages.
+
+    Keyword Arguments:
+        profiler {[StageProfiler]} -- Profiler to record the stages. A new one is used if
+                                      None. (default: {None})
+
+    Returns:
+        [StageProfiler] -- Profiler in use.
+    """
+
+    global _profiler, _isTracemallocStarted
+    _profiler = StageProfiler() if (profiler is None) else profiler
+
+    if (_profiler.traceMemory and _isPeakMemorySupported and not tracemalloc.is_tracing()):
+        tracemalloc.start()
+        _isTracemallocStarted = True
+
+    return _profiler
+
+def disableProfiler():
+    """
+
+    Disable the recording of stages.
+
+    Returns:
+        [StageProfiler] -- Profiler used before. None if there is no profiler.
+    """
+
+    global _profiler, _isTracemallocStarted
+    profiler = _profiler
+    _profiler = None
+
+    if (_isTracemallocStarted):
+        tracemalloc.stop()
+        _isTracemallocStarted = False
+
+    return profiler
+
+def getProfiler():
+    """
+
+    Get the profiler in use.
+
+    Returns:
+        [StageProfiler] -- Profiler in use. None if the recording is disabled.
+    """
+
+    return _profiler
+
+@contextmanager
+def stageScope(stageName):
+    """
+
+    Record the block of code as a stage.
+
+    Arguments:
+        stageName {[str]} -- Stage name.
+    """
+
+    profiler = _profiler
+    if (profiler is None):
+        yield
+        return
+
+    traceMemory = (profiler.traceMemory and _isPeakMemorySupported and
+                   tracemalloc.is_tracing())
+    if (traceMemory):
+        profiler.startMemoryScope()
+
+    wallTime = time.perf_counter()
+    cpuTime = time.process_time()
+    try:
+        yield
+    finally:
+        wallTime = time.perf_counter() - wallTime
+        cpuTime = time.process_time() - cpuTime
+        peakMemKb = profiler.stopMemoryScope() if (traceMemory) else None
+        profiler.record(stageName, wallTime, cpuTime, peakMemKb=peakMemKb)
+
+@contextmanager
+def donutScope(donutId):
+    """
+
+    Record the stages in the block of code for the donut as well.
+
+    Arguments:
+        donutId {[int]} -- Donut Id such as the star Id.
+    """
+
+    profiler = _profiler
+    if (profiler is None):
+        yield
+        return
+
+    preDonutId = profiler.donutId
+    profiler.donutId = donutId
+    try:
+        yield
+    finally:
+        profiler.donutId = preDonutId
+
+def profileStage(stageName):
+    """
+
+    Decorator to record the function as a stage. There is only a check of profiler if
+    the recording is disabled.
+
+    Arguments:
+        stageName {[str]} -- Stage name.
+
+    Returns:
+        [function] -- Decorator.
+    """
+
+    def decorator(func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if (_profiler is None):
+                return func(*args, **kwargs)
+
+            with stageScope(stageName):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class StageProfilerTest(unittest.TestCase):
+    """
+    Test functions in StageProfiler.
+    """
+
+    def tearDown(self):
+
+        disableProfiler()
+
+    def testFunc(self):
+
+        @profileStage("sleep")
+        def sleep(second):
+            time.sleep(second)
+            return second
+
+        # No record if the profiler is disabled
+        self.assertEqual(getProfiler(), None)
+        self.assertEqual(sleep(0), 0)
+
+        # Record the stages
+        profiler = enableProfiler()
+        self.assertEqual(getProfiler(), profiler)
+
+        sleep(0.01)
+        with donutScope(3):
+            sleep(0.01)
+            with stageScope("block"):
+                sleep(0)
+
+        stat = profiler.stageMap["sleep"]
+        self.assertEqual(stat["count"], 3)
+        self.assertGreaterEqual(stat["wallTime"], 0.02)
+        self.assertEqual(stat["peakMemKb"], None)
+        self.assertEqual(profiler.donutMap[3]["sleep"]["count"], 2)
+        self.assertEqual(profiler.donutMap[3]["block"]["count"], 1)
+        self.assertEqual(profiler.donutId, None)
+
+        # Export the records to JSON
+        filePath = "stageProfiler.json"
+        profiler.writeJson(filePath)
+        with open(filePath) as fid:
+            record = json.load(fid)
+        os.remove(filePath)
+        self.assertEqual(record["donut"]["3"]["block"]["count"], 1)
+        self.assertEqual(record["stage"]["sleep"]["count"], 3)
+
+        # Stop the recording
+        self.assertEqual(disableProfiler(), profiler)
+        sleep(0)
+        self.assertEqual(profiler.stageMap["sleep"]["count"], 3)
+
+        profiler.reset()
+        self.assertEqual(len(profiler.stageMap), 0)
+
+    @unittest.skipUnless(_isPeakMemorySupported, "tracemalloc.reset_peak() needs python 3.9.")
+    def testTraceMemory(self):
+
+        profiler = enableProfiler(StageProfiler(traceMemory=True))
+        self.assertTrue(tracemalloc.is_tracing())
+
+        # The peak of inner stage is in the outer stage as well
+        with stageScope("outer"):
+            with stageScope("inner"):
+                data = bytearray(1024*1024)
+                del data
+            with stageScope("small"):
+                data = bytearray(1024)
+                del data
+
+        self.assertGreaterEqual(profiler.stageMap["inner"]["peakMemKb"], 1024)
+        self.assertGreaterEqual(profiler.stageMap["outer"]["peakMemKb"], 1024)
+        self.assertLess(profiler.stageMap["small"]["peakMemKb"], 1024)
+
+        disableProfiler()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def testMerge(self):
+
+        profiler = StageProfiler()
+        profiler.record("stage", 1.0, 0.5)
+
+        profilerWorker = StageProfiler()
+        profilerWorker.donutId = 2
+        profilerWorker.record("stage", 2.0, 1.0, peakMemKb=10.0)
+
+        profiler.merge(profilerWorker)
+        stat = profiler.stageMap["stage"]
+        self.assertEqual(stat["count"], 2)
+        self.assertEqual(stat["wallTime"], 3.0)
+        self.assertEqual(stat["cpuTime"], 1.5)
+        self.assertEqual(stat["peakMemKb"], 10.0)
+        self.assertEqual(profiler.donutMap[2]["stage"]["count"], 1)
+
+if __name__ == "__main__":
+
+    # Do the unit test
+    unittest.main()
@@ -1,4 +1,5 @@
 import os, re, time, unittest
+from multiprocessing import Pool
 import numpy as np
 
 import matplotlib
@@ -17,6 +18,8 @@ from lsst.ts.wep.WFEstimator import WFEstimator
 from lsst.ts.wep.DefocalImage import DefocalImage, DonutImage
 from lsst.ts.wep.MockMiddleware import MockMiddleware as Middleware
 from lsst.ts.wep.Utility import getModulePath
+from lsst.ts.wep.StageProfiler import StageProfiler, profileStage, stageScope, donutScope, \
+                                       enableProfiler, disableProfiler, getProfiler
 
 class WEPController(object):
 
@@ -163,6 +166,7 @@ class WEPController(object):
         if (value is not None):
             setattr(self, attrName, value)
 
+    @profileStage("WEPController.getTargetStarByFile")
     def getTargetStarByFile(self, dbAdress, skyInfoFilePath, pointing, cameraRotation, 
                             orientation=None, tableName="TempTable"):
         """
@@ -249,6 +253,7 @@ class WEPController(object):
         
         return neighborStarMap, starMap, wavefrontSensors
 
+    @profileStage("WEPController.ingestSimImages")
     def ingestSimImages(self, fitsFileArg=None, dataDir=None, atype="raw", overwrite=False):
         """
         
@@ -311,6 +316,7 @@ class WEPController(object):
 
         return fileList
 
+    @profileStage("WEPController.doISR")
     def doISR(self, visit, sensorName, snap=0, fakeDatasetType="eimage", 
                 outputDatasetType="postISRCCD"):
         """
@@ -394,6 +400,7 @@ class WEPController(object):
 
         return matchFileName
 
+    @profileStage("WEPController.getPostISRDefocalImgMap")
     def getPostISRDefocalImgMap(self, sensorNameList, obsIdList=None, wfsDir=None, snap=0, expInDmCoor=False):
         """
         
@@ -498,6 +505,7 @@ class WEPController(object):
 
         return index
 
+    @profileStage("WEPController.getDonutMap")
     def getDonutMap(self, neighborStarMap, wfsImgMap, aFilter, doDeblending=False, sglDonutOnly=False):
         """
         
@@ -697,6 +705,7 @@ class WEPController(object):
 
         return masterDonut
 
+    @profileStage("WEPController.generateMasterImg")
     def generateMasterImg(self, donutMap, zcCol=np.zeros(22)):
         """
         
@@ -801,18 +810,34 @@ class WEPController(object):
         # Return the projected image
         return img.image
 
-    def calcWfErr(self, donutMap):
+    @profileStage("WEPController.calcWfErr")
+    def calcWfErr(self, donutMap, numOfProc=1):
         """
         
         Calculate the wavefront error in annular Zernike polynomials (z4-z22).
         
         Arguments:
             donutMap {[dict]} -- Donut image map.
+
+        Keyword Arguments:
+            numOfProc {[int]} -- Number of processes to calculate the wavefront error. Each 
+                                 process has a copy of configured wavefront estimator. If 
+                                 the profiler is enabled, the stages in the worker processes 
+                                 are recorded per donut and merged into the profiler of this 
+                                 process. (default: {1})
         
         Returns:
             [dict] -- Donut image map with calculated wavefront error.
+
+        Raises:
+            ValueError -- Number of processes is less than 1.
         """
 
+        if (numOfProc < 1):
+            raise ValueError("Number of processes (%d) should be >= 1." % numOfProc)
+
+        # Collect the pairs of intra- and extra-focal donuts
+        donutPairList = []
         for sensorName, donutList in donutMap.items():
 
             for ii in range(len(donutList)):
@@ -843,25 +868,60 @@ class WEPController(object):
                 else:
                     intraDonut = extraDonut = donutList[ii]
 
-                # Calculate the wavefront error
-
-                # Get the field X, Y position
-                intraFieldXY = (intraDonut.fieldX, intraDonut.fieldY)
-                extraFieldXY = (extraDonut.fieldX, extraDonut.fieldY)
+                donutPairList.append((intraDonut, extraDonut))
 
-                # Get the defocal images
-                intraImg = intraDonut.intraImg
-                extraImg = extraDonut.extraImg
+        # Get the field X, Y position and the defocal images
+        argList = []
+        for intraDonut, extraDonut in donutPairList:
+            intraFieldXY = (intraDonut.fieldX, intraDonut.fieldY)
+            extraFieldXY = (extraDonut.fieldX, extraDonut.fieldY)
+            argList.append((intraDonut.intraImg, extraDonut.extraImg, intraFieldXY, 
+                            extraFieldXY))
 
-                # Calculate the wavefront error
-                zer4UpNm = self.calcSglWfErr(intraImg, extraImg, intraFieldXY, extraFieldXY)
-
-                # Put the value to the donut image
-                intraDonut.setWfErr(zer4UpNm)
-                extraDonut.setWfErr(zer4UpNm)
+        # Calculate the wavefront error
+        if (numOfProc == 1) or (len(argList) <= 1):
+            zer4UpNmList = []
+            for (intraDonut, extraDonut), args in zip(donutPairList, argList):
+                with donutScope(intraDonut.starId):
+                    zer4UpNmList.append(self.calcSglWfErr(*args))
+        else:
+            # The workers attach to the sensor grids of instrument in the shared memory
+            # instead of constructing them again. The shared memory is reused by the later 
+            # calls and released at the exit of process.
+            self.wfsEsti.inst.shareGrid()
+
+            # The workers record the stages in their own profilers if this process does
+            profiler = getProfiler()
+            profilerWorker = None
+            if (profiler is not None):
+                profilerWorker = StageProfiler(traceMemory=profiler.traceMemory)
+
+            # The results are in the same order as the input pairs
+            workerArgList = [(intraDonut.starId,) + args 
+                             for (intraDonut, extraDonut), args in zip(donutPairList, argList)]
+            pool = Pool(processes=min(numOfProc, len(argList)), initializer=_initWfsEstiWorker, 
+                        initargs=(self.wfsEsti, profilerWorker))
+            try:
+                resultList = pool.map(_calcWfErrWorker, workerArgList)
+            finally:
+                pool.close()
+                pool.join()
+
+            zer4UpNmList = [zer4UpNm for zer4UpNm, profilerWorker in resultList]
+
+            # Merge the stages recorded in the worker processes
+            if (profiler is not None):
+                for zer4UpNm, profilerWorker in resultList:
+                    profiler.merge(profilerWorker)
+
+        # Put the value to the donut image
+        for (intraDonut, extraDonut), zer4UpNm in zip(donutPairList, zer4UpNmList):
+            intraDonut.setWfErr(zer4UpNm)
+            extraDonut.setWfErr(zer4UpNm)
 
         return donutMap
 
+    @profileStage("WEPController.calcSglWfErr")
     def calcSglWfErr(self, intraImg, extraImg, intraFieldXY, extraFieldXY):
         """
         
@@ -878,19 +938,7 @@ class WEPController(object):
             [ndarray] -- Coefficients of Zernike polynomials (z4 - z22) in nm.
         """
 
-        # Set the images
-        self.wfsEsti.setImg(intraFieldXY, image=intraImg, 
-                            defocalType=self.wfsEsti.ImgIntra.INTRA)
-        self.wfsEsti.setImg(extraFieldXY, image=extraImg, 
-                            defocalType=self.wfsEsti.ImgExtra.EXTRA)
-
-        # Reset the wavefront estimator
-        self.wfsEsti.reset()
-
-        # Calculate the wavefront error
-        zer4UpNm = self.wfsEsti.calWfsErr()
-
-        return zer4UpNm
+        return _calcSglWfErr(self.wfsEsti, intraImg, extraImg, intraFieldXY, extraFieldXY)
 
     def calcSglAvgWfErr(self, donutImgList):
         """
@@ -928,6 +976,85 @@ class WEPController(object):
         # This function is to sort the donut images in list from high S/N to low.
         pass
 
+def _calcSglWfErr(wfsEsti, intraImg, extraImg, intraFieldXY, extraFieldXY):
+    """
+    
+    Calculate the wavefront error in annular Zernike polynomials (z4-z22) for single 
+    donut by the wavefront estimator.
+    
+    Arguments:
+        wfsEsti {[WFEstimator]} -- Wavefront estimator.
+        intraImg {[ndarray]} -- Intra-focal donut image.
+        extraImg {[ndarray]} -- Extra-focal donut image.
+        intraFieldXY {[tuple]} -- Field x, y in degree of intra-focal donut image.
+        extraFieldXY {[tuple]} -- Field x, y in degree of extra-focal donut image.
+    
+    Returns:
+        [ndarray] -- Coefficients of Zernike polynomials (z4 - z22) in nm.
+    """
+
+    # Set the images
+    wfsEsti.setImg(intraFieldXY, image=intraImg, defocalType=wfsEsti.ImgIntra.INTRA)
+    wfsEsti.setImg(extraFieldXY, image=extraImg, defocalType=wfsEsti.ImgExtra.EXTRA)
+
+    # Reset the wavefront estimator
+    wfsEsti.reset()
+
+    # Calculate the wavefront error
+    return wfsEsti.calWfsErr()
+
+# Configured wavefront estimator of the worker process used in calcWfErr()
+_wfsEstiWorker = None
+
+def _initWfsEstiWorker(wfsEsti, profiler=None):
+    """
+    
+    Keep the configured wavefront estimator in the worker process.
+    
+    Arguments:
+        wfsEsti {[WFEstimator]} -- Wavefront estimator.
+    
+    Keyword Arguments:
+        profiler {[StageProfiler]} -- Profiler to record the stages in the worker process. 
+                                      The stages are not recorded if None. (default: {None})
+    """
+
+    global _wfsEstiWorker
+    _wfsEstiWorker = wfsEsti
+
+    # The profiler copied from the parent process by fork() is not used
+    if (profiler is None):
+        disableProfiler()
+    else:
+        enableProfiler(profiler)
+
+def _calcWfErrWorker(args):
+    """
+    
+    Calculate the wavefront error of single donut in the worker process.
+    
+    Arguments:
+        args {[tuple]} -- Donut ID, intra-focal donut image, extra-focal donut image, and 
+                          field x, y in degree of intra- and extra-focal donut images.
+    
+    Returns:
+        [ndarray] -- Coefficients of Zernike polynomials (z4 - z22) in nm.
+        [StageProfiler] -- Stages recorded for this donut. None if the stages are not 
+                           recorded.
+    """
+
+    donutId = args[0]
+    profiler = getProfiler()
+    if (profiler is None):
+        return _calcSglWfErr(_wfsEstiWorker, *args[1:]), None
+
+    # Only return the stages of this donut to the parent process
+    profiler.reset()
+    with donutScope(donutId), stageScope("WEPController.calcSglWfErr"):
+        zer4UpNm = _calcSglWfErr(_wfsEstiWorker, *args[1:])
+
+    return zer4UpNm, profiler
+
 def calcWeiRatio(donutImgList):
     """
     
@@ -1305,6 +1432,12 @@ class WEPControllerTest(unittest.TestCase):
         donutImg = donutList[0]
         self.assertEqual(len(donutImg.zer4UpNm), 19)
 
+        # Calculate the wavefront error by the worker processes in the same order
+        zer4UpNmList = [donut.zer4UpNm for donut in donutList]
+        partDonutMap = self.wepCntlr.calcWfErr(partDonutMap, numOfProc=2)
+        for donut, zer4UpNm in zip(partDonutMap["R:0,0 S:2,2,A"], zer4UpNmList):
+            self.assertLess(np.max(np.abs(donut.zer4UpNm-zer4UpNm)), 1e-1)
+
         # Test the weighting ratio
         weightingRatio = calcWeiRatio(donutList)
         self.assertEqual(np.sum(weightingRatio), 1)
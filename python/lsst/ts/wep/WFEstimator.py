@@ -5,6 +5,7 @@ from lsst.ts.wep.cwfs.Instrument import Instrument
 from lsst.ts.wep.cwfs.Algorithm import Algorithm
 from lsst.ts.wep.cwfs.CompensationImageDecorator import CompensationImageDecorator
 from lsst.ts.wep.Utility import getModulePath
+from lsst.ts.wep.StageProfiler import profileStage, enableProfiler, disableProfiler
 
 class WFEstimator(object):
 
@@ -41,7 +42,7 @@ class WFEstimator(object):
         
         Keyword Arguments:
             solver {[str]} -- Algorithm to solve the Poisson's equation in the transport of 
-                            intensity equation (TIE). It can be "fft" or "exp" here. 
+                            intensity equation (TIE). It can be "fft", "dct", or "exp" here. 
                             (default: {"exp"})
             instName {[str]} -- Instrument name. It is "lsst" in the baseline. (default: {"lsst"})
             opticalModel {[str]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis". 
@@ -76,7 +77,7 @@ class WFEstimator(object):
         # Configurate the instrument
         self.inst.config(instName, self.sizeInPix)
 
-        if solver not in ("exp", "fft"):
+        if solver not in ("exp", "fft", "dct"):
             raise ValueError("Poisson solver can not be '%s'." % solver)
         else:
             self.algo.config(solver, self.inst, debugLevel=debugLevel)
@@ -115,7 +116,8 @@ class WFEstimator(object):
         elif (defocalType == self.ImgIntra.EXTRA):
             self.ImgExtra.setImg(fieldXY, image=image, imageFile=imageFile, atype=defocalType)
 
-    def calWfsErr(self, tol=1e-3, showZer=False, showPlot=False):
+    @profileStage("WFEstimator.calWfsErr")
+    def calWfsErr(self, tol=1e-3, showZer=False, showPlot=False, zer4UpNmInit=None):
         """
 
         Calculate the wavefront error.
@@ -126,6 +128,10 @@ class WFEstimator(object):
             showZer {bool} -- Decide to show the annular Zernike polynomails or not. 
                                 (default: {False})
             showPlot {bool} -- Decide to show the plot or not. (default: {False})
+            zer4UpNmInit {[ndarray]} -- Prior coefficients of Zernike polynomials (z4 - z22) 
+                                        in nm to start the compensation from such as the 
+                                        result of previous visit or neighboring donut. 
+                                        (default: {None})
 
         Returns:
             [float] -- Coefficients of Zernike polynomials (z4 - z22).
@@ -138,9 +144,15 @@ class WFEstimator(object):
                 raise RuntimeError("Input image shape is (%d, %d), not required (%d, %d)" % 
                                     (d1, d2, self.sizeInPix, self.sizeInPix))
 
+        # Initial Zk coefficients (z1 - zn) in meter for the compensation
+        zcompInit = None
+        if (zer4UpNmInit is not None):
+            zcompInit = np.concatenate(([0, 0, 0], np.array(zer4UpNmInit)*1e-9))
+
         # Calculate the wavefront error.
         # Run cwfs
-        self.algo.runIt(self.inst, self.ImgIntra, self.ImgExtra, self.opticalModel, tol=tol)
+        self.algo.runIt(self.inst, self.ImgIntra, self.ImgExtra, self.opticalModel, tol=tol, 
+                        zcompInit=zcompInit)
 
         # Show the Zernikes Zn (n>=4)
         if (showZer):
@@ -148,6 +160,53 @@ class WFEstimator(object):
 
         return self.algo.zer4UpNm
 
+    @profileStage("WFEstimator.calWfsErrBatch")
+    def calWfsErrBatch(self, pairs, tol=1e-3):
+        """
+
+        Calculate the wavefront errors of multiple pairs of donut images in batch. The
+        images set by setImg() are not used and kept the same.
+
+        Arguments:
+            pairs {[list]} -- Pairs of (intra-focal image, extra-focal image, field x, y in
+                              degree of intra-focal image, field x, y in degree of
+                              extra-focal image). The images are the arrays.
+
+        Keyword Arguments:
+            tol {number} -- Tolerance of difference of coefficients of Zk polynomials compared
+                            with the previours iteration. (default: {1e-3})
+
+        Returns:
+            [ndarray] -- Coefficients of Zernike polynomials (z4 - z22) of each pair in row.
+
+        Raises:
+            RuntimeError -- Input image shape is not the required one.
+        """
+
+        # Set the images and check the image size
+        imgIntraList = []
+        imgExtraList = []
+        for intraImg, extraImg, intraFieldXY, extraFieldXY in pairs:
+            for img in (intraImg, extraImg):
+                d1, d2 = np.shape(img)
+                if (d1 != self.sizeInPix) or (d2 != self.sizeInPix):
+                    raise RuntimeError("Input image shape is (%d, %d), not required (%d, %d)" % 
+                                        (d1, d2, self.sizeInPix, self.sizeInPix))
+
+            imgIntra = CompensationImageDecorator()
+            imgIntra.setImg(intraFieldXY, image=intraImg, atype=imgIntra.INTRA)
+            imgIntraList.append(imgIntra)
+
+            imgExtra = CompensationImageDecorator()
+            imgExtra.setImg(extraFieldXY, image=extraImg, atype=imgExtra.EXTRA)
+            imgExtraList.append(imgExtra)
+
+        # Calculate the wavefront errors
+        algoList = self.algo.runItBatch(self.inst, imgIntraList, imgExtraList, 
+                                        self.opticalModel, tol=tol)
+
+        return np.array([algo.zer4UpNm for algo in algoList])
+
     def outParam(self, filename=None):
         """
 
@@ -290,6 +349,37 @@ class WFEsitmatorTest(unittest.TestCase):
         zer4UpNm = self.wfsEst.calWfsErr()
         self.assertAlmostEqual(np.sum(np.abs(zer4UpNm-np.array(wfsError))), 0, places=1)
 
+        # Evaluate the wavefront errors in batch with the same result
+        self.wfsEst.setImg(fieldXY, imageFile=intraImgFile, defocalType="intra")
+        self.wfsEst.setImg(fieldXY, imageFile=extraImgFile, defocalType="extra")
+        intraImg = self.wfsEst.ImgIntra.image.copy()
+        extraImg = self.wfsEst.ImgExtra.image.copy()
+
+        np.random.seed(0)
+        zer4UpNmBatch = self.wfsEst.calWfsErrBatch([(intraImg, extraImg, fieldXY, fieldXY)]*2)
+        self.assertEqual(zer4UpNmBatch.shape, (2, len(wfsError)))
+
+        self.wfsEst.reset()
+        np.random.seed(0)
+        zer4UpNm = self.wfsEst.calWfsErr()
+        for zer4UpNmPair in zer4UpNmBatch:
+            self.assertLess(np.max(np.abs(zer4UpNmPair-zer4UpNm)), 1e-6)
+
+        # Warm start from the prior result
+        self.wfsEst.setImg(fieldXY, image=intraImg, defocalType="intra")
+        self.wfsEst.setImg(fieldXY, image=extraImg, defocalType="extra")
+        self.wfsEst.reset()
+        profiler = enableProfiler()
+        zer4UpNmWarm = self.wfsEst.calWfsErr(tol=1, zer4UpNmInit=zer4UpNm)
+        disableProfiler()
+        self.assertLess(np.max(np.abs(zer4UpNmWarm-zer4UpNm)), 1)
+        self.assertLess(self.wfsEst.algo.currentItr, self.wfsEst.algo.parameter["outerItr"])
+
+        # The stages are recorded in the calculation
+        self.assertEqual(profiler.stageMap["WFEstimator.calWfsErr"]["count"], 1)
+        self.assertEqual(profiler.stageMap["Algorithm.solvePoissonEq"]["count"], 
+                         self.wfsEst.algo.currentItr)
+
         # Reset the wavefront images
         self.wfsEst.setImg(fieldXY, imageFile=intraImgFile, defocalType="intra")
         self.wfsEst.setImg(fieldXY, imageFile=extraImgFile, defocalType="extra")
@@ -305,6 +395,10 @@ class WFEsitmatorTest(unittest.TestCase):
         zer4UpNm = self.wfsEst.calWfsErr()
         self.assertAlmostEqual(np.sum(np.abs(zer4UpNm-np.array(wfsError))), 0, places=1)
 
+        # Change the algorithm to dct
+        self.wfsEst.config(solver="dct")
+        self.assertEqual(self.wfsEst.algo.algoName, "dct")
+
         # Test to output the parameters
         filename = "outputParameter"
         self.wfsEst.outParam(filename=filename)
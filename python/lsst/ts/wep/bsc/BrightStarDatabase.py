@@ -81,6 +81,29 @@ class BrightStarDatabase(object):
         else:                            
             return self.__queryInternal(tableName, cameraFilter, top, bottom, left, right)
 
+    def getBoxQueryCommand(self, tableName, cameraFilter, top, bottom, left, right):
+        """
+        
+        Get the SQL command to query the stars within an area.
+        
+        Arguments:
+            tableName {[string]} -- Table name in database.
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            top {[float]} -- The top edge of the box (Decl).
+            bottom {[float]} -- The bottom edge of the box (Decl).
+            left {[float]} -- The left edge of the box (RA).
+            right {[float]} -- The right edge of the box (RA).
+        
+        Returns:
+            [str] -- SQL command to get (simobjid, ra, decl, mag) of stars.
+        """
+
+        command = "SELECT simobjid, ra, decl, " + cameraFilter + "mag " + \
+                  "FROM " + tableName + \
+                  " WHERE decl <= %f AND decl >= %f AND ra >= %f AND ra <= %f"
+
+        return command % (top, bottom, left, right)
+
     def __queryInternal(self, tableName, cameraFilter, top, bottom, left, right):
         """
         
@@ -98,13 +121,8 @@ class BrightStarDatabase(object):
             [StarData] -- Star information.
         """
 
-
         # Get the lsst filter magnitudes of stars in a certain range
-        command = "SELECT simobjid, ra, decl, " + cameraFilter + "mag " + \
-                  "FROM " + tableName + \
-                  " WHERE decl <= %f AND decl >= %f AND ra >= %f AND ra <= %f"
-                
-        query = command % (top, bottom, left, right)
+        query = self.getBoxQueryCommand(tableName, cameraFilter, top, bottom, left, right)
 
         self.cursor.execute(query)
 
@@ -0,0 +1,212 @@
+import os, json, pickle, shutil, tempfile, unittest
+
+class BscManifest(object):
+
+    # File name of manifest in the working directory
+    MANIFEST_FILE_NAME = "manifest.json"
+
+    def __init__(self, workDir):
+        """
+
+        Initialize the BscManifest class. The manifest records the progress to generate the
+        bright star catalog (BSC) by the tiles of sky, and keeps the result of each processed
+        tile in the working directory to resume the generation.
+
+        Arguments:
+            workDir {[str]} -- Working directory.
+        """
+
+        self.workDir = workDir
+        self.filePath = os.path.join(workDir, self.MANIFEST_FILE_NAME)
+
+        self.config = None
+        self.tileIdList = []
+        self.processedTileSet = set()
+
+    def open(self, config, tileIdList):
+        """
+
+        Open the manifest. The existed manifest is loaded to resume the generation. Otherwise,
+        a new manifest is created.
+
+        Arguments:
+            config {[dict]} -- Configuration of generation. It should be JSON serializable.
+            tileIdList {[list]} -- IDs of tiles in the order to merge.
+
+        Raises:
+            ValueError -- The existed manifest is for the different configuration.
+        """
+
+        # Use the JSON type of configuration to compare with the existed one
+        config = json.loads(json.dumps(config))
+        tileIdList = list(tileIdList)
+
+        if (os.path.isfile(self.filePath)):
+            with open(self.filePath) as fid:
+                manifest = json.load(fid)
+
+            if (manifest["config"] != config or manifest["tileIdList"] != tileIdList):
+                raise ValueError("The manifest in '%s' is for the different configuration." %
+                                 self.workDir)
+
+            # The tile is processed only if its result exists
+            self.processedTileSet = set([tileId for tileId in manifest["processedTile"]
+                                         if os.path.isfile(self.getTileFilePath(tileId))])
+        else:
+            if (not os.path.isdir(self.workDir)):
+                os.makedirs(self.workDir)
+
+            self.processedTileSet = set()
+
+        self.config = config
+        self.tileIdList = tileIdList
+        self.__save()
+
+    def getTileFilePath(self, tileId):
+        """
+
+        Get the file path of tile result.
+
+        Arguments:
+            tileId {[str]} -- Tile ID.
+
+        Returns:
+            [str] -- File path.
+        """
+
+        return os.path.join(self.workDir, "tile_%s.pkl" % tileId)
+
+    def getUnprocessedTile(self, skipTileSet=()):
+        """
+
+        Get the tiles not processed yet.
+
+        Keyword Arguments:
+            skipTileSet {[set]} -- Tiles to skip such as the ones merged already. (default: {()})
+
+        Returns:
+            [list] -- Tile IDs in the order of manifest.
+        """
+
+        return [tileId for tileId in self.tileIdList
+                if tileId not in self.processedTileSet and tileId not in skipTileSet]
+
+    def isProcessed(self, tileId):
+        """
+
+        The tile is processed or not.
+
+        Arguments:
+            tileId {[str]} -- Tile ID.
+
+        Returns:
+            [bool] -- True if the tile is processed.
+        """
+
+        return (tileId in self.processedTileSet)
+
+    def saveTileResult(self, tileId, result):
+        """
+
+        Save the result of tile and mark the tile as processed.
+
+        Arguments:
+            tileId {[str]} -- Tile ID.
+            result {[object]} -- Result of tile. It should be picklable.
+        """
+
+        self.__writeAtomic(self.getTileFilePath(tileId), pickle.dumps(result))
+
+        self.processedTileSet.add(tileId)
+        self.__save()
+
+    def loadTileResult(self, tileId):
+        """
+
+        Load the result of tile.
+
+        Arguments:
+            tileId {[str]} -- Tile ID.
+
+        Returns:
+            [object] -- Result of tile.
+        """
+
+        with open(self.getTileFilePath(tileId), "rb") as fid:
+            return pickle.load(fid)
+
+    def __save(self):
+        """
+
+        Save the manifest.
+        """
+
+        processedTile = [tileId for tileId in self.tileIdList if tileId in self.processedTileSet]
+        manifest = {"config": self.config, "tileIdList": self.tileIdList,
+                    "processedTile": processedTile}
+
+        self.__writeAtomic(self.filePath, json.dumps(manifest, indent=2).encode())
+
+    def __writeAtomic(self, filePath, data):
+        """
+
+        Write the file by replacing it with a temporary file, so the file is not broken if the
+        process is stopped in the writing.
+
+        Arguments:
+            filePath {[str]} -- File path.
+            data {[bytes]} -- Data to write.
+        """
+
+        tempFilePath = filePath + ".tmp"
+        with open(tempFilePath, "wb") as fid:
+            fid.write(data)
+            fid.flush()
+            os.fsync(fid.fileno())
+
+        os.replace(tempFilePath, filePath)
+
+class BscManifestTest(unittest.TestCase):
+    """
+    Test the functions of BscManifest.
+    """
+
+    def setUp(self):
+
+        self.workDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.workDir)
+
+    def testFunctions(self):
+
+        config = {"filter": "r", "raRange": (0, 1)}
+        tileIdList = ["0000", "0001", "0002"]
+
+        manifest = BscManifest(os.path.join(self.workDir, "bsc"))
+        manifest.open(config, tileIdList)
+        self.assertEqual(manifest.getUnprocessedTile(), tileIdList)
+
+        manifest.saveTileResult("0001", [{"a": 1}])
+        self.assertTrue(manifest.isProcessed("0001"))
+        self.assertEqual(manifest.getUnprocessedTile(skipTileSet={"0000"}), ["0002"])
+
+        # Resume from the existed manifest
+        manifestResume = BscManifest(os.path.join(self.workDir, "bsc"))
+        manifestResume.open(config, tileIdList)
+        self.assertEqual(manifestResume.getUnprocessedTile(), ["0000", "0002"])
+        self.assertEqual(manifestResume.loadTileResult("0001"), [{"a": 1}])
+
+        # The tile without the result is not processed
+        os.remove(manifest.getTileFilePath("0001"))
+        manifestResume.open(config, tileIdList)
+        self.assertFalse(manifestResume.isProcessed("0001"))
+
+        # The manifest can not be used for the different configuration
+        self.assertRaises(ValueError, manifestResume.open, {"filter": "g"}, tileIdList)
+
+if __name__ == "__main__":
+
+    # Do the unit test
+    unittest.main()
@@ -96,11 +96,11 @@ class CameraData(object):
                                 the pointing.
         """
 
-        ra = stars.RA
-        decl = stars.Decl
+        ra = stars.getColumn("RA")
+        decl = stars.getColumn("Decl")
         raInPixel, declInPixel = pixelCoordsFromRaDec(ra = ra, dec = decl, obs_metadata = obs,
                                                       epoch = 2000.0, 
-                                                      chipName = np.array([stars.Detector] * len(stars.RA)), 
+                                                      chipName = np.array([stars.Detector] * len(ra)), 
                                                       camera = self.__camera, includeDistortion = True)
         stars.populateRAData(raInPixel)
         stars.populateDeclData(declInPixel)
@@ -119,33 +119,13 @@ class CameraData(object):
                                 is near the edge of ccd.
         """
         
-        keep = [index for index in range(len(stars.RA)) 
-                if stars.RAInPixel[index] >= -offset and stars.RAInPixel[index] <= self.__dimension[stars.Detector][0]+offset 
-                and stars.DeclInPixel[index] >= -offset and stars.DeclInPixel[index] <= self.__dimension[stars.Detector][1]+offset]
-        
-        stars.RA = [stars.RA[index] for index in keep]
-        stars.RAInPixel = [stars.RAInPixel[index] for index in keep]
-        stars.Decl = [stars.Decl[index] for index in keep]
-        stars.DeclInPixel = [stars.DeclInPixel[index] for index in keep]
-        
-        # Check the empty information
-        if (stars.LSSTMagU):
-            stars.LSSTMagU = [stars.LSSTMagU[index] for index in keep]
-         
-        if (stars.LSSTMagG):
-            stars.LSSTMagG = [stars.LSSTMagG[index] for index in keep]
-         
-        if (stars.LSSTMagR):
-            stars.LSSTMagR = [stars.LSSTMagR[index] for index in keep]
-         
-        if (stars.LSSTMagI):
-            stars.LSSTMagI = [stars.LSSTMagI[index] for index in keep]
-         
-        if (stars.LSSTMagZ):
-            stars.LSSTMagZ = [stars.LSSTMagZ[index] for index in keep]
-         
-        if (stars.LSSTMagY):
-            stars.LSSTMagY = [stars.LSSTMagY[index] for index in keep]
+        raInPixel = stars.getColumn("RAInPixel")
+        declInPixel = stars.getColumn("DeclInPixel")
+        keep = (raInPixel >= -offset) & (raInPixel <= self.__dimension[stars.Detector][0]+offset) & \
+               (declInPixel >= -offset) & (declInPixel <= self.__dimension[stars.Detector][1]+offset)
+        
+        # The empty information such as the magnitude of filter not queried is kept empty
+        stars.selectStar(keep)
     
     def getDetectorRaDec(self, camera_mapper, obs):
         """
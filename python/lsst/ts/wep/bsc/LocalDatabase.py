@@ -1,4 +1,4 @@
-import os, sqlite3, unittest
+import os, shutil, sqlite3, tempfile, unittest
 import numpy as np
 
 from lsst.ts.wep.bsc.BrightStarDatabase import BrightStarDatabase
@@ -35,6 +35,145 @@ class LocalDatabase(BrightStarDatabase):
 
         print(result)
 
+    def createSpatialIndex(self, tableName):
+        """
+        
+        Create the R*Tree spatial index of (ra, decl) for the table if it does not exist. The 
+        index is filled with the stars in the table and kept updated by the triggers. The box 
+        query uses the index instead of the full table scan.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        
+        Returns:
+            [bool] -- True if the index is created.
+        """
+
+        if (self.hasSpatialIndex(tableName)):
+            return False
+
+        # Create the index and triggers in a single transaction
+        if (not self.connection.in_transaction):
+            self.cursor.execute("BEGIN")
+
+        indexName = self.getSpatialIndexName(tableName)
+        self.cursor.execute("CREATE VIRTUAL TABLE %s USING rtree(id, minRa, maxRa, minDecl, maxDecl)" % 
+                            indexName)
+        self.cursor.execute("INSERT INTO %s SELECT id, ra, ra, decl, decl FROM %s " % (indexName, tableName) + 
+                            "WHERE ra IS NOT NULL AND decl IS NOT NULL")
+
+        # Keep the index updated with the table
+        insertCommand = "INSERT INTO %s SELECT NEW.id, NEW.ra, NEW.ra, NEW.decl, NEW.decl " % indexName + \
+                        "WHERE NEW.ra IS NOT NULL AND NEW.decl IS NOT NULL;"
+        deleteCommand = "DELETE FROM %s WHERE id = OLD.id;" % indexName
+
+        self.cursor.execute("CREATE TRIGGER %sInsert AFTER INSERT ON %s BEGIN %s END" % 
+                            (indexName, tableName, insertCommand))
+        self.cursor.execute("CREATE TRIGGER %sUpdate AFTER UPDATE OF id, ra, decl ON %s BEGIN %s %s END" % 
+                            (indexName, tableName, deleteCommand, insertCommand))
+        self.cursor.execute("CREATE TRIGGER %sDelete AFTER DELETE ON %s BEGIN %s END" % 
+                            (indexName, tableName, deleteCommand))
+
+        # Commit the change to database
+        self.connection.commit()
+
+        return True
+
+    def dropSpatialIndex(self, tableName):
+        """
+        
+        Drop the spatial index of table.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        """
+
+        indexName = self.getSpatialIndexName(tableName)
+        for trigger in ("Insert", "Update", "Delete"):
+            self.cursor.execute("DROP TRIGGER IF EXISTS %s%s" % (indexName, trigger))
+        self.cursor.execute("DROP TABLE IF EXISTS %s" % indexName)
+
+        # Commit the change to database
+        self.connection.commit()
+
+    def hasSpatialIndex(self, tableName):
+        """
+        
+        Check the table has the spatial index or not.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        
+        Returns:
+            [bool] -- True if the table has the spatial index.
+        """
+
+        return self.__checkObjectInDb("table", self.getSpatialIndexName(tableName))
+
+    def __checkObjectInDb(self, objType, name):
+        """
+        
+        Check the object exists in the database or not.
+        
+        Arguments:
+            objType {[str]} -- Object type ("table", "index", or "trigger").
+            name {[str]} -- Object name.
+        
+        Returns:
+            [bool] -- Object exists or not.
+        """
+
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = ? AND name = ?", 
+                            (objType, name))
+
+        return (len(self.cursor.fetchall()) > 0)
+
+    def getSpatialIndexName(self, tableName):
+        """
+        
+        Get the name of spatial index of table.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        
+        Returns:
+            [str] -- Name of spatial index.
+        """
+
+        return tableName + "Rtree"
+
+    def getBoxQueryCommand(self, tableName, cameraFilter, top, bottom, left, right):
+        """
+        
+        Get the SQL command to query the stars within an area. The spatial index is used if the 
+        table has one.
+        
+        Arguments:
+            tableName {[string]} -- Table name in database.
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            top {[float]} -- The top edge of the box (Decl).
+            bottom {[float]} -- The bottom edge of the box (Decl).
+            left {[float]} -- The left edge of the box (RA).
+            right {[float]} -- The right edge of the box (RA).
+        
+        Returns:
+            [str] -- SQL command to get (simobjid, ra, decl, mag) of stars.
+        """
+
+        if (not self.hasSpatialIndex(tableName)):
+            return super(LocalDatabase, self).getBoxQueryCommand(tableName, cameraFilter, top, bottom, 
+                                                                 left, right)
+
+        # The index keeps the coordinates in 32-bit float rounded outward. Check the exact 
+        # boundary again and keep the order of stars in the full table scan.
+        command = "SELECT s.simobjid, s.ra, s.decl, s." + cameraFilter + "mag " + \
+                  "FROM " + self.getSpatialIndexName(tableName) + " AS r " + \
+                  "JOIN " + tableName + " AS s ON s.id = r.id " + \
+                  "WHERE r.minDecl <= %f AND r.maxDecl >= %f AND r.maxRa >= %f AND r.minRa <= %f " + \
+                  "AND s.decl <= %f AND s.decl >= %f AND s.ra >= %f AND s.ra <= %f ORDER BY s.id"
+
+        return command % ((top, bottom, left, right)*2)
+
     def searchSimobjdID(self, cameraFilter, listID):
         """
         
@@ -82,72 +221,256 @@ class LocalDatabase(BrightStarDatabase):
     def insertData(self, cameraFilter, neighborStarMap):
         """
         
-        Insert new star data into the local database.  
+        Insert new star data into the local database. The bright star existed in the database 
+        is skipped with its neighboring stars.
         
         Arguments:
             cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
             neighborStarMap {[NeighboringStar]} -- Information of neighboring stars.
         """
 
+        self.insertDataList(cameraFilter, [neighborStarMap])
+
+    def insertDataList(self, cameraFilter, neighborStarMapList, tileId=None):
+        """
+        
+        Insert the star data of neighboring star maps into the local database in a single 
+        transaction. The result is the same as calling insertData() for each neighboring 
+        star map in order.
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            neighborStarMapList {[list]} -- List of neighboring star maps (NeighboringStar).
+        
+        Keyword Arguments:
+            tileId {[str]} -- Tile of sky to record as merged in the same transaction. 
+                              (default: {None})
+        
+        Returns:
+            [int] -- Number of inserted stars.
+        """
+
+        # The star with the same (ra, decl) in database is ignored if the table has the unique 
+        # index from createUniqueIndex()
+        tableName = "BrightStarCatalog" + cameraFilter.upper()
+        command = "INSERT OR IGNORE INTO " + tableName + \
+                  " (simobjid, ra, decl, " + cameraFilter + "mag, bright_star) " + \
+                  "VALUES (?, ?, ?, ?, ?)"
+
+        numOfStar = 0
+        for neighborStarMap in neighborStarMapList:
+            taskList = self.__getInsertTask(cameraFilter, neighborStarMap)
+            if (len(taskList) > 0):
+                self.cursor.executemany(command, taskList)
+                numOfStar += self.cursor.rowcount
+
+        if (tileId is not None):
+            mergedTileTableName = self.__createMergedTileTable(cameraFilter)
+            self.cursor.execute("INSERT INTO %s (tileId) VALUES (?)" % mergedTileTableName, (tileId,))
+
+        # Commit the change to database
+        self.connection.commit()
+
+        return numOfStar
+
+    def __getInsertTask(self, cameraFilter, neighborStarMap):
+        """
+        
+        Get the rows of star data to insert. The bright star existed in the database is 
+        skipped with its neighboring stars.
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            neighborStarMap {[NeighboringStar]} -- Information of neighboring stars.
+        
+        Returns:
+            [list] -- Rows of (simobjid, ra, decl, mag, bright_star).
+        """
+
         # List of bright star
         brightStarList = list(neighborStarMap.SimobjID)
 
         # Check the existed bright star data based on ra and decl
-        existIdList = []
-        for ii in range(len(brightStarList)):
-            raDec = neighborStarMap.RaDecl[brightStarList[ii]]
-            if (self.searchRaDecl(cameraFilter,raDec[0],raDec[1])):
-                existIdList.append(brightStarList[ii])
-
-        # Collect the lists not in database yet. 
-        # remainIDList is the bright star list. And allStarList is the list 
-        # contains the bright stars and related neighboring stars.
-        remainIdList = []
+        existRaDeclSet = self.__searchExistRaDecl(cameraFilter, 
+                                                  [neighborStarMap.RaDecl[id] for id in brightStarList])
+
+        # Collect the stars not in database yet. remainIdSet is the bright stars. And 
+        # allStarList contains the bright stars and related neighboring stars.
+        remainIdSet = set()
         allStarList = []
+        allStarSet = set()
         for id in brightStarList:
-            if id not in existIdList:
-                remainIdList.append(id)
-                allStarList.append(id)
-                for starID in neighborStarMap.SimobjID[id]:
-                    # Make sure the starID is not in the allStarList yet
-                    if starID not in allStarList:
-                        allStarList.append(starID)
-       
-        # Insert the star data to local data base
+            if (tuple(neighborStarMap.RaDecl[id]) in existRaDeclSet):
+                continue
+
+            remainIdSet.add(id)
+            for starID in [id] + list(neighborStarMap.SimobjID[id]):
+                if starID not in allStarSet:
+                    allStarSet.add(starID)
+                    allStarList.append(starID)
+
+        # Collect the star data
+        magnitude = getattr(neighborStarMap, "LSSTMag" + cameraFilter.upper())
+        taskList = []
         for simobjID in allStarList:
+            raDec = neighborStarMap.RaDecl[simobjID]
+            taskList.append((int(simobjID), raDec[0], raDec[1], magnitude[simobjID], 
+                             simobjID in remainIdSet))
 
-            # Insert data
-            command = "INSERT INTO BrightStarCatalog" + cameraFilter.upper() + \
-                      " (simobjid, ra, decl, " + cameraFilter + "mag, bright_star) " + \
-                      "VALUES (?, ?, ?, ?, ?)"
+        return taskList
 
-            raDec = neighborStarMap.RaDecl[simobjID]
-            
-            if (cameraFilter == self.FilterU):
-                mag = neighborStarMap.LSSTMagU[simobjID]
-            elif (cameraFilter == self.FilterG):
-                mag = neighborStarMap.LSSTMagG[simobjID]
-            elif (cameraFilter == self.FilterR):
-                mag = neighborStarMap.LSSTMagR[simobjID]
-            elif (cameraFilter == self.FilterI):
-                mag = neighborStarMap.LSSTMagI[simobjID]
-            elif (cameraFilter == self.FilterZ):
-                mag = neighborStarMap.LSSTMagZ[simobjID]
-            elif (cameraFilter == self.FilterY):
-                mag = neighborStarMap.LSSTMagY[simobjID]
-
-            if simobjID in remainIdList:
-                brightStar = True
-            else:
-                brightStar = False
-
-            task = (int(simobjID), raDec[0], raDec[1], mag, brightStar)
-
-            self.cursor.execute(command, task)
+    def __searchExistRaDecl(self, cameraFilter, raDeclList):
+        """
+        
+        Search the stars existed in the database in a single query for each chunk of stars.
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            raDeclList {[list]} -- (ra, decl) of stars in degree.
+        
+        Returns:
+            [set] -- (ra, decl) of stars existed in the database.
+        """
+
+        # Keep the number of host parameters in a query below the limit of sqlite
+        numOfParam = 500
+
+        raList = sorted(set([raDecl[0] for raDecl in raDeclList]))
+
+        existRaDeclSet = set()
+        for ii in range(0, len(raList), numOfParam):
+            subRaList = raList[ii:ii+numOfParam]
+            command = "SELECT ra, decl FROM BrightStarCatalog" + cameraFilter.upper() + \
+                      " WHERE ra IN (" + ", ".join(["?"]*len(subRaList)) + ")"
+            self.cursor.execute(command, subRaList)
+            existRaDeclSet.update(self.cursor.fetchall())
+
+        return existRaDeclSet
+
+    def createUniqueIndex(self, tableName, removeDuplicate=False):
+        """
+        
+        Create the unique index of (ra, decl) for the table if it does not exist. The star with 
+        the same (ra, decl) as the one in the table is ignored in the insertion.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        
+        Keyword Arguments:
+            removeDuplicate {[bool]} -- Remove the duplicated stars except the one with the 
+                                        smallest id first. (default: {False})
+        
+        Returns:
+            [bool] -- True if the index is created.
+        
+        Raises:
+            sqlite3.IntegrityError -- There are duplicated stars in the table.
+        """
+
+        indexName = self.getUniqueIndexName(tableName)
+        if (self.__checkObjectInDb("index", indexName)):
+            return False
+
+        if (removeDuplicate):
+            self.cursor.execute("DELETE FROM %s WHERE id NOT IN " % tableName + 
+                                "(SELECT MIN(id) FROM %s GROUP BY ra, decl)" % tableName)
+
+        self.cursor.execute("CREATE UNIQUE INDEX %s ON %s (ra, decl)" % (indexName, tableName))
+
+        # Commit the change to database
+        self.connection.commit()
+
+        return True
+
+    def dropUniqueIndex(self, tableName):
+        """
+        
+        Drop the unique index of table.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        """
+
+        self.cursor.execute("DROP INDEX IF EXISTS %s" % self.getUniqueIndexName(tableName))
 
         # Commit the change to database
         self.connection.commit()
 
+    def getUniqueIndexName(self, tableName):
+        """
+        
+        Get the name of unique index of table.
+        
+        Arguments:
+            tableName {[str]} -- Table name.
+        
+        Returns:
+            [str] -- Name of unique index.
+        """
+
+        return tableName + "RaDecl"
+
+    def setBulkInsertPragma(self, journalMode="MEMORY", synchronous="OFF"):
+        """
+        
+        Set the journal and synchronous modes for the offline build of database. The default 
+        values remove the most of disk writes in the insertion, but the database might be 
+        broken if the process or system crashes.
+        
+        Keyword Arguments:
+            journalMode {[str]} -- Journal mode ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", 
+                                   "WAL", or "OFF"). (default: {"MEMORY"})
+            synchronous {[str]} -- Synchronous mode ("OFF", "NORMAL", "FULL", or "EXTRA"). 
+                                   (default: {"OFF"})
+        
+        Raises:
+            ValueError -- Not the allowed mode.
+        """
+
+        if journalMode.upper() not in ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"):
+            raise ValueError("The journal mode: '%s' is not allowed." % journalMode)
+
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError("The synchronous mode: '%s' is not allowed." % synchronous)
+
+        self.cursor.execute("PRAGMA journal_mode = %s" % journalMode)
+        self.cursor.execute("PRAGMA synchronous = %s" % synchronous)
+
+    def __createMergedTileTable(self, cameraFilter):
+        """
+        
+        Create the table of tiles of sky merged into the bright star catalog if it does not 
+        exist.
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+        
+        Returns:
+            [str] -- Table name.
+        """
+
+        tableName = "BscMergedTile" + cameraFilter.upper()
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS %s (tileId TEXT PRIMARY KEY)" % tableName)
+
+        return tableName
+
+    def getMergedTile(self, cameraFilter):
+        """
+        
+        Get the tiles of sky merged into the bright star catalog by insertDataList().
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+        
+        Returns:
+            [set] -- Tile IDs.
+        """
+
+        tableName = self.__createMergedTileTable(cameraFilter)
+        self.cursor.execute("SELECT tileId FROM %s" % tableName)
+
+        return set([tileId for (tileId,) in self.cursor.fetchall()])
+
     def updateData(self, cameraFilter, listID, listOfItemToChange, listOfNewValue):
         """
         
@@ -288,6 +611,89 @@ class LocalDatabaseTest(unittest.TestCase):
         newNumId = self.localDatabase.getAllId(self.cameraFilter)
         self.assertNotEqual(numId, newNumId)
 
+    def testSpatialIndex(self):
+
+        localTableName = "BrightStarCatalogU"
+
+        # Use the copy of database to create the index
+        workDir = tempfile.mkdtemp()
+        dbAdress = os.path.join(workDir, "bsc.db3")
+        shutil.copy(os.path.join(getModulePath(), "test", "bsc.db3"), dbAdress)
+
+        db = LocalDatabase()
+        db.connect(dbAdress)
+
+        boxList = [(30.4, 30.0, 0.2, 0.5), (-60.0, -90.0, 300.0, 320.0), (63.0, 62.0, 0.0, 1.0)]
+        queryList = [db.query(localTableName, "u", (left, bottom), (right, bottom), (right, top), 
+                              (left, top)) for top, bottom, left, right in boxList]
+
+        self.assertFalse(db.hasSpatialIndex(localTableName))
+        self.assertTrue(db.createSpatialIndex(localTableName))
+        self.assertFalse(db.createSpatialIndex(localTableName))
+        self.assertTrue(db.hasSpatialIndex(localTableName))
+
+        # The index gives the same stars
+        for (top, bottom, left, right), stars in zip(boxList, queryList):
+            starsIndexed = db.query(localTableName, "u", (left, bottom), (right, bottom), 
+                                    (right, top), (left, top))
+            self.assertEqual(starsIndexed.SimobjID, stars.SimobjID)
+            self.assertEqual(starsIndexed.RA, stars.RA)
+
+        # The index is updated with the table
+        tableName = "BrightStarCatalog" + self.cameraFilter.upper()
+        db.createSpatialIndex(tableName)
+
+        db.insertData(self.cameraFilter, self.neighboringStar)
+        db.updateData(self.cameraFilter, [1], ["ra"], [0.35])
+        db.deleteData(self.cameraFilter, [2])
+        db.cursor.execute("SELECT id, minRa FROM %s ORDER BY id" % db.getSpatialIndexName(tableName))
+        indexData = db.cursor.fetchall()
+        db.cursor.execute("SELECT id, ra FROM %s ORDER BY id" % tableName)
+        tableData = db.cursor.fetchall()
+        self.assertEqual([item[0] for item in indexData], [1, 3])
+        self.assertEqual([item[0] for item in tableData], [1, 3])
+        self.assertAlmostEqual(indexData[0][1], 0.35, places=5)
+
+        db.dropSpatialIndex(localTableName)
+        self.assertFalse(db.hasSpatialIndex(localTableName))
+
+        db.disconnect()
+        shutil.rmtree(workDir)
+
+    def testUniqueIndex(self):
+
+        localTableName = "BrightStarCatalogU"
+
+        # Use the copy of database to create the index
+        workDir = tempfile.mkdtemp()
+        dbAdress = os.path.join(workDir, "bsc.db3")
+        shutil.copy(os.path.join(getModulePath(), "test", "bsc.db3"), dbAdress)
+
+        db = LocalDatabase()
+        db.connect(dbAdress)
+
+        # The repeated stars need to be removed first
+        self.assertRaises(sqlite3.IntegrityError, db.createUniqueIndex, localTableName)
+
+        db.cursor.execute("SELECT COUNT(*) FROM (SELECT DISTINCT ra, decl FROM %s)" % localTableName)
+        numOfStar = db.cursor.fetchall()[0][0]
+        self.assertTrue(db.createUniqueIndex(localTableName, removeDuplicate=True))
+        self.assertFalse(db.createUniqueIndex(localTableName))
+        self.assertEqual(len(db.getAllId("u")), numOfStar)
+
+        # Insert the neighboring star maps in bulk
+        self.assertRaises(ValueError, db.setBulkInsertPragma, journalMode="FAST")
+        db.setBulkInsertPragma()
+
+        db.createUniqueIndex("BrightStarCatalog" + self.cameraFilter.upper())
+        numOfStar = db.insertDataList(self.cameraFilter, [self.neighboringStar]*2, tileId="0")
+        self.assertEqual(numOfStar, 3)
+        self.assertEqual(db.getMergedTile(self.cameraFilter), set(["0"]))
+        self.assertEqual(db.insertDataList(self.cameraFilter, [self.neighboringStar]), 0)
+
+        db.disconnect()
+        shutil.rmtree(workDir)
+
 if __name__ == '__main__':
 
     # Do the unit test
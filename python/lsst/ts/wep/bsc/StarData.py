@@ -1,16 +1,58 @@
 import numpy as np
-from scipy.spatial.distance import cdist
+from scipy.spatial import cKDTree
 
 from lsst.ts.wep.bsc.Filter import Filter
 
 import unittest
 
+def _columnProperty(name):
+    """
+    
+    Get the property of star column in the list.
+    
+    Arguments:
+        name {[str]} -- Column name.
+    
+    Returns:
+        [property] -- Property to get and set the column in the list.
+    """
+
+    def getter(self):
+        return self.getColumnList(name)
+
+    def setter(self, value):
+        self.setColumn(name, value)
+
+    return property(getter, setter, doc="%s of stars in the list." % name)
+
 class StarData(object):
 
+    # Names of star columns
+    COLUMN_NAME_LIST = ("SimobjID", "RA", "RAInPixel", "Decl", "DeclInPixel", "LSSTMagU", 
+                        "LSSTMagG", "LSSTMagR", "LSSTMagI", "LSSTMagZ", "LSSTMagY")
+
+    # The star columns are kept in the contiguous arrays. These attributes give the columns 
+    # in the lists as before. Set the attribute to change the column.
+    SimobjID = _columnProperty("SimobjID")
+    RA = _columnProperty("RA")
+    RAInPixel = _columnProperty("RAInPixel")
+    Decl = _columnProperty("Decl")
+    DeclInPixel = _columnProperty("DeclInPixel")
+    LSSTMagU = _columnProperty("LSSTMagU")
+    LSSTMagG = _columnProperty("LSSTMagG")
+    LSSTMagR = _columnProperty("LSSTMagR")
+    LSSTMagI = _columnProperty("LSSTMagI")
+    LSSTMagZ = _columnProperty("LSSTMagZ")
+    LSSTMagY = _columnProperty("LSSTMagY")
+
     def __init__(self, simobjid, ra, decl, lsstMagU, lsstMagG, lsstMagR, lsstMagI, 
                 lsstMagZ, lsstMagY):
         
         self.Detector = "" 
+
+        # Star columns in arrays and the lists converted from them
+        self.__column = dict()
+        self.__columnList = dict()
       
         self.SimobjID = simobjid
 
@@ -34,6 +76,85 @@ class StarData(object):
         self.FilterI = afilter.FilterI
         self.FilterZ = afilter.FilterZ
         self.FilterY = afilter.FilterY
+
+        # Magnitude column of each filter
+        self.__magnitudeName = {self.FilterU: "LSSTMagU", self.FilterG: "LSSTMagG", 
+                                self.FilterR: "LSSTMagR", self.FilterI: "LSSTMagI", 
+                                self.FilterZ: "LSSTMagZ", self.FilterY: "LSSTMagY"}
+
+    def setColumn(self, name, value):
+        """
+        
+        Set the star column.
+        
+        Arguments:
+            name {[str]} -- Column name in COLUMN_NAME_LIST.
+            value {[list/ ndarray]} -- Column data.
+        """
+
+        self.__column[name] = np.array(value)
+        self.__columnList.pop(name, None)
+
+    def getColumn(self, name):
+        """
+        
+        Get the star column in the read-only array without the copy.
+        
+        Arguments:
+            name {[str]} -- Column name in COLUMN_NAME_LIST.
+        
+        Returns:
+            [ndarray] -- Column data.
+        """
+
+        column = self.__column[name].view()
+        column.setflags(write=False)
+
+        return column
+
+    def getColumnList(self, name):
+        """
+        
+        Get the star column in the list. The list is converted from the array once until the 
+        column is changed.
+        
+        Arguments:
+            name {[str]} -- Column name in COLUMN_NAME_LIST.
+        
+        Returns:
+            [list] -- Column data.
+        """
+
+        if name not in self.__columnList:
+            self.__columnList[name] = self.__column[name].tolist()
+
+        return self.__columnList[name]
+
+    def getNumOfStar(self):
+        """
+        
+        Get the number of stars.
+        
+        Returns:
+            [int] -- Number of stars.
+        """
+
+        return len(self.__column["SimobjID"])
+
+    def selectStar(self, index):
+        """
+        
+        Keep the selected stars in all columns. The empty column such as the magnitude of 
+        filter not queried is kept empty.
+        
+        Arguments:
+            index {[ndarray]} -- Boolean mask or indexes of stars to keep.
+        """
+
+        numOfStar = self.getNumOfStar()
+        for name in self.COLUMN_NAME_LIST:
+            if (len(self.__column[name]) == numOfStar):
+                self.setColumn(name, self.__column[name][index])
         
     def populateDetector(self, detector):
         """
@@ -80,101 +201,110 @@ class StarData(object):
         """
 
         indexCandidate = []
-        if (self.RA):
-            if (cameraFilter == self.FilterU):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagU[index] >= lowMagnitude and self.LSSTMagU[index] <= highMagnitude]
-            
-            elif (cameraFilter == self.FilterG):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagG[index] >= lowMagnitude and self.LSSTMagG[index] <= highMagnitude]
-            
-            elif (cameraFilter == self.FilterR):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagR[index] >= lowMagnitude and self.LSSTMagR[index] <= highMagnitude]
-                
-            elif (cameraFilter == self.FilterI):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagI[index] >= lowMagnitude and self.LSSTMagI[index] <= highMagnitude]
-                
-            elif (cameraFilter == self.FilterZ):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagZ[index] >= lowMagnitude and self.LSSTMagZ[index] <= highMagnitude]
-                
-            elif (cameraFilter == self.FilterY):
-                indexCandidate = [index for index in range(len(self.RA)) 
-                    if self.LSSTMagY[index] >= lowMagnitude and self.LSSTMagY[index] <= highMagnitude]
+        if (len(self.__column["RA"]) > 0 and cameraFilter in self.__magnitudeName):
+            magnitude = self.getMagnitude(cameraFilter)
+            indexCandidate = np.where((magnitude >= lowMagnitude) & 
+                                      (magnitude <= highMagnitude))[0].tolist()
 
         return indexCandidate
 
-    def getNeighboringStar(self, indexCandidate, maxDistance, cameraFilter, maxNeighboringStar):
+    def getMagnitudeName(self, cameraFilter):
         """
         
-        Get the neighboring stars of candidate stars based on specific max distance.
+        Get the name of magnitude column in the filter.
         
         Arguments:
-            indexCandidate {[int]} -- Index of candidate star in "stars" data.
-            maxDistance {[float]} -- Maximum distance in pixel.
             cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
-
+        
         Returns:
-            [NeighboringStar] -- Information of neighboring stars.
+            [str] -- Column name such as "LSSTMagU".
+
+        Raises:
+            ValueError -- Wrong filter type.
         """
 
-        # Calculate the distance in pixel between candidate stars and all stars
-        if (indexCandidate):
-            allStarXY = np.array([self.RAInPixel, self.DeclInPixel]).transpose()
-            candidateStarXY = allStarXY[np.array(indexCandidate),:]
-            starDistances = cdist(candidateStarXY,allStarXY)
+        if cameraFilter not in self.__magnitudeName:
+            raise ValueError("Filter can not be '%s'." % cameraFilter)
 
-        # Decide the number of neighboring stars
-        neighboringStar = NeighboringStar()
-        for ii in range(len(indexCandidate)):
-            indexNeighboringStar = np.where(starDistances[ii,:] < maxDistance)[0]
-            
-            # Delete candidate star itself
-            indexNeighboringStar = np.delete(indexNeighboringStar, 
-                                             np.where(indexNeighboringStar==indexCandidate[ii]))
-
-            # Remove the candidate star if there is the neighboring star brighter than itself
-            if (cameraFilter == self.FilterU):
-                magSelf = self.LSSTMagU[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagU)[[indexNeighboringStar]]
+        return self.__magnitudeName[cameraFilter]
 
-            elif (cameraFilter == self.FilterG):
-                magSelf = self.LSSTMagG[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagG)[[indexNeighboringStar]]
+    def getMagnitude(self, cameraFilter):
+        """
+        
+        Get the magnitude of stars in the filter.
+        
+        Arguments:
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+        
+        Returns:
+            [ndarray] -- Magnitude of stars in the read-only array.
 
-            elif (cameraFilter == self.FilterR):
-                magSelf = self.LSSTMagR[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagR)[[indexNeighboringStar]]
+        Raises:
+            ValueError -- Wrong filter type.
+        """
 
-            elif (cameraFilter == self.FilterI):
-                magSelf = self.LSSTMagI[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagI)[[indexNeighboringStar]]
+        return self.getColumn(self.getMagnitudeName(cameraFilter))
 
-            elif (cameraFilter == self.FilterZ):
-                magSelf = self.LSSTMagZ[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagZ)[[indexNeighboringStar]]
+    def getNeighboringStar(self, indexCandidate, maxDistance, cameraFilter, maxNeighboringStar):
+        """
+        
+        Get the neighboring stars of candidate stars based on specific max distance. The 
+        neighboring stars are found by the ball query on the k-d tree of all stars, which 
+        does not need the distances between the candidate stars and all stars.
+        
+        Arguments:
+            indexCandidate {[int]} -- Index of candidate star in "stars" data.
+            maxDistance {[float]} -- Maximum distance in pixel.
+            cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
+            maxNeighboringStar {[int]} -- Maximum number of neighboring stars.
 
-            elif (cameraFilter == self.FilterY):
-                magSelf = self.LSSTMagY[indexCandidate[ii]]
-                magNeighboringStar = np.array(self.LSSTMagY)[[indexNeighboringStar]]
+        Returns:
+            [NeighboringStar] -- Information of neighboring stars.
+        """
 
-            if ((np.where(magNeighboringStar < magSelf)[0]).size != 0):
-                brighterNeighbor = True
-            else:
-                brighterNeighbor = False 
+        neighboringStar = NeighboringStar()
+        if (len(indexCandidate) == 0):
+            return neighboringStar
+
+        # Build the k-d tree of all stars in pixel
+        allStarXY = np.column_stack((self.getColumn("RAInPixel"), 
+                                     self.getColumn("DeclInPixel"))).astype(float)
+        tree = cKDTree(allStarXY)
+
+        indexCandidate = np.array(indexCandidate, dtype=int)
+        candidateStarXY = allStarXY[indexCandidate, :]
+
+        # The ball query includes the boundary, but the distance of neighboring star should 
+        # be less than the maximum distance
+        radius = np.nextafter(maxDistance, -np.inf)
+
+        # Restrict the maximum number of neighboring stars by counting the stars in the 
+        # ball first. The count includes the candidate star itself.
+        numOfNeighboringStar = tree.query_ball_point(candidateStarXY, radius, 
+                                                     return_length=True)
+        if (maxDistance > 0):
+            numOfNeighboringStar -= 1
+        idxCheck = np.where(numOfNeighboringStar <= maxNeighboringStar)[0]
+        if (idxCheck.size == 0):
+            return neighboringStar
+
+        # Collect the neighboring stars of remaining candidate stars
+        indexNeighboringStarList = tree.query_ball_point(candidateStarXY[idxCheck, :], radius, 
+                                                         return_sorted=True)
+
+        # Remove the candidate star if there is the neighboring star brighter than itself
+        magnitude = self.getMagnitude(cameraFilter)
+        for ii, indexNeighboringStar in zip(idxCheck, indexNeighboringStarList):
 
-            # Restrict the maximum number of neighboring stars
-            if (indexNeighboringStar.size > maxNeighboringStar):
-                highNeighboringStar = True
-            else:
-                highNeighboringStar = False
+            # Delete candidate star itself
+            indexNeighboringStar = np.array(indexNeighboringStar, dtype=int)
+            indexNeighboringStar = indexNeighboringStar[indexNeighboringStar != 
+                                                        indexCandidate[ii]]
 
             # Record the information of neighboring stars
-            if (brighterNeighbor == False and highNeighboringStar == False):
-                neighboringStar.addStar(self, indexCandidate[ii], indexNeighboringStar, cameraFilter)
+            if (not np.any(magnitude[indexNeighboringStar] < magnitude[indexCandidate[ii]])):
+                neighboringStar.addStar(self, int(indexCandidate[ii]), indexNeighboringStar, 
+                                        cameraFilter)
 
         return neighboringStar
 
@@ -205,31 +335,22 @@ class NeighboringStar(object):
             cameraFilter {[string]} -- Filter type of camera: u, g, r, i, z, y.
         """
 
-        self.SimobjID[stars.SimobjID[indexCandidate]] = np.array(stars.SimobjID)[[indexNeighboringStar]].tolist()
+        simobjID = stars.SimobjID
+        self.SimobjID[simobjID[indexCandidate]] = [simobjID[index] 
+                                                   for index in indexNeighboringStar]
 
         # Collect coordinates and magnitude of candidate and neighboring stars 
-        indexStar = np.append(indexNeighboringStar, indexCandidate)
-        for index in indexStar:
-            self.RaDecl[stars.SimobjID[index]] = (stars.RA[index], stars.Decl[index])
-            self.RaDeclInPixel[stars.SimobjID[index]] = (stars.RAInPixel[index], stars.DeclInPixel[index])
-
-            if (cameraFilter == stars.FilterU):
-                self.LSSTMagU[stars.SimobjID[index]] = stars.LSSTMagU[index]
-
-            elif (cameraFilter == stars.FilterG):
-                self.LSSTMagG[stars.SimobjID[index]] = stars.LSSTMagG[index]
+        indexStar = np.append(indexNeighboringStar, indexCandidate).astype(int)
+        starID = [simobjID[index] for index in indexStar]
 
-            elif (cameraFilter == stars.FilterR):
-                self.LSSTMagR[stars.SimobjID[index]] = stars.LSSTMagR[index]
+        self.RaDecl.update(zip(starID, zip(stars.getColumn("RA")[indexStar].tolist(), 
+                                           stars.getColumn("Decl")[indexStar].tolist())))
+        self.RaDeclInPixel.update(zip(starID, 
+                                      zip(stars.getColumn("RAInPixel")[indexStar].tolist(), 
+                                          stars.getColumn("DeclInPixel")[indexStar].tolist())))
 
-            elif (cameraFilter == stars.FilterI):
-                self.LSSTMagI[stars.SimobjID[index]] = stars.LSSTMagI[index]
-
-            elif (cameraFilter == stars.FilterZ):
-                self.LSSTMagZ[stars.SimobjID[index]] = stars.LSSTMagZ[index]
-
-            elif (cameraFilter == stars.FilterY):
-                self.LSSTMagY[stars.SimobjID[index]] = stars.LSSTMagY[index]
+        magnitude = getattr(self, stars.getMagnitudeName(cameraFilter))
+        magnitude.update(zip(starID, stars.getMagnitude(cameraFilter)[indexStar].tolist()))
 
 class StarDataTest(unittest.TestCase):
     """
@@ -256,6 +377,26 @@ class StarDataTest(unittest.TestCase):
         self.assertEqual(stars.LSSTMagY, [2.5, 3.5, 4.5])
         self.assertEqual(stars.Detector,"CCD")
 
+    def testColumn(self):
+        stars = self.stars
+
+        # The column is the read-only array without the copy
+        ra = stars.getColumn("RA")
+        self.assertFalse(ra.flags.writeable)
+        self.assertTrue(np.shares_memory(ra, stars.getColumn("RA")))
+        self.assertTrue(np.array_equal(stars.getMagnitude("g"), [2.1, 2.1, 4.1]))
+
+        # The attribute gives the list of updated column
+        stars.RA = np.array([0.4, 0.5, 0.6])
+        self.assertEqual(stars.RA, [0.4, 0.5, 0.6])
+
+        # Select the stars in all non-empty columns
+        stars.selectStar(stars.getMagnitude("u") > 2.5)
+        self.assertEqual(stars.getNumOfStar(), 2)
+        self.assertEqual(stars.SimobjID, [456, 789])
+        self.assertEqual(stars.LSSTMagY, [3.5, 4.5])
+        self.assertEqual(stars.RAInPixel, [])
+
     def testCheckCandidateStars(self):
         stars = self.stars
 
@@ -296,6 +437,9 @@ class StarDataTest(unittest.TestCase):
         self.assertEqual(len(neighboringStarZ.SimobjID), 1)
         self.assertEqual(neighboringStarY.SimobjID, {})
 
+        self.assertEqual(neighboringStarU.SimobjID[123], [456, 789])
+        self.assertRaises(ValueError, stars.getNeighboringStar, [0], 3, "x", 99)
+
 if __name__ == "__main__":
 
     # Do the unit test
@@ -10,7 +10,8 @@
 # Refactored by Te-Wei Tsai at June, 2017
 ##
 
-import os, sys, unittest
+import os, sys, unittest, hashlib, copy
+from collections import OrderedDict
 import numpy as np
 
 import matplotlib
@@ -19,16 +20,31 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
 from scipy.ndimage import generate_binary_structure, iterate_structure
-from scipy.ndimage.filters import laplace
+from scipy.ndimage.filters import laplace, correlate
+from scipy.fftpack import dct, idct
 from scipy.ndimage.morphology import binary_dilation, binary_erosion
 
-from lsst.ts.wep.cwfs.Tool import padArray, extractArray, ZernikeAnnularEval, ZernikeMaskedFit, ZernikeAnnularGrad
+from lsst.ts.wep.cwfs.Tool import padArray, extractArray, ZernikeAnnularEval, \
+                                  ZernikeAnnularEvalBasis, ZernikeAnnularGradBasis, \
+                                  ZernikeAnnularFitter
 from lsst.ts.wep.cwfs.Instrument import Instrument
 from lsst.ts.wep.cwfs.CompensationImageDecorator import CompensationImageDecorator
 from lsst.ts.wep.Utility import getModulePath
+from lsst.ts.wep.StageProfiler import profileStage
 
 class Algorithm(object):
 
+    # Maximum number of the annular Zernike basis sets kept in the process-wide cache.
+    # Each entry holds three (numTerms x sensorSamples x sensorSamples) cubes and their
+    # copies compressed to the mask.
+    ZK_BASIS_CACHE_SIZE = 4
+
+    # Least-recently-used cache of the annular Zernike basis shared by all instances
+    _zkBasisCache = OrderedDict()
+
+    # Annular Zernike fitters on the sensor grid shared by all instances
+    _zkFitterCache = dict()
+
     def __init__(self, algoFolder):
         """
 
@@ -58,6 +74,9 @@ class Algorithm(object):
         self.cMask = None
         self.pMaskPad = None
         self.cMaskPad = None
+        self.boundaryRing = None
+        self.accelHistory = None
+        self.convergeItr = None
         self.algoName = None
 
     def reset(self):
@@ -78,6 +97,9 @@ class Algorithm(object):
         self.cMask = None
         self.pMaskPad = None
         self.cMaskPad = None
+        self.boundaryRing = None
+        self.accelHistory = None
+        self.convergeItr = None
 
     def config(self, algoName, inst, debugLevel=0):
         """
@@ -86,8 +108,8 @@ class Algorithm(object):
         
         Arguments:
             algoName {[str]} -- Algorithm configuration file to solve the Poisson's equation
-                                in the transport of intensity equation (TIE). It can be "fft"
-                                or "exp" here.
+                                in the transport of intensity equation (TIE). It can be "fft",
+                                "dct", or "exp" here.
             inst {[Instrument]} -- Instrument to use.
         
         Keyword Arguments:
@@ -147,6 +169,7 @@ class Algorithm(object):
         # Change the dimension of mask for fft to use
         self.pMaskPad = None
         self.cMaskPad = None
+        self.boundaryRing = None
 
     def __readFile(self, algoFolderPath, filename, inst):
         """
@@ -169,6 +192,10 @@ class Algorithm(object):
         innerItr = None
         sumclipSequence = None
 
+        # Outer loop uses the plain feedback update by default
+        acceleration = "none"
+        accelDepth = 3
+
         # Open the file to read parameters used in the algorithm
         fid = open(filename)
         iscomment = False
@@ -223,9 +250,19 @@ class Algorithm(object):
                 elif (line.startswith("Sumclip_sequence")):
                     sumclipSequence = np.loadtxt(os.path.join(algoFolderPath, line.split()[1]))
 
+                elif (line.startswith("Outer_loop_acceleration")):
+                    acceleration = line.split()[1].lower()
+
+                elif (line.startswith("Acceleration_depth")):
+                    accelDepth = int(line.split()[1])
+
         # Close the file
         fid.close()
 
+        # Check the acceleration of outer loop
+        if acceleration not in ("none", "anderson"):
+            raise ValueError("Outer loop acceleration can not be '%s'." % acceleration)
+
         # Give the values of ZTerms. Need to check why this is needed. Not find this variable is used.
         if (ZTerms is None):
             ZTerms = np.arange(numTerms) + 1
@@ -249,8 +286,8 @@ class Algorithm(object):
         # Dimension of sensor samples in instrument
         sensorSamples = inst.parameter["sensorSamples"]
 
-        # Check the parameters used in the fft
-        if (PoissonSolver == "fft"):
+        # Check the parameters used in the fft and dct
+        if (PoissonSolver in ("fft", "dct")):
 
             # If outerItr is large, and sumclipSequence is too small,
             # the rest in sumclipSequence will be filled.
@@ -290,11 +327,13 @@ class Algorithm(object):
                      "boundaryT": boundaryT,
                      "compSequence": compSequence,
                      "sumclipSequence": sumclipSequence,
+                     "acceleration": acceleration,
+                     "accelDepth": accelDepth,
                      "maskScalingFactor": maskScalingFactor}
 
         return parameter
 
-    def itr0(self, inst, I1, I2, model):
+    def itr0(self, inst, I1, I2, model, zcompInit=None):
         """
 
         Calculate the wavefront and coefficients of normal/ annular Zernike polynomials in the
@@ -305,6 +344,10 @@ class Algorithm(object):
             I1 {[Image]} -- Intra- or extra-focal image.
             I2 {[Image]} -- Intra- or extra-focal image.
             model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
+
+        Keyword Arguments:
+            zcompInit {[ndarray]} -- Initial coefficients of Zk polynomials (z1 - zn) in meter
+                                     to compensate the images. (default: {None})
         """
 
         # Reset the iteration time of outer loop and decide to reset the defocal
@@ -312,9 +355,10 @@ class Algorithm(object):
         self.__reset(I1, I2)
 
         # Solve the transport of intensity equation (TIE)
-        self.__singleItr(inst, I1, I2, model)
+        self.__singleItr(inst, I1, I2, model, zcompInit=zcompInit)
 
-    def runIt(self, inst, I1, I2, model, tol=1e-3):
+    @profileStage("Algorithm.runIt")
+    def runIt(self, inst, I1, I2, model, tol=1e-3, zcompInit=None):
         """
 
         Calculate the wavefront error by solving the transport of intensity equation (TIE).
@@ -330,13 +374,18 @@ class Algorithm(object):
             model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
             tol {[float]} -- Tolerance of difference of coefficients of Zk polynomials compared with
                              the previours iteration.
+            zcompInit {[ndarray]} -- Initial coefficients of Zk polynomials (z1 - zn) in meter
+                                     to compensate the images. This is a prior solution such as
+                                     the one of previous visit or neighboring donut. It is only
+                                     used if the outer loop starts from the first iteration.
+                                     (default: {None})
         """
 
         # To have the iteration time initiated from global variable is to distinguish the manually
         # and automatically iteration processes.
         itr = self.currentItr
         while (itr <= self.parameter["outerItr"]):
-            stopItr = self.__singleItr(inst, I1, I2, model, tol)
+            stopItr = self.__singleItr(inst, I1, I2, model, tol, zcompInit=zcompInit)
 
             # Stop the iteration of outer loop if converged
             if (stopItr):
@@ -344,6 +393,89 @@ class Algorithm(object):
 
             itr += 1
 
+    @profileStage("Algorithm.runItBatch")
+    def runItBatch(self, inst, I1List, I2List, model, tol=1e-3):
+        """
+
+        Calculate the wavefront errors of multiple pairs of donut images by solving the
+        transport of intensity equation (TIE). The outer loops of all pairs run together,
+        and the Poisson's equations of "exp" algorithm in each iteration are solved in
+        batch. The converged pairs drop out of the active pairs as they finish.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            I1List {[list]} -- List of intra- or extra-focal images (Image).
+            I2List {[list]} -- List of intra- or extra-focal images (Image).
+            model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
+
+        Keyword Arguments:
+            tol {[float]} -- Tolerance of difference of coefficients of Zk polynomials compared
+                             with the previours iteration. (default: {1e-3})
+
+        Returns:
+            [list] -- Algorithm of each pair of images, which holds the calculated result.
+
+        Raises:
+            ValueError -- Numbers of I1 and I2 images are different.
+        """
+
+        if (len(I1List) != len(I2List)):
+            raise ValueError("Numbers of I1 (%d) and I2 (%d) images are different." % (
+                             len(I1List), len(I2List)))
+
+        # Each pair of images has its own state of iteration with the same settings
+        algoList = []
+        for ii in range(len(I1List)):
+            algo = copy.copy(self)
+            algo.reset()
+            algoList.append(algo)
+
+        # The iteration time is counted in the same way as runIt()
+        itrList = [algo.currentItr for algo in algoList]
+        activeList = list(range(len(algoList)))
+        while (len(activeList) > 0):
+
+            # Compensate the images of active pairs
+            solveList = []
+            pairImgList = []
+            recordList = []
+            for ii in activeList:
+                algo = algoList[ii]
+                if (algo.currentItr == 0):
+                    algo.__setPreCondition(inst, I1List[ii], I2List[ii], model)
+
+                if (not algo.caustic):
+                    pairImg = algo.__compensateItr(inst, I1List[ii], I2List[ii], model)
+                    if (pairImg is not None):
+                        solveList.append(ii)
+                        pairImgList.append(pairImg)
+                        recordList.append(ii)
+                else:
+                    algo.converge[:, algo.currentItr] = algo.converge[:, algo.currentItr - 1]
+                    recordList.append(ii)
+
+            # Solve the Poisson's equations
+            zcWestList = self.__solvePoissonEqBatch(
+                                    inst, [algoList[ii] for ii in solveList], pairImgList)
+            for ii, (zc, West) in zip(solveList, zcWestList):
+                algoList[ii].zc, algoList[ii].West = zc, West
+                algoList[ii].__updateCompensation(inst)
+
+            # Stop the iteration of outer loop if converged
+            stopList = []
+            for ii in recordList:
+                if (algoList[ii].__finishItr(tol)):
+                    stopList.append(ii)
+
+            nextActiveList = []
+            for ii in activeList:
+                itrList[ii] += 1
+                if (ii not in stopList) and (itrList[ii] <= self.parameter["outerItr"]):
+                    nextActiveList.append(ii)
+            activeList = nextActiveList
+
+        return algoList
+
     def nextItr(self, inst, I1, I2, model, nItr=1):
         """
 
@@ -378,7 +510,7 @@ class Algorithm(object):
         # Set the debug level
         self.debugLevel = debugLevel
 
-    def __singleItr(self, inst, I1, I2, model, tol=1e-3):
+    def __singleItr(self, inst, I1, I2, model, tol=1e-3, zcompInit=None):
         """
 
         Run the outer-loop with single iteration to solve the transport of intensity equation (TIE).
@@ -391,109 +523,196 @@ class Algorithm(object):
             model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
             tol {[float]} -- Tolerance of difference of coefficients of Zk polynomials compared with
                              the previours iteration.
-        """
-
-        # Use the zonal mode ("zer")
-        compMode = self.parameter["compMode"]
+            zcompInit {[ndarray]} -- Initial coefficients of Zk polynomials (z1 - zn) in meter
+                                     to compensate the images. (default: {None})
 
-        # Define the gain of feedbackGain
-        feedbackGain = self.parameter["feedbackGain"]
+        Returns:
+            [bool] -- Stop the iteration of outer loop or not.
+        """
 
         # Set the pre-condition
         if (self.currentItr == 0):
+            self.__setPreCondition(inst, I1, I2, model, zcompInit=zcompInit)
+
+        # Solve the transport of intensity equation (TIE)
+        if (not self.caustic):
+
+            # Compensate the images. If there is the problem, done with this __singleItr().
+            pairImg = self.__compensateItr(inst, I1, I2, model)
+            if (pairImg is None):
+                return
+
+            # Solve the Poisson's equation
+            self.zc, self.West = self.__solvePoissonEq(inst, pairImg[0], pairImg[1],
+                                                      self.currentItr)
+
+            # Record/ calculate the Zk coefficient and wavefront
+            self.__updateCompensation(inst)
+
+        else:
+            # Once we run into caustic, stop here, results may be close to real aberration.
+            # Continuation may lead to disatrous results.
+            self.converge[:, self.currentItr] = self.converge[:, self.currentItr - 1]
+
+        return self.__finishItr(tol)
 
-            # Check this is the first time of running iteration or not
-            if (I1.image0 is None or I2.image0 is None):
+    def __setPreCondition(self, inst, I1, I2, model, zcompInit=None):
+        """
+
+        Set the pre-condition of outer loop in the first iteration time. The masks and
+        initial images are calculated if this is the first time of running iteration.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            I1 {[Image]} -- Intra- or extra-focal image.
+            I2 {[Image]} -- Intra- or extra-focal image.
+            model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
 
-                # Check the image dimension
-                if (I1.image.shape != I2.image.shape):
-                    print("Error: The intra and extra image stamps need to be of same size.")
-                    sys.exit()
+        Keyword Arguments:
+            zcompInit {[ndarray]} -- Initial coefficients of Zk polynomials (z1 - zn) in meter
+                                     to compensate the images. (default: {None})
+
+        Raises:
+            ValueError -- Wrong number of initial Zk coefficients.
+        """
+
+        # Check the initial Zk coefficients before changing any state
+        numTerms = self.parameter["numTerms"]
+        if (zcompInit is not None) and (len(zcompInit) != numTerms):
+            raise ValueError("Number of initial Zk coefficients (%d) should be %d." % (
+                             len(zcompInit), numTerms))
+
+        # Check this is the first time of running iteration or not
+        if (I1.image0 is None or I2.image0 is None):
+
+            # Check the image dimension
+            if (I1.image.shape != I2.image.shape):
+                print("Error: The intra and extra image stamps need to be of same size.")
+                sys.exit()
+
+            # Calculate the pupil mask (binary matrix) and related parameters
+            I1.makeMask(inst, model, self.parameter["boundaryT"], 1)
+            I2.makeMask(inst, model, self.parameter["boundaryT"], 1)
+            self.__makeMasterMask(I1, I2, self.parameter["PoissonSolver"])
+
+            # Load the offAxis correction coefficients
+            if (model == "offAxis"):
+                instDir = os.path.join(inst.instDir, inst.instName)
+                I1.getOffAxisCorr(instDir, self.parameter["offAxisPolyOrder"])
+                I2.getOffAxisCorr(instDir, self.parameter["offAxisPolyOrder"])
+
+            # Cocenter the images to the center referenced to fieldX and fieldY. Need to check the
+            # availability of this.
+            I1.imageCoCenter(inst, debugLevel=self.debugLevel)
+            I2.imageCoCenter(inst, debugLevel=self.debugLevel)
+
+            # Update the self-initial image
+            I1.updateImage0()
+            I2.updateImage0()
+
+        # Initialize the variables used in the iteration. The compensation starts from the
+        # initial Zk coefficients if any.
+        self.zc = np.zeros(numTerms)
+        if (zcompInit is None):
+            self.zcomp = self.zc.copy()
+        else:
+            self.zcomp = np.array(zcompInit, dtype=float)
 
-                # Calculate the pupil mask (binary matrix) and related parameters
-                I1.makeMask(inst, model, self.parameter["boundaryT"], 1)
-                I2.makeMask(inst, model, self.parameter["boundaryT"], 1)
-                self.__makeMasterMask(I1, I2, self.parameter["PoissonSolver"])
+        self.accelHistory = None
+        self.convergeItr = None
 
-                # Load the offAxis correction coefficients
-                if (model == "offAxis"):
-                    instDir = os.path.join(inst.instDir, inst.instName)
-                    I1.getOffAxisCorr(instDir, self.parameter["offAxisPolyOrder"])
-                    I2.getOffAxisCorr(instDir, self.parameter["offAxisPolyOrder"])
+        sensorSamples = inst.parameter["sensorSamples"]
+        self.wcomp = np.zeros([sensorSamples, sensorSamples])
+        self.West = self.wcomp.copy()
 
-                # Cocenter the images to the center referenced to fieldX and fieldY. Need to check the
-                # availability of this.
-                I1.imageCoCenter(inst, debugLevel=self.debugLevel)
-                I2.imageCoCenter(inst, debugLevel=self.debugLevel)
+        self.caustic = False
 
-                # Update the self-initial image
-                I1.updateImage0()
-                I2.updateImage0()
+    def __compensateItr(self, inst, I1, I2, model):
+        """
 
-            # Initialize the variables used in the iteration.
-            self.zcomp = np.zeros(self.parameter["numTerms"])
-            self.zc = self.zcomp.copy()
+        Compensate the images with the Zk coefficients fed back from the previous iteration,
+        and apply the pupil masks to the images.
 
-            sensorSamples = inst.parameter["sensorSamples"]
-            self.wcomp = np.zeros([sensorSamples, sensorSamples])
-            self.West = self.wcomp.copy()
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            I1 {[Image]} -- Intra- or extra-focal image.
+            I2 {[Image]} -- Intra- or extra-focal image.
+            model {[string]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
 
-            self.caustic = False
+        Returns:
+            [tuple] -- Masked intra- and extra-focal images. None if there is the caustic.
+        """
 
         # Rename this index (currentItr) for the simplification
         jj = self.currentItr
 
-        # Solve the transport of intensity equation (TIE)
-        if (not self.caustic):
+        # Reset the images before the compensation
+        I1.resetImage()
+        I2.resetImage()
 
-            # Reset the images before the compensation
-            I1.updateImage(I1.image0.copy())
-            I2.updateImage(I2.image0.copy())
+        if (self.parameter["compMode"] == "zer"):
 
-            if (compMode == "zer"):
+            # Zk coefficient from the previous iteration
+            ztmp = self.zc
 
-                # Zk coefficient from the previous iteration
-                ztmp = self.zc
+            # Do the feedback of Zk from the lower terms first based on the
+            # sequence defined in compSequence
+            if (jj != 0):
+                compSequence = self.parameter["compSequence"]
+                ztmp[int(compSequence[jj - 1]):] = 0
 
-                # Do the feedback of Zk from the lower terms first based on the
-                # sequence defined in compSequence
-                if (jj != 0):
-                    compSequence = self.parameter["compSequence"]
-                    ztmp[int(compSequence[jj - 1]):] = 0
+            # Add partial feedback of residual estimated wavefront in Zk
+            if (self.parameter["acceleration"] == "anderson") and (jj != 0):
+                self.zcomp = self.__andersonMix(ztmp*self.parameter["feedbackGain"])
+            else:
+                self.zcomp = self.zcomp + ztmp*self.parameter["feedbackGain"]
 
-                # Add partial feedback of residual estimated wavefront in Zk
-                self.zcomp = self.zcomp + ztmp*feedbackGain
+            # Remove the image distortion if the optical model is not "paraxial"
+            # Only the optical model of "onAxis" or "offAxis" is considered here
+            I1.compensate(inst, self, self.zcomp, model)
+            I2.compensate(inst, self, self.zcomp, model)
 
-                # Remove the image distortion if the optical model is not "paraxial"
-                # Only the optical model of "onAxis" or "offAxis" is considered here
-                I1.compensate(inst, self, self.zcomp, model)
-                I2.compensate(inst, self, self.zcomp, model)
+        # Check the image condition
+        if (I1.caustic == True or I2.caustic == True):
+            self.converge[:, jj] = self.converge[:, jj - 1]
+            self.caustic = True
+            return None
 
-            # Check the image condition. If there is the problem, done with this __singleItr().
-            if (I1.caustic == True or I2.caustic == True):
-                self.converge[:, jj] = self.converge[:, jj - 1]
-                self.caustic = True
-                return
+        # Correct the defocal images if I1 and I2 are belong to different
+        # sources, which is determined by the (fieldX, field Y)
+        return self.__applyI1I2pMask(I1, I2)
 
-            # Correct the defocal images if I1 and I2 are belong to different
-            # sources, which is determined by the (fieldX, field Y)
-            I1, I2 = self.__applyI1I2pMask(I1, I2)
+    def __updateCompensation(self, inst):
+        """
 
-            # Solve the Poisson's equation
-            self.zc, self.West = self.__solvePoissonEq(inst, I1, I2, jj)
+        Record the Zk coefficients and compensated wavefront of this iteration.
 
-            # Record/ calculate the Zk coefficient and wavefront
-            if (compMode == "zer"):
-                self.converge[:, jj] = self.zcomp + self.zc
-                self.wcomp = self.West + ZernikeAnnularEval(
-                                                    np.concatenate(([0, 0, 0], self.zcomp[3:])),
-                                                    inst.xoSensor, inst.yoSensor,
-                                                    self.parameter["zobsR"])
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+        """
 
-        else:
-            # Once we run into caustic, stop here, results may be close to real aberration.
-            # Continuation may lead to disatrous results.
-            self.converge[:, jj] = self.converge[:, jj - 1]
+        if (self.parameter["compMode"] == "zer"):
+            self.converge[:, self.currentItr] = self.zcomp + self.zc
+            self.wcomp = self.West + ZernikeAnnularEval(
+                                                np.concatenate(([0, 0, 0], self.zcomp[3:])),
+                                                inst.xoSensor, inst.yoSensor,
+                                                self.parameter["zobsR"])
+
+    def __finishItr(self, tol):
+        """
+
+        Record the Zk coefficients after z4 and check the convergence of outer loop.
+
+        Arguments:
+            tol {[float]} -- Tolerance of difference of coefficients of Zk polynomials compared with
+                             the previours iteration.
+
+        Returns:
+            [bool] -- Stop the iteration of outer loop or not.
+        """
+
+        # Rename this index (currentItr) for the simplification
+        jj = self.currentItr
 
         # Record the coefficients of normal/ annular Zernike polynomials after z4
         # in unit of nm
@@ -513,6 +732,12 @@ class Algorithm(object):
         # Update the current iteration time
         self.currentItr += 1
 
+        # Record the iteration time to converge
+        if (stopItr):
+            self.convergeItr = self.currentItr
+            if (self.debugLevel >= 1):
+                print("Outer loop converges in %d iterations." % self.convergeItr)
+
         # Show the Zk coefficients in interger in each iteration
         if (self.debugLevel >= 2):
             tmp = self.zer4UpNm
@@ -521,11 +746,55 @@ class Algorithm(object):
 
         return stopItr
 
+    def __andersonMix(self, feedback):
+        """
+
+        Update the compensated Zk coefficients by the Anderson mixing of the previous
+        iterations. The plain update is zcomp + feedback. The Anderson mixing combines the
+        last updates to minimize the feedback in the least-squares sense. The history is
+        restarted when the fed back Zk terms in compSequence change.
+
+        Arguments:
+            feedback {[ndarray]} -- Feedback of Zk coefficients in this iteration
+                                    (residual Zk multiplied by feedback gain).
+
+        Returns:
+            [ndarray] -- Compensated Zk coefficients.
+        """
+
+        # Restart the history if the fed back Zk terms change
+        compTerm = int(self.parameter["compSequence"][self.currentItr - 1])
+        if (self.accelHistory is None) or (self.accelHistory["compTerm"] != compTerm):
+            self.accelHistory = {"compTerm": compTerm, "zcomp": [], "feedback": []}
+
+        # Keep the history within the depth
+        zcompList = self.accelHistory["zcomp"]
+        feedbackList = self.accelHistory["feedback"]
+        zcompList.append(self.zcomp.copy())
+        feedbackList.append(feedback.copy())
+        accelDepth = self.parameter["accelDepth"]
+        if (len(zcompList) > accelDepth + 1):
+            del zcompList[0]
+            del feedbackList[0]
+
+        # Plain update
+        zcomp = self.zcomp + feedback
+
+        # Combine the previous updates: min |f_k - dF*gamma|, z = z_k + f_k - (dZ + dF)*gamma
+        if (len(zcompList) > 1) and (compTerm >= self.parameter["numTerms"]):
+            dZ = np.diff(np.array(zcompList), axis=0).T
+            dF = np.diff(np.array(feedbackList), axis=0).T
+            gamma = np.linalg.lstsq(dF, feedback, rcond=None)[0]
+            zcomp = zcomp - (dZ + dF).dot(gamma)
+
+        return zcomp
+
+    @profileStage("Algorithm.solvePoissonEq")
     def __solvePoissonEq(self, inst, I1, I2, iOutItr=0):
         """
 
-        Solve the Poisson's equation by Fourier transform (differential) or serial expansion
-        (integration).
+        Solve the Poisson's equation by Fourier transform (differential), discrete cosine
+        transform (differential), or serial expansion (integration).
 
         There is no convergence for fft actually. Need to add the difference comparison and
         Xa method. Need to discuss further for this.
@@ -537,7 +806,7 @@ class Algorithm(object):
 
         Keyword Arguments:
             iOutItr {[int]} -- ith number of outer loop iteration which is important
-                               in "fft" algorithm (default: {0}).
+                               in "fft" and "dct" algorithms (default: {0}).
 
         Returns:
             [float] -- Coefficients of normal/ annular Zernike polynomials.
@@ -557,9 +826,9 @@ class Algorithm(object):
         numTerms = self.parameter["numTerms"]
         zobsR = self.parameter["zobsR"]
         PoissonSolver = self.parameter["PoissonSolver"]
-        if (PoissonSolver == "fft"):
+        if (PoissonSolver in ("fft", "dct")):
 
-            # Use the differential method by fft to solve the Poisson's equation
+            # Use the differential method by fft or dct to solve the Poisson's equation
 
             # Parameter to determine the threshold of calculating I0.
             sumclipSequence = self.parameter["sumclipSequence"]
@@ -576,12 +845,21 @@ class Algorithm(object):
                 print("iOuter=%d, cliplevel=%4.2f" % (iOutItr, cliplevel))
                 print(v.shape)
 
-            # Calculate the const of fft: FT{Delta W} = -4*pi^2*(u^2+v^2) * FT{W}
-            u2v2 = -4 * (np.pi**2) * (u*u + v*v)
+            if (PoissonSolver == "fft"):
+
+                # Calculate the const of fft: FT{Delta W} = -4*pi^2*(u^2+v^2) * FT{W}
+                u2v2 = -4 * (np.pi**2) * (u*u + v*v)
 
-            # Set origin to Inf to result in 0 at origin after filtering
-            ctrIdx = int(np.floor(padDim/2.0))
-            u2v2[ctrIdx, ctrIdx] = np.inf
+                # Set origin to Inf to result in 0 at origin after filtering
+                ctrIdx = int(np.floor(padDim/2.0))
+                u2v2[ctrIdx, ctrIdx] = np.inf
+
+            else:
+
+                # The dct diagonalizes the discrete Laplacian with dW/dn = 0 on the boundary of
+                # padded grid. This avoids the wrap-around of periodic fft, and the boundary
+                # condition on the aperture converges in fewer inner iterations.
+                eigenvalue = self.__getDctEigenvalue(padDim, dOmega)
 
             # Calculate the wavefront signal
             Sini = self.__createSignal(inst, I1, I2, cliplevel)
@@ -589,27 +867,28 @@ class Algorithm(object):
             # Find the just-outside and just-inside indices of a ring in pixels
             # This is for the use in setting dWdn = 0
             boundaryT = self.parameter["boundaryT"]
-
-            struct = generate_binary_structure(2, 1)
-            struct = iterate_structure(struct, boundaryT)
-
-            ApringOut = np.logical_xor(binary_dilation(self.pMask, structure=struct),
-                                       self.pMask).astype(int)
-            ApringIn = np.logical_xor(binary_erosion(self.pMask, structure=struct),
-                                      self.pMask).astype(int)
-
-            bordery, borderx = np.nonzero(ApringOut)
+            ring = self.__getBoundaryRing(boundaryT)
+            borderIdx = ring["borderIdx"]
 
             # Put the signal in boundary (since there's no existing Sestimate, S just equals self.S
             # as the initial condition of SCF
             S = Sini.copy()
             for jj in range(int(self.parameter["innerItr"])):
 
-                # Calculate FT{S}
-                SFFT = np.fft.fftshift(np.fft.fft2(np.fft.fftshift(S)))
+                if (PoissonSolver == "fft"):
+
+                    # Calculate FT{S}
+                    SFFT = np.fft.fftshift(np.fft.fft2(np.fft.fftshift(S)))
+
+                    # Calculate W by W=IFT{ FT{S}/(-4*pi^2*(u^2+v^2)) }
+                    W = np.fft.fftshift(np.fft.irfft2(np.fft.fftshift(SFFT/u2v2), s=S.shape))
 
-                # Calculate W by W=IFT{ FT{S}/(-4*pi^2*(u^2+v^2)) }
-                W = np.fft.fftshift(np.fft.irfft2(np.fft.fftshift(SFFT/u2v2), s=S.shape))
+                else:
+
+                    # Calculate W by W=IDCT{ DCT{S}/lambda }, lambda: eigenvalue of Laplacian
+                    SDCT = dct(dct(S, type=2, norm="ortho", axis=0), type=2, norm="ortho", axis=1)
+                    W = idct(idct(SDCT/eigenvalue, type=2, norm="ortho", axis=0), type=2, 
+                             norm="ortho", axis=1)
 
                 # Estimate the wavefront (includes zeroing offset & masking to the aperture size)
 
@@ -625,19 +904,10 @@ class Algorithm(object):
                 WestdWdn0 = West.copy()
 
                 # Do a 3x3 average around each border pixel, including only those pixels
-                # inside the aperture
-                for ii in range(len(borderx)):
-                    reg = West[borderx[ii] - boundaryT:
-                               borderx[ii] + boundaryT + 1,
-                               bordery[ii] - boundaryT:
-                               bordery[ii] + boundaryT + 1]
-
-                    intersectIdx = ApringIn[borderx[ii] - boundaryT:
-                                            borderx[ii] + boundaryT + 1,
-                                            bordery[ii] - boundaryT:
-                                            bordery[ii] + boundaryT + 1]
-
-                    WestdWdn0[borderx[ii], bordery[ii]] = reg[np.nonzero(intersectIdx)].mean()
+                # inside the aperture. This is the box sum of wavefront in the inner ring
+                # divided by the number of inner ring pixels in the box.
+                WestSum = correlate(West*ring["ApringIn"], ring["box"], mode="constant")
+                WestdWdn0[borderIdx] = WestSum[borderIdx]/ring["borderCount"]
 
                 # Take Laplacian to find sensor signal estimate (Delta W = S)
                 del2W = laplace(WestdWdn0)/dOmega
@@ -656,7 +926,7 @@ class Algorithm(object):
 
             # Calculate the coefficient of normal/ annular Zernike polynomials
             if (self.parameter["compMode"] == "zer"):
-                zc = ZernikeMaskedFit(West, inst.xSensor, inst.ySensor, numTerms, self.pMask, zobsR)
+                zc = self.__getZernikeFitter(inst).fit(West, numTerms, zobsR, mask=self.pMask)
             else:
                 zc = np.zeros(numTerms)
 
@@ -664,65 +934,316 @@ class Algorithm(object):
 
             # Use the integration method by serial expansion to solve the Poisson's equation
 
-            # Calculate I0 and dI
-            I0, dI = self.__getdIandI(I1, I2)
+            # Get the annular Zernike basis and the expansion of I0 and dI on it
+            basis, zkMat, dZiMat, I0, dI = self.__getExpSignal(inst, I1, I2)
 
-            # Get the x, y coordinate in mask. The element outside mask is 0.
-            xSensor = inst.xSensor*self.cMask
-            ySensor = inst.ySensor*self.cMask
+            # Create the F matrix: F_i = sum(dI*Z_i)*dOmega
+            F = zkMat.dot(dI)*dOmega
 
-            # Create the F matrix and Zernike-related matrixes
-            F = np.zeros(numTerms)
-            dZidx = np.zeros([numTerms, sensorSamples, sensorSamples])
-            dZidy = dZidx.copy()
+            # Calculate Mij matrix: M_ij = sum(I0*(dZi/dx*dZj/dx + dZi/dy*dZj/dy))
+            # The gradients in x and y are stacked, so this is a single symmetric product.
+            weighted = dZiMat*np.tile(I0, 2)
+            Mij = weighted.dot(dZiMat.T)
 
-            zcCol = np.zeros(numTerms)
-            for ii in range(int(numTerms)):
+            # Solve the Zk coefficients and estimate the wavefront
+            zc, West = self.__solveExpCoeff(inst, basis, F, Mij, dOmega)
 
-                # Calculate the matrix for each Zk related component
-                # Set the specific Zk cofficient to be 1 for the calculation
-                zcCol[ii] = 1
+        return zc, West
+
+    @profileStage("Algorithm.solvePoissonEqBatch")
+    def __solvePoissonEqBatch(self, inst, algoList, pairImgList, chunkSize=8):
+        """
+
+        Solve the Poisson's equations of multiple pairs of images. For the serial expansion
+        ("exp") algorithm, the F and Mij matrices of pairs on the same Zernike basis are
+        calculated with the stacked images. Other algorithms solve each pair in turn.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            algoList {[list]} -- Algorithm of each pair of images.
+            pairImgList {[list]} -- Masked intra- and extra-focal images of each pair.
+
+        Keyword Arguments:
+            chunkSize {[int]} -- Number of pairs in a stacked product of Mij to limit the
+                                 memory. (default: {8})
+
+        Returns:
+            [list] -- Coefficients of normal/ annular Zernike polynomials and estimated
+                      wavefront of each pair.
+        """
 
-                F[ii] = np.sum(dI*ZernikeAnnularEval(zcCol, xSensor, ySensor, zobsR))*dOmega
-                dZidx[ii, :, :] = ZernikeAnnularGrad(zcCol, xSensor, ySensor, zobsR, "dx")
-                dZidy[ii, :, :] = ZernikeAnnularGrad(zcCol, xSensor, ySensor, zobsR, "dy")
+        if (self.parameter["PoissonSolver"] != "exp"):
+            return [algo.__solvePoissonEq(inst, I1, I2, algo.currentItr)
+                    for algo, (I1, I2) in zip(algoList, pairImgList)]
 
-                # Set the specific Zk cofficient back to 0 to avoid interfering other Zk's calculation
-                zcCol[ii] = 0
+        # Calculate the differential Omega
+        aperturePixelSize = inst.parameter["apertureDiameter"]*inst.parameter["sensorFactor"]/ \
+                            inst.parameter["sensorSamples"]
+        dOmega = aperturePixelSize**2
 
-            # Calculate Mij matrix, need to check the stability of integration and symmetry later
-            Mij = np.zeros([numTerms, numTerms])
-            for ii in range(numTerms):
-                for jj in range(numTerms):
-                    Mij[ii, jj] = np.sum( I0*(dZidx[ii, :, :].squeeze()*dZidx[jj, :, :].squeeze() +
-                                              dZidy[ii, :, :].squeeze()*dZidy[jj, :, :].squeeze()) )
-            Mij = dOmega/(apertureDiameter/2.)**2 * Mij
+        # Group the pairs by the Zernike basis matrix used
+        groupMap = OrderedDict()
+        for ii, (algo, (I1, I2)) in enumerate(zip(algoList, pairImgList)):
+            basis, zkMat, dZiMat, I0, dI = algo.__getExpSignal(inst, I1, I2)
+            key = (id(basis), zkMat.shape)
+            if key not in groupMap:
+                groupMap[key] = (basis, zkMat, dZiMat, [])
+            groupMap[key][3].append((ii, I0, dI))
 
-            # Calculate dz
-            focalLength = inst.parameter["focalLength"]
-            offset = inst.parameter["offset"]
-            dz = 2*focalLength*(focalLength-offset)/offset
+        zcWestList = [None]*len(algoList)
+        for basis, zkMat, dZiMat, member in groupMap.values():
 
-            # Define zc
-            zc = np.zeros(numTerms)
+            # Create the F matrices: F_i = sum(dI*Z_i)*dOmega
+            dIStack = np.array([dI for ii, I0, dI in member])
+            FStack = dIStack.dot(zkMat.T)*dOmega
 
-            # Consider specific Zk terms only
-            idx = [x - 1 for x in self.parameter["ZTerms"]]
+            # Calculate the Mij matrices in chunks
+            I0Stack = np.array([I0 for ii, I0, dI in member])
+            MijStack = np.empty((len(member), zkMat.shape[0], zkMat.shape[0]))
+            for start in range(0, len(member), chunkSize):
+                weighted = dZiMat*np.tile(I0Stack[start:start+chunkSize], 2)[:, np.newaxis, :]
+                MijStack[start:start+chunkSize] = np.matmul(weighted, dZiMat.T)
 
-            # Solve the equation: M*W = F => W = M^(-1)*F
-            zc_tmp = np.linalg.lstsq(Mij[:, idx][idx], F[idx])[0]/dz
-            zc[idx] = zc_tmp
+            for (ii, I0, dI), F, Mij in zip(member, FStack, MijStack):
+                zcWestList[ii] = algoList[ii].__solveExpCoeff(inst, basis, F, Mij, dOmega)
 
-            # Estimate the wavefront surface based on z4 - z22
-            # z0 - z3 are set to be 0 instead
-            West = ZernikeAnnularEval(np.concatenate(([0, 0, 0], zc[3:])), xSensor, ySensor, zobsR)
+        return zcWestList
+
+    def __getExpSignal(self, inst, I1, I2):
+        """
+
+        Get the annular Zernike basis and the I0 and dI used by the serial expansion
+        ("exp") algorithm.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            I1 {[Image]} -- Intra- or extra-focal image.
+            I2 {[Image]} -- Intra- or extra-focal image.
+
+        Returns:
+            [dict] -- Annular Zernike basis in the computation mask.
+            [ndarray] -- Zk polynomials in the used pixels (numTerms x pixels).
+            [ndarray] -- Stacked x, y-gradients of Zk in the used pixels
+                         (numTerms x 2*pixels).
+            [ndarray] -- I0 in the used pixels.
+            [ndarray] -- dI in the used pixels.
+        """
+
+        # Calculate I0 and dI
+        I0, dI = self.__getdIandI(I1, I2)
+
+        # Get the annular Zernike basis and its gradients in the mask. These only depend
+        # on the instrument, mask, and obscuration, and are reused in all iterations.
+        numTerms = self.parameter["numTerms"]
+        basis = self.__getZernikeBasis(inst, self.cMask, numTerms, self.parameter["zobsR"])
+
+        # Only the pixels in the mask contribute to F and Mij if the compensated images
+        # vanish outside the mask. Otherwise, use all pixels.
+        maskIdx = basis["maskIdx"]
+        I0 = I0.ravel()
+        dI = dI.ravel()
+        if (np.any(I0[basis["outMaskIdx"]]) or np.any(dI[basis["outMaskIdx"]])):
+            zkMat = basis["zk"].reshape(numTerms, -1)
+            dZiMat = np.hstack((basis["dZidx"].reshape(numTerms, -1),
+                                basis["dZidy"].reshape(numTerms, -1)))
+        else:
+            zkMat = basis["zkMask"]
+            dZiMat = basis["dZiMask"]
+            I0 = I0[maskIdx]
+            dI = dI[maskIdx]
+
+        return basis, zkMat, dZiMat, I0, dI
+
+    def __solveExpCoeff(self, inst, basis, F, Mij, dOmega):
+        """
+
+        Solve the coefficients of annular Zernike polynomials from M*W = F in the serial
+        expansion ("exp") algorithm.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            basis {[dict]} -- Annular Zernike basis in the computation mask.
+            F {[ndarray]} -- F matrix: F_i = sum(dI*Z_i)*dOmega.
+            Mij {[ndarray]} -- Mij matrix before the normalization:
+                               M_ij = sum(I0*(dZi/dx*dZj/dx + dZi/dy*dZj/dy)).
+            dOmega {[float]} -- Differential Omega (pixel area on the aperture).
+
+        Returns:
+            [float] -- Coefficients of normal/ annular Zernike polynomials.
+            [float] -- Estimated wavefront.
+        """
+
+        # Normalize the Mij matrix
+        Mij = (Mij + Mij.T)/2
+        Mij = dOmega/(inst.parameter["apertureDiameter"]/2.)**2 * Mij
+
+        # Calculate dz
+        focalLength = inst.parameter["focalLength"]
+        offset = inst.parameter["offset"]
+        dz = 2*focalLength*(focalLength-offset)/offset
+
+        # Define zc
+        zc = np.zeros(self.parameter["numTerms"])
+
+        # Consider specific Zk terms only
+        idx = [x - 1 for x in self.parameter["ZTerms"]]
+
+        # Solve the equation: M*W = F => W = M^(-1)*F
+        zc_tmp = np.linalg.lstsq(Mij[:, idx][idx], F[idx])[0]/dz
+        zc[idx] = zc_tmp
+
+        # Estimate the wavefront surface based on z4 - z22
+        # z0 - z3 are set to be 0 instead
+        West = np.tensordot(zc[3:], basis["zk"][3:, :, :], axes=1)
 
         return zc, West
 
+    def __getBoundaryRing(self, boundaryT):
+        """
+
+        Get the just-outside and just-inside rings of the aperture used in setting dW/dn = 0 in
+        "fft" and "dct". The result only depends on the mask and is kept until the mask changes.
+
+        Arguments:
+            boundaryT {[int]} -- Width of the Neumann boundary in pixel.
+
+        Returns:
+            [dict] -- "ApringIn" is the just-inside ring. "box" is the (2*boundaryT+1) box
+                      around the border pixel. "borderIdx" is the index of border pixels, and
+                      "borderCount" is the number of just-inside ring pixels in their boxes.
+        """
+
+        if (self.boundaryRing is not None) and (self.boundaryRing["boundaryT"] == boundaryT):
+            return self.boundaryRing
+
+        struct = generate_binary_structure(2, 1)
+        struct = iterate_structure(struct, boundaryT)
+
+        ApringOut = np.logical_xor(binary_dilation(self.pMask, structure=struct),
+                                   self.pMask).astype(int)
+        ApringIn = np.logical_xor(binary_erosion(self.pMask, structure=struct),
+                                  self.pMask).astype(int)
+
+        # The border pixels are indexed as (x, y) from the (row, column) of ApringOut.
+        bordery, borderx = np.nonzero(ApringOut)
+        borderIdx = (borderx, bordery)
+
+        # Number of just-inside ring pixels in the box around each border pixel
+        box = np.ones((2*boundaryT + 1, 2*boundaryT + 1))
+        borderCount = correlate(ApringIn.astype(float), box, mode="constant")[borderIdx]
+
+        self.boundaryRing = dict(boundaryT=boundaryT, ApringIn=ApringIn, box=box,
+                                 borderIdx=borderIdx, borderCount=borderCount)
+
+        return self.boundaryRing
+
+    def __getDctEigenvalue(self, padDim, dOmega):
+        """
+
+        Get the eigenvalues of 5-point discrete Laplacian with the Neumann boundary condition
+        in the basis of type-II discrete cosine transform. The eigenvalue of constant term is
+        set to be Inf to result in 0 after filtering.
+
+        Arguments:
+            padDim {[int]} -- Dimension of padded grid.
+            dOmega {[float]} -- Area of pixel.
+
+        Returns:
+            [ndarray] -- Eigenvalues in the dimension of padDim x padDim.
+        """
+
+        eig1d = 2*np.cos(np.pi*np.arange(padDim)/padDim) - 2
+        eigenvalue = (eig1d[:, np.newaxis] + eig1d[np.newaxis, :])/dOmega
+        eigenvalue[0, 0] = np.inf
+
+        return eigenvalue
+
+    def __getZernikeFitter(self, inst):
+        """
+
+        Get the annular Zernike fitter on the sensor grid of instrument. The fitter keeps the
+        factorization of least-squares fit, so the fit in each outer iteration with the same
+        mask is a matrix-vector product.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+
+        Returns:
+            [ZernikeAnnularFitter] -- Annular Zernike fitter.
+        """
+
+        key = (inst.filename, inst.parameter["sensorSamples"])
+        if key not in Algorithm._zkFitterCache:
+            Algorithm._zkFitterCache[key] = ZernikeAnnularFitter(inst.xSensor, inst.ySensor)
+
+        return Algorithm._zkFitterCache[key]
+
+    def __getZernikeBasis(self, inst, cMask, numTerms, zobsR):
+        """
+
+        Get the annular Zernike polynomials and their x, y-gradients evaluated on the sensor
+        grid in the mask. The element outside the mask is evaluated at the origin. The result
+        is kept in a least-recently-used cache shared by all Algorithm instances and keyed by
+        the instrument, sensor samples, obscuration, number of terms, and mask.
+
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            cMask {[int]} -- Non-padded mask corresponding to aperture.
+            numTerms {[int]} -- Number of annular Zernike terms.
+            zobsR {[float]} -- Obscuration ratio of annular Zernikes.
+
+        Returns:
+            [dict] -- Annular Zernike basis. "zk", "dZidx", and "dZidy" are the polynomials and
+                      their x, y-gradients (numTerms x sensorSamples x sensorSamples).
+                      "maskIdx" and "outMaskIdx" are the flattened indexes inside and outside
+                      the mask. "zkMask" (numTerms x nMask) and "dZiMask" (numTerms x 2nMask)
+                      are the polynomials and stacked x, y-gradients compressed to the mask.
+        """
+
+        # Construct the key of cache
+        maskHash = hashlib.sha1(np.ascontiguousarray(cMask, dtype=np.int8).tobytes()).hexdigest()
+        key = (inst.filename, inst.parameter["sensorSamples"], zobsR, numTerms, maskHash)
+
+        # Return the cached basis if it exists
+        cache = Algorithm._zkBasisCache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        # Get the x, y coordinate in mask. The element outside mask is 0.
+        xSensor = inst.xSensor*cMask
+        ySensor = inst.ySensor*cMask
+
+        # Calculate the basis of all Zk terms
+        zk = ZernikeAnnularEvalBasis(xSensor, ySensor, zobsR, numTerms)
+        dZidx = ZernikeAnnularGradBasis(xSensor, ySensor, zobsR, "dx", numTerms)
+        dZidy = ZernikeAnnularGradBasis(xSensor, ySensor, zobsR, "dy", numTerms)
+
+        # Compress the basis to the pixels in the mask
+        maskIdx = np.flatnonzero(cMask)
+        outMaskIdx = np.flatnonzero(cMask == 0)
+        zkMask = zk.reshape(numTerms, -1)[:, maskIdx]
+        dZiMask = np.hstack((dZidx.reshape(numTerms, -1)[:, maskIdx],
+                             dZidy.reshape(numTerms, -1)[:, maskIdx]))
+
+        # The cached arrays are shared, so protect them from the modification
+        basis = dict(zk=zk, dZidx=dZidx, dZidy=dZidy, maskIdx=maskIdx, outMaskIdx=outMaskIdx,
+                     zkMask=zkMask, dZiMask=dZiMask)
+        for value in basis.values():
+            value.setflags(write=False)
+
+        # Put into the cache and evict the least-recently-used one if needed
+        cache[key] = basis
+        while (len(cache) > Algorithm.ZK_BASIS_CACHE_SIZE):
+            cache.popitem(last=False)
+
+        return basis
+
     def __createSignal(self, inst, I1, I2, cliplevel):
         """
 
-        Calculate the wavefront singal for "fft" to use in solving the Poisson's equation.
+        Calculate the wavefront singal for "fft" and "dct" to use in solving the Poisson's
+        equation.
 
         Need to discuss the method to define threshold and discuss to use np.median() instead.
         Need to discuss why the calculation of I0 is different from "exp".
@@ -848,9 +1369,9 @@ class Algorithm(object):
             I2 {[Image]} -- Intra- or extra-focal image.
 
         Keyword Arguments:
-            poissonSolver {[string]} -- Algorithm to solve the Poisson's equation. If the "fft" is
-                                        used, the mask dimension will be extended to the order of 2
-                                        for the "fft" to use.
+            poissonSolver {[string]} -- Algorithm to solve the Poisson's equation. If the "fft" or
+                                        "dct" is used, the mask dimension will be extended to the
+                                        order of 2 for the "fft" or "dct" to use.
         """
 
         # Get the overlap region of mask for intra- and extra-focal images. This is to avoid the
@@ -858,8 +1379,11 @@ class Algorithm(object):
         self.pMask = I1.pMask*I2.pMask
         self.cMask = I1.cMask*I2.cMask
 
-        # Change the dimension of image for fft to use
-        if (poissonSolver == "fft"):
+        # The boundary ring depends on the mask
+        self.boundaryRing = None
+
+        # Change the dimension of image for fft and dct to use
+        if (poissonSolver in ("fft", "dct")):
             padDim = self.parameter["padDim"]
             self.pMaskPad = padArray(self.pMask, padDim)
             self.cMaskPad = padArray(self.cMask, padDim)
@@ -920,8 +1444,8 @@ class Algorithm(object):
         # inner loop, this attribute will exist.
         try:
             # Reset the images to the first beginning
-            I1.updateImage(I1.image0.copy())
-            I2.updateImage(I2.image0.copy())
+            I1.resetImage()
+            I2.resetImage()
 
             # Show the information of resetting image
             if (self.debugLevel >= 3):
@@ -1073,6 +1597,9 @@ class AlgorithmTest(unittest.TestCase):
         Zk = algo.zer4UpNm
         self.assertEqual(int(Zk[7]), -192)
 
+        # The annular Zernike basis is calculated once for the same mask
+        self.assertEqual(len(Algorithm._zkBasisCache), 1)
+
         # Reset and check the calculation again
         fieldXY = [self.I1.fieldX, self.I1.fieldY]
         self.I1.setImg(fieldXY, image=self.I1.image0, atype=self.I1.atype)
@@ -1082,6 +1609,32 @@ class AlgorithmTest(unittest.TestCase):
         Zk = algo.zer4UpNm
         self.assertEqual(int(Zk[7]), -192)
 
+        # Warm start from the prior solution converges in fewer iterations. The tolerance of
+        # 1e-3 nm is not reached in the maximum outer iterations without the warm start.
+        numOfItr = algo.currentItr
+        zcompInit = algo.converge[:, numOfItr-1].copy()
+        self.I1.setImg(fieldXY, image=self.I1.image0, atype=self.I1.atype)
+        self.I2.setImg(fieldXY, image=self.I2.image0, atype=self.I2.atype)
+        algo.reset()
+        algo.runIt(self.inst, self.I1, self.I2, self.opticalModel, tol=1, 
+                   zcompInit=zcompInit)
+        self.assertLess(algo.currentItr, numOfItr)
+        self.assertLess(np.max(np.abs(algo.zer4UpNm-Zk)), 1)
+
+        algo.reset()
+        self.assertRaises(ValueError, algo.runIt, self.inst, self.I1, self.I2, 
+                          self.opticalModel, zcompInit=zcompInit[3:])
+
+        # The Anderson mixing converges within the outer iterations
+        self.assertEqual(algo.parameter["acceleration"], "none")
+        algo.parameter["acceleration"] = "anderson"
+        self.I1.setImg(fieldXY, image=self.I1.image0, atype=self.I1.atype)
+        self.I2.setImg(fieldXY, image=self.I2.image0, atype=self.I2.atype)
+        algo.reset()
+        algo.runIt(self.inst, self.I1, self.I2, self.opticalModel, tol=1)
+        self.assertLessEqual(algo.convergeItr, algo.parameter["outerItr"])
+        self.assertLess(np.max(np.abs(algo.zer4UpNm-Zk)), 1)
+
     def testFFT(self):
 
         # Define the algorithm folder
@@ -1101,6 +1654,28 @@ class AlgorithmTest(unittest.TestCase):
         Zk = algo.zer4UpNm
         self.assertEqual(int(Zk[7]), -192)
 
+        # Each border pixel has the just-inside ring pixels to average
+        ring = algo.boundaryRing
+        self.assertEqual(len(ring["borderIdx"][0]), len(ring["borderCount"]))
+        self.assertTrue(np.all(ring["borderCount"] > 0))
+
+    def testDCT(self):
+
+        # Define the algorithm folder
+        algoFolderPath = os.path.join(self.modulePath, "algoData", "cwfs", "algo")
+
+        # Define the algorithm to be used.
+        algo = Algorithm(algoFolderPath)
+        algo.config("dct", self.inst, debugLevel=0)
+        self.assertEqual(algo.parameter["innerItr"], 2)
+
+        # Run it
+        algo.runIt(self.inst, self.I1, self.I2, self.opticalModel, tol=1e-3)
+
+        # Check the value
+        Zk = algo.zer4UpNm
+        self.assertAlmostEqual(Zk[7], -192, delta=2)
+
 if __name__ == "__main__":
 
     # Do the unit test
@@ -1,4 +1,5 @@
 import os, re, sys, unittest
+from collections import OrderedDict
 import numpy as np
 
 from scipy.ndimage import generate_binary_structure, iterate_structure
@@ -10,6 +11,7 @@ from lsst.ts.wep.cwfs.lib.cyMath import poly10_2D, poly10Grad
 from lsst.ts.wep.cwfs.Image import Image
 from lsst.ts.wep.cwfs.Instrument import Instrument
 from lsst.ts.wep.Utility import getModulePath
+from lsst.ts.wep.StageProfiler import profileStage
 
 class CompensationImageDecorator(object):
 
@@ -17,6 +19,20 @@ class CompensationImageDecorator(object):
     INTRA = "intra"
     EXTRA = "extra"
 
+    # Process-wide cache of the instrument tables (off-axis correction and mask_migrate)
+    # keyed by the file path. The tables are read-only after loading.
+    _instTableCache = dict()
+
+    # Process-wide cache of off-axis correction files keyed by the instrument directory
+    _offAxisFileCache = dict()
+
+    # Maximum number of off-axis distortion maps kept in the process-wide cache
+    DISTORTION_CACHE_SIZE = 32
+
+    # Least-recently-used cache of off-axis distortion maps keyed by the instrument, 
+    # field position, defocal type, and projected samples
+    _distortionCache = OrderedDict()
+
     def __init__(self):
         """
         
@@ -30,6 +46,7 @@ class CompensationImageDecorator(object):
         self.fieldX = None
         self.fieldY = None
         self.image0 = None
+        self.image0Version = None
         self.fldr = None
         self.atype = None
         self.offAxis_coeff = None
@@ -89,6 +106,7 @@ class CompensationImageDecorator(object):
 
         # Save the initial image if we want the compensator always start from this
         self.image0 = None
+        self.image0Version = None
 
         # We will need self.fldr to be on denominator
         self.fldr = np.max((np.hypot(self.fieldX, self.fieldY), 1e-8))        
@@ -120,7 +138,21 @@ class CompensationImageDecorator(object):
 
         # Update the initial image for future use
         self.image0 = self.__image.image.copy()
+        self.image0Version = self.__image.imageVersion
+
+    def resetImage(self):
+        """
+        
+        Reset the image to the backup of initial image (image0). The version of image0 is 
+        restored as well to reuse the memoized centroid of image0.
+        
+        Raises:
+            AttributeError -- There is no image0.
+        """
 
+        self.__image.updateImage(self.image0.copy(), imageVersion=self.image0Version)
+
+    @profileStage("CompensationImageDecorator.imageCoCenter")
     def imageCoCenter(self, inst, fov=3.5, debugLevel=0):
         """
         
@@ -176,6 +208,7 @@ class CompensationImageDecorator(object):
         self.__image.updateImage(np.roll(self.__image.image, int(np.round(stampCentery1 - y1)), axis=0))
         self.__image.updateImage(np.roll(self.__image.image, int(np.round(stampCenterx1 - x1)), axis=1))
 
+    @profileStage("CompensationImageDecorator.compensate")
     def compensate(self, inst, algo, zcCol, model):
         """
         
@@ -248,8 +281,8 @@ class CompensationImageDecorator(object):
         # +(-) means we need to move image upward (downward)
         shifty = projcy - realcy
         
-        self.__image.image = np.roll(self.__image.image, int(np.round(shifty)), axis=0)
-        self.__image.image = np.roll(self.__image.image, int(np.round(shiftx)), axis=1)
+        image = np.roll(self.__image.image, int(np.round(shifty)), axis=0)
+        image = np.roll(image, int(np.round(shiftx)), axis=1)
 
         # Construct the interpolant to get the intensity on (x', p') plane
         # that corresponds to the grid points on (x,y)
@@ -263,32 +296,33 @@ class CompensationImageDecorator(object):
         lutyp[np.isnan(lutyp)] = 0
 
         # Construct the function for interpolation
-        ip = RectBivariateSpline(yp[:, 0], xp[0, :], self.__image.image, kx=1, ky=1)
+        ip = RectBivariateSpline(yp[:, 0], xp[0, :], image, kx=1, ky=1)
 
-        # Construct the projected image by the interpolation
-        lutIp = np.zeros(lutxp.shape[0]*lutxp.shape[1])
-        for ii, (xx, yy) in enumerate(zip(lutxp.ravel(), lutyp.ravel())):
-            lutIp[ii] = ip(yy, xx)
-        lutIp = lutIp.reshape(lutxp.shape)
+        # Construct the projected image by the interpolation. Evaluate all points in a
+        # single call instead of one by one.
+        lutIp = ip.ev(lutyp.ravel(), lutxp.ravel()).reshape(lutxp.shape)
 
         # Calaculate the image on focal plane with compensation based on flux conservation
         # I(x, y)/I'(x', y') = J = (dx'/dx)*(dy'/dy) - (dx'/dy)*(dy'/dx) 
-        self.__image.image = lutIp*J
+        image = lutIp*J
 
         if (self.atype == "extra"):
-            self.__image.image = np.rot90(self.__image.image, k=2)
+            image = np.rot90(image, k=2)
 
         # Put NaN to be 0
-        self.__image.image[np.isnan(self.__image.image)] = 0
+        image[np.isnan(image)] = 0
 
         # Check the compensated image has the problem or not.
         # The negative value means the over-compensation from wavefront error
-        if (np.any(self.__image.image < 0) and np.all(self.image0 >= 0)):
+        if (np.any(image < 0) and np.all(self.image0 >= 0)):
             print("WARNING: negative scale parameter, image is within caustic, zcCol (in um)=\n")
             self.caustic = True
 
         # Put the overcompensated part to be 0.
-        self.__image.image[self.__image.image < 0] = 0
+        image[image < 0] = 0
+
+        # Update the image in a single step to have a new image version
+        self.__image.updateImage(image)
 
     def __aperture2image(self, inst, algo, zcCol, lutx, luty, projSamples, model):
         """
@@ -323,12 +357,6 @@ class CompensationImageDecorator(object):
         focalLength = inst.parameter["focalLength"]
         myC = -focalLength*(focalLength - l)/l/R**2
 
-        # Get the functions to do the off-axis correction by numerical fitting
-        # Order to do the off-axis correction. The order is 10 now.
-        offAxisPolyOrder = algo.parameter["offAxisPolyOrder"]
-        polyFunc = self.__getFunction("poly%d_2D" % offAxisPolyOrder)
-        polyGradFunc = self.__getFunction("poly%dGrad" % offAxisPolyOrder)
-    
         # Calculate the distance to center
         lutr = np.sqrt(lutx**2 + luty**2)
 
@@ -389,64 +417,14 @@ class CompensationImageDecorator(object):
 
         elif (model == "offAxis"):
 
-            # Get the coefficient of polynomials for off-axis correction
-            tt = self.offAxisOffset
-
-            cx = (self.offAxis_coeff[0, :] - self.offAxis_coeff[2, :]) * (tt+l)/(2*tt) + \
-                    self.offAxis_coeff[2, :]
-            cy = (self.offAxis_coeff[1, :] - self.offAxis_coeff[3, :]) * (tt+l)/(2*tt) + \
-                    self.offAxis_coeff[3, :]
-
-            # This will be inverted back by typesign later on.
-            # We do the inversion here to make the (x,y)->(x',y') equations has
-            # the same form as the paraxial case.
-            cx = np.sign(l)*cx
-            cy = np.sign(l)*cy
-
-            # Do the orthogonalization: x'=1/sqrt(2)*(x+y), y'=1/sqrt(2)*(x-y)
-            # Calculate the rotation angle for the orthogonalization
-            costheta = (self.fieldX + self.fieldY)/self.fldr/np.sqrt(2)
-            if (costheta > 1):
-                costheta = 1
-            elif (costheta < -1):
-                costheta = -1
-    
-            sintheta = np.sqrt(1 - costheta**2)
-            if (self.fieldY < self.fieldX):
-                sintheta = -sintheta
-    
-            # Create the pupil grid in off-axis model. This gives the x,y-coordinate 
-            # in the extended ring area defined by the parameter of onepixel.
-
-            # Get the mask-related parameters
-            maskCa, maskRa, maskCb, maskRb = self.__interpMaskParam(self.fieldX, 
-                                                        self.fieldY, inst.maskParam)
-
-            lutx, luty = self.__createPupilGrid(lutx, luty, onepixel, maskCa, 
-                                maskCb, maskRa, maskRb, self.fieldX, self.fieldY)
-
-            # Calculate the x, y-coordinate on focal plane
-
-            # First rotate back to reference orientation
-            lutx0 = lutx*costheta + luty*sintheta
-            luty0 = -lutx*sintheta + luty*costheta
-
-            # Use the mapping at reference orientation
-            lutxp0 = polyFunc(cx, lutx0, y=luty0)
-            lutyp0 = polyFunc(cy, lutx0, y=luty0)
-            
-            # Rotate back to focal plane
-            lutxp = lutxp0*costheta - lutyp0*sintheta  
-            lutyp = lutxp0*sintheta + lutyp0*costheta
-
-            # Zemax data are in mm, therefore 1000
-            sensorSamples = inst.parameter["sensorSamples"]
-            pixelSize = inst.parameter["pixelSize"]
-            reduced_coordi_factor = 1e-3/(sensorSamples/2*pixelSize/sensorFactor)
-
-            # Reduced coordinates, so that this can be added with the dW/dz
-            lutxp = lutxp*reduced_coordi_factor
-            lutyp = lutyp*reduced_coordi_factor
+            # Get the distortion-only mapping. It does not depend on the wavefront, and 
+            # only the wavefront term is added in each iteration.
+            distortion = self.__getOffAxisDistortion(inst, algo, lutx, luty, l, onepixel, 
+                                                     projSamples)
+            lutx = distortion["lutx"]
+            luty = distortion["luty"]
+            lutxp = distortion["lutxp"]
+            lutyp = distortion["lutyp"]
 
         else:
             print('Wrong optical model type in compensate. \n')
@@ -493,36 +471,152 @@ class CompensationImageDecorator(object):
                 J = xpox*ypoy - xpoy*ypox
 
             elif (model == "offAxis"):
-                xp0ox = polyGradFunc(cx, lutx0, luty0, "dx") * costheta - \
-                        polyGradFunc(cx, lutx0, luty0, "dy") * sintheta
-                
-                yp0ox = polyGradFunc(cy, lutx0, luty0, "dx") * costheta - \
-                        polyGradFunc(cy, lutx0, luty0, "dy") * sintheta
-                
-                xp0oy = polyGradFunc(cx, lutx0, luty0, "dx") * sintheta + \
-                        polyGradFunc(cx, lutx0, luty0, "dy") * costheta
-                
-                yp0oy = polyGradFunc(cy, lutx0, luty0, "dx") * sintheta + \
-                        polyGradFunc(cy, lutx0, luty0, "dy") * costheta
-                
-                xpox = (xp0ox*costheta - yp0ox*sintheta)*reduced_coordi_factor + \
+                xpox = distortion["xpox"] + \
                         myC*ZernikeAnnularGrad(zcCol, lutx, luty, zobsR, "dx2")
     
-                ypoy = (xp0oy*sintheta + yp0oy*costheta)*reduced_coordi_factor + \
+                ypoy = distortion["ypoy"] + \
                         myC*ZernikeAnnularGrad(zcCol, lutx, luty, zobsR, "dy2")
     
                 temp = myC*ZernikeAnnularGrad(zcCol, lutx, luty, zobsR, "dxy")
 
                 # if temp==0,xpoy doesn't need to be symmetric about x=y
-                xpoy = (xp0oy*costheta - yp0oy*sintheta)*reduced_coordi_factor + temp
+                xpoy = distortion["xpoy"] + temp
 
                 # xpoy-flipud(rot90(ypox))==0 is true
-                ypox = (xp0ox*sintheta + yp0ox*costheta)*reduced_coordi_factor + temp
+                ypox = distortion["ypox"] + temp
 
                 J = xpox*ypoy - xpoy*ypox
     
         return lutxp, lutyp, J
 
+    def __getOffAxisDistortion(self, inst, algo, lutx, luty, l, onepixel, projSamples):
+        """
+        
+        Calculate the off-axis distortion part of mapping from the pupil to the focal plane
+        and its Jacobian elements. This only depends on the field position, defocal type, 
+        and instrument, and is kept in a least-recently-used cache shared by all instances.
+        
+        Arguments:
+            inst {[Instrument]} -- Instrument to use.
+            algo {[Algorithm]} -- Algorithm to solve the Poisson's equation.
+            lutx {[float]} -- x-coordinate on pupil plane in the extended pupil.
+            luty {[float]} -- y-coordinate on pupil plane in the extended pupil.
+            l {[float]} -- Defocal distance. It is negative for the extra-focal image.
+            onepixel {[float]} -- Exteneded delta radius.
+            projSamples {[int]} -- Dimension of projected image.
+        
+        Returns:
+            [dict] -- x, y-coordinate on pupil plane ("lutx", "luty"), on focal plane 
+                      ("lutxp", "lutyp"), and the Jacobian elements ("xpox", "ypoy", 
+                      "xpoy", "ypox") from the off-axis distortion.
+        """
+
+        # Order to do the off-axis correction. The order is 10 now.
+        offAxisPolyOrder = algo.parameter["offAxisPolyOrder"]
+
+        # Return the cached distortion if it exists
+        key = (inst.filename, inst.parameter["sensorSamples"], self.fieldX, self.fieldY, 
+               self.atype, projSamples, offAxisPolyOrder)
+        cache = self._distortionCache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        # Get the functions to do the off-axis correction by numerical fitting
+        polyFunc = self.__getFunction("poly%d_2D" % offAxisPolyOrder)
+        polyGradFunc = self.__getFunction("poly%dGrad" % offAxisPolyOrder)
+
+        # Get the coefficient of polynomials for off-axis correction
+        tt = self.offAxisOffset
+
+        cx = (self.offAxis_coeff[0, :] - self.offAxis_coeff[2, :]) * (tt+l)/(2*tt) + \
+                self.offAxis_coeff[2, :]
+        cy = (self.offAxis_coeff[1, :] - self.offAxis_coeff[3, :]) * (tt+l)/(2*tt) + \
+                self.offAxis_coeff[3, :]
+
+        # This will be inverted back by typesign later on.
+        # We do the inversion here to make the (x,y)->(x',y') equations has
+        # the same form as the paraxial case.
+        cx = np.sign(l)*cx
+        cy = np.sign(l)*cy
+
+        # Do the orthogonalization: x'=1/sqrt(2)*(x+y), y'=1/sqrt(2)*(x-y)
+        # Calculate the rotation angle for the orthogonalization
+        costheta = (self.fieldX + self.fieldY)/self.fldr/np.sqrt(2)
+        if (costheta > 1):
+            costheta = 1
+        elif (costheta < -1):
+            costheta = -1
+
+        sintheta = np.sqrt(1 - costheta**2)
+        if (self.fieldY < self.fieldX):
+            sintheta = -sintheta
+
+        # Create the pupil grid in off-axis model. This gives the x,y-coordinate 
+        # in the extended ring area defined by the parameter of onepixel.
+
+        # Get the mask-related parameters
+        maskCa, maskRa, maskCb, maskRb = self.__interpMaskParam(self.fieldX, 
+                                                    self.fieldY, inst.maskParam)
+
+        lutx, luty = self.__createPupilGrid(lutx, luty, onepixel, maskCa, 
+                            maskCb, maskRa, maskRb, self.fieldX, self.fieldY)
+
+        # Calculate the x, y-coordinate on focal plane
+
+        # First rotate back to reference orientation
+        lutx0 = lutx*costheta + luty*sintheta
+        luty0 = -lutx*sintheta + luty*costheta
+
+        # Use the mapping at reference orientation
+        lutxp0 = polyFunc(cx, lutx0, y=luty0)
+        lutyp0 = polyFunc(cy, lutx0, y=luty0)
+        
+        # Rotate back to focal plane
+        lutxp = lutxp0*costheta - lutyp0*sintheta  
+        lutyp = lutxp0*sintheta + lutyp0*costheta
+
+        # Zemax data are in mm, therefore 1000
+        sensorSamples = inst.parameter["sensorSamples"]
+        pixelSize = inst.parameter["pixelSize"]
+        sensorFactor = inst.parameter["sensorFactor"]
+        reduced_coordi_factor = 1e-3/(sensorSamples/2*pixelSize/sensorFactor)
+
+        # Reduced coordinates, so that this can be added with the dW/dz
+        lutxp = lutxp*reduced_coordi_factor
+        lutyp = lutyp*reduced_coordi_factor
+
+        # Calculate the Jacobian elements of distortion
+        xp0ox = polyGradFunc(cx, lutx0, luty0, "dx") * costheta - \
+                polyGradFunc(cx, lutx0, luty0, "dy") * sintheta
+        
+        yp0ox = polyGradFunc(cy, lutx0, luty0, "dx") * costheta - \
+                polyGradFunc(cy, lutx0, luty0, "dy") * sintheta
+        
+        xp0oy = polyGradFunc(cx, lutx0, luty0, "dx") * sintheta + \
+                polyGradFunc(cx, lutx0, luty0, "dy") * costheta
+        
+        yp0oy = polyGradFunc(cy, lutx0, luty0, "dx") * sintheta + \
+                polyGradFunc(cy, lutx0, luty0, "dy") * costheta
+        
+        xpox = (xp0ox*costheta - yp0ox*sintheta)*reduced_coordi_factor
+        ypoy = (xp0oy*sintheta + yp0oy*costheta)*reduced_coordi_factor
+        xpoy = (xp0oy*costheta - yp0oy*sintheta)*reduced_coordi_factor
+        ypox = (xp0ox*sintheta + yp0ox*costheta)*reduced_coordi_factor
+
+        # The cached arrays are shared, so protect them from the modification
+        distortion = dict(lutx=lutx, luty=luty, lutxp=lutxp, lutyp=lutyp, xpox=xpox, 
+                          ypoy=ypoy, xpoy=xpoy, ypox=ypox)
+        for value in distortion.values():
+            value.setflags(write=False)
+
+        # Put into the cache and evict the least-recently-used one if needed
+        cache[key] = distortion
+        while (len(cache) > self.DISTORTION_CACHE_SIZE):
+            cache.popitem(last=False)
+
+        return distortion
+
     def __getFunction(self, name):
         """
         
@@ -744,32 +838,74 @@ class CompensationImageDecorator(object):
             order {[int]} -- Up to order-th of off-axis correction.
         """
 
+        # Read files
+        temp = []
+        for filePath in self.__getOffAxisCorrFiles(instDir):
+            corr_coeff, offset = self.__getOffAxisCorr_single(filePath)
+            temp.append(corr_coeff)
+
+        # Give the values
+        self.offAxis_coeff = np.array(temp)
+        self.offAxisOffset = offset
+
+    def __getOffAxisCorrFiles(self, instDir):
+        """
+        
+        Get the off-axis correction files of intra- and extra-image in the order of 
+        "cxin", "cyin", "cxex", and "cyex". The result is cached for each instrument 
+        directory.
+        
+        Arguments:
+            instDir {[string]} -- Path to specific instrument directory.
+        
+        Returns:
+            [list] -- Paths of off-axis correction files.
+        """
+
+        # Use the cached file list if it exists
+        if instDir in self._offAxisFileCache:
+            return self._offAxisFileCache[instDir]
+
         # List of configuration
         configList = ["cxin", "cyin", "cxex", "cyex"]
 
         # Get all files in the directory
         fileList = [f for f in os.listdir(instDir) if os.path.isfile(os.path.join(instDir, f))]
 
-        # Read files
-        temp = []
-
+        # Construct the configuration file name
+        filePathList = []
         for config in configList:
-
-            # Construct the configuration file name
             for fileName in fileList:
                 m = re.match(r"\S*%s\S*.txt" % config, fileName)
                 if (m is not None):
                     matchFileName = m.group()
                     break
-            filePath = os.path.join(instDir, matchFileName)
+            filePathList.append(os.path.join(instDir, matchFileName))
 
-            # Read the file
-            corr_coeff, offset = self.__getOffAxisCorr_single(filePath)
-            temp.append(corr_coeff)
+        self._offAxisFileCache[instDir] = filePathList
 
-        # Give the values
-        self.offAxis_coeff = np.array(temp)
-        self.offAxisOffset = offset
+        return filePathList
+
+    def __loadInstTable(self, filePath):
+        """
+        
+        Load the instrument table. Each file is only read once in the process and the 
+        table is shared as a read-only array.
+        
+        Arguments:
+            filePath {[string]} -- Path of table file.
+        
+        Returns:
+            [ndarray] -- Table data.
+        """
+
+        table = self._instTableCache.get(filePath)
+        if (table is None):
+            table = np.loadtxt(filePath)
+            table.setflags(write=False)
+            self._instTableCache[filePath] = table
+
+        return table
 
     def __getOffAxisCorr_single(self, confFile):
         """
@@ -790,7 +926,7 @@ class CompensationImageDecorator(object):
         fldr = np.sqrt(self.fieldX**2 + self.fieldY**2)
 
         # Read the configuration file
-        cdata = np.loadtxt(confFile)
+        cdata = self.__loadInstTable(confFile)
                         
         # Record the offset (defocal distance)
         offset = cdata[0, 0]
@@ -828,7 +964,7 @@ class CompensationImageDecorator(object):
         fldr = np.sqrt(fieldX**2 + fieldY**2)
         
         # Load the mask parameter
-        c = np.loadtxt(maskParam)
+        c = self.__loadInstTable(maskParam)
 
         # Get the ruler, which is the distance to center
         # ruler is between 1.51 and 1.84 degree here    
@@ -957,27 +1093,30 @@ class CompensationImageDecorator(object):
         # the value of element is allowed to be greater than 1.
         show_lutxyp = np.zeros([n1, n2])
 
-        # Get the index in pupil. If a point's value is NaN, this point is outside the pupil.        
-        idx = (~np.isnan(lutxp)).nonzero()
-        for ii, jj in zip(idx[0], idx[1]):
-            # Calculate the projected x, y-coordinate in pixel
-            # x=0.5 is center of pixel#1
-            xR = int(np.round((lutxp[ii, jj]+sensorFactor)*projSamples/sensorFactor/2 + 0.5))
-            yR = int(np.round((lutyp[ii, jj]+sensorFactor)*projSamples/sensorFactor/2 + 0.5))
-    
-            # Check the projected coordinate is in the range of image or not.
-            # If the check passes, the times will be recorded.
-            if (xR>0 and xR<n2 and yR>0 and yR<n1):
-                # Aggregate the times
-                if raytrace:
-                    show_lutxyp[yR-1, xR-1] += 1
-                # No aggragation of times
-                else:
-                    if (show_lutxyp[yR-1, xR-1] < 1):
-                        show_lutxyp[yR-1, xR-1] = 1
+        # Get the index in pupil. If a point's value is NaN, this point is outside the pupil.
+        idx = ~np.isnan(lutxp)
+
+        # Calculate the projected x, y-coordinate in pixel
+        # x=0.5 is center of pixel#1
+        xR = np.round((lutxp[idx]+sensorFactor)*projSamples/sensorFactor/2 + 0.5)
+        yR = np.round((lutyp[idx]+sensorFactor)*projSamples/sensorFactor/2 + 0.5)
+
+        # Check the projected coordinate is in the range of image or not.
+        # If the check passes, the times will be recorded.
+        inRange = (xR>0) & (xR<n2) & (yR>0) & (yR<n1)
+        xR = xR[inRange].astype(int)
+        yR = yR[inRange].astype(int)
+
+        # Aggregate the times
+        if raytrace:
+            np.add.at(show_lutxyp, (yR-1, xR-1), 1)
+        # No aggragation of times
+        else:
+            show_lutxyp[yR-1, xR-1] = 1
 
         return show_lutxyp
 
+    @profileStage("CompensationImageDecorator.makeMask")
     def makeMask(self, inst, model, boundaryT, maskScalingFactorLocal):
         """
         
@@ -1120,6 +1259,11 @@ class CompensationImageDecoratorTest(unittest.TestCase):
         self.assertEqual(wfsImg.offAxis_coeff.shape, (4, 66))
         self.assertAlmostEqual(wfsImg.offAxis_coeff[0, 0], -2.6362089*1e-3)
 
+        # The correction tables are read once and shared as read-only arrays
+        self.assertEqual(len(wfsImg._offAxisFileCache[instDir]), 4)
+        for table in wfsImg._instTableCache.values():
+            self.assertFalse(table.flags.writeable)
+
         # Test to make the mask list
         model = "paraxial"
         masklist = wfsImg.makeMaskList(self.inst, model)
@@ -1174,6 +1318,9 @@ class CompensationImageDecoratorTest(unittest.TestCase):
             wfsImg.imageCoCenter(self.inst)
             wfsImg.compensate(self.inst, algo, zcCol, self.opticalModel)
 
+        # The off-axis distortion is calculated once for each defocal image
+        self.assertEqual(len(CompensationImageDecorator._distortionCache), 2)
+
         # Get the common region
         binaryImgIntra = wfsImgIntra.getCenterAndR_ef()[3]
         binaryImgExtra = wfsImgExtra.getCenterAndR_ef()[3]
@@ -13,14 +13,23 @@
 # by Laplacian Optics
 
 import os, unittest
+from collections import OrderedDict
 import numpy as np
 from astropy.io import fits
 
 from scipy.stats import entropy
 from scipy.ndimage.measurements import center_of_mass
 from lsst.ts.wep.Utility import getModulePath
+from lsst.ts.wep.StageProfiler import profileStage
 
 class Image(object):
+
+    # Default method to search the valley in the histogram of intensity in getCenterAndR_ef().
+    # It can be "walk" or "otsu".
+    valleySearch = "walk"
+
+    # Number of results of getCenterAndR_ef() memoized for each image
+    centroidCacheSize = 4
     
     def __init__(self):
         """
@@ -32,6 +41,31 @@ class Image(object):
         self.image = None
         self.name = None
 
+        # Version of image. It is changed by setImg() and updateImage(). The in-place change
+        # of image should be followed by updateImage() to have a new version.
+        self.imageVersion = 0
+        self.__lastVersion = 0
+
+        # Memoized results of getCenterAndR_ef() keyed by the image version and parameters
+        self.__centroidCache = OrderedDict()
+
+    def __bumpVersion(self, imageVersion=None):
+        """
+        
+        Change the image version.
+        
+        Keyword Arguments:
+            imageVersion {[int]} -- Previous version to restore if the image is the same as 
+                                    that version. A new version is used if None. 
+                                    (default: {None})
+        """
+
+        if (imageVersion is None):
+            self.__lastVersion += 1
+            imageVersion = self.__lastVersion
+
+        self.imageVersion = imageVersion
+
     def setImg(self, image=None, imageFile=None):
         """
         
@@ -50,10 +84,12 @@ class Image(object):
                 self.image = self.__readImgFile(imageFile)
                 self.name = imageFile
 
+        self.__bumpVersion()
+
     def __readImgFile(self, imageFile):
         """
         
-        Read the donut image.
+        Read the donut image. The binary stamp (".npy") is memory-mapped as a read-only array.
         
         Arguments:
             imageFile {[path]} -- Path of image file.
@@ -62,7 +98,7 @@ class Image(object):
             [ndarray] -- Image data.
         
         Raises:
-            IOError -- IO error if the file type is not ".txt" or ".fits".
+            IOError -- IO error if the file type is not ".txt", ".fits", or ".npy".
         """
  
         image = None
@@ -71,6 +107,10 @@ class Image(object):
         if (os.path.isfile(imageFile)):
             if (imageFile.endswith((".fits", ".fits.gz"))):
                 image = fits.getdata(imageFile)
+            elif (imageFile.endswith(".npy")):
+                # The binary stamp is in the orientation of image already. No parsing and 
+                # copy are needed.
+                image = np.load(imageFile, mmap_mode="r")
             else:
                 image = np.loadtxt(imageFile)
                 # This assumes this "txt" file is in the format
@@ -83,8 +123,9 @@ class Image(object):
         
         return image
 
+    @profileStage("Image.getCenterAndR_ef")
     def getCenterAndR_ef(self, image=None, randNumFilePath=None, histogram_len=256, checkEntropy=False, 
-                            entroThres=3.5, debugLevel=0):
+                            entroThres=3.5, debugLevel=0, valleySearch=None):
         """
         
         Centroid finding code based on northcott_ef_bundle/ef/ef/efimageFunc.cc.
@@ -102,12 +143,73 @@ class Image(object):
 
             debugLevel {[int]} -- Show the information under the running. If the value is higher, 
                                   the information shows more. It can be 0, 1, 2, or 3. (default: {0})
+            valleySearch {[str]} -- Method to search the valley in the histogram of intensity. It 
+                                    can be "walk" (random walk) or "otsu" (deterministic Otsu's 
+                                    threshold). Use the class attribute, valleySearch, if None. 
+                                    (default: {None})
 
+        Returns:
+            [float] -- Centroid x.
+            [float] -- Centroid y.
+            [float] -- Effective weighting radius.
+            [ndarray] -- Binary image of bright star. It is read-only if the result is 
+                         memoized.
+
+        Raises:
+            ValueError -- Wrong valley search method.
+        """
+
+        # Search the valley between the background and the signal of bright star
+        if (valleySearch is None):
+            valleySearch = self.valleySearch
+
+        # Reuse the result of unchanged image
+        if (image is None):
+            key = (self.imageVersion, randNumFilePath, histogram_len, checkEntropy, entroThres,
+                   valleySearch)
+            if (key in self.__centroidCache):
+                self.__centroidCache.move_to_end(key)
+                return self.__centroidCache[key]
+
+            result = self.__calcCenterAndR_ef(self.image.copy(), randNumFilePath, histogram_len,
+                                              checkEntropy, entroThres, debugLevel, valleySearch)
+
+            # The memoized binary image is shared by the callers
+            if (isinstance(result[3], np.ndarray)):
+                result[3].setflags(write=False)
+
+            self.__centroidCache[key] = result
+            while (len(self.__centroidCache) > self.centroidCacheSize):
+                self.__centroidCache.popitem(last=False)
+
+            return result
+
+        return self.__calcCenterAndR_ef(image, randNumFilePath, histogram_len, checkEntropy,
+                                        entroThres, debugLevel, valleySearch)
+
+    def __calcCenterAndR_ef(self, tempImage, randNumFilePath, histogram_len, checkEntropy,
+                            entroThres, debugLevel, valleySearch):
+        """
+        
+        Calculate the centroid and effective weighting radius of image.
+        
+        Arguments:
+            tempImage {[ndarray]} -- Image to do the analysis.
+            randNumFilePath {[str]} -- Random table file path.
+            histogram_len {[int]} -- Nuber of bins in histogram.
+            checkEntropy {[bool]} -- Check the entropy of figure intensity.
+            entroThres {[float]} -- Threshold of entropy check.
+            debugLevel {[int]} -- Show the information under the running.
+            valleySearch {[str]} -- Method to search the valley in the histogram of intensity.
+        
         Returns:
             [float] -- Centroid x.
             [float] -- Centroid y.
             [float] -- Effective weighting radius.
             [ndarray] -- Binary image of bright star.
+
+        Raises:
+            ValueError -- Wrong valley search method.
         """
 
         # Parameters of circle
@@ -118,17 +220,6 @@ class Image(object):
         # Binary image of bright star
         imgBinary = []
 
-        # Parameters to decide the signal of bright star
-        slide = int(0.1*histogram_len)       
-        stepsize = int(0.06*histogram_len)
-        nwalk = int(1.56*histogram_len)
-
-        # Copy the image
-        if (image is not None):
-            tempImage = image
-        else:
-            tempImage = self.image.copy()
-
         # Reshape the image to 1D array
         array1d = tempImage.flatten()
     
@@ -146,6 +237,52 @@ class Image(object):
                                                                                         entroThres))
                 return realcx, realcy, realR, imgBinary
 
+        # Search the valley between the background and the signal of bright star
+        if (valleySearch == "walk"):
+            minind = self.__searchValleyWalk(phist, randNumFilePath, histogram_len, debugLevel)
+        elif (valleySearch == "otsu"):
+            minind = self.__searchValleyOtsu(phist)
+        else:
+            raise ValueError("Valley search can not be '%s'." % valleySearch)
+
+        # Get the threshold value of bright star
+        pval = cen[int(minind)]
+
+        # Get the binary image
+        imgBinary = tempImage.copy()
+        imgBinary[tempImage > max(0, pval - 1e-8)] = 1
+        imgBinary[tempImage < pval] = 0
+
+        # Calculate the weighting radius
+        realR = np.sqrt(np.sum(imgBinary) / np.pi)
+    
+        # Calculate the center of mass
+        realcy, realcx = center_of_mass(imgBinary)
+
+        return realcx, realcy, realR, imgBinary
+
+    def __searchValleyWalk(self, phist, randNumFilePath, histogram_len, debugLevel):
+        """
+
+        Search the valley in the histogram of intensity by the random walk with a thermal
+        fluctuation (simulated annealing).
+
+        Arguments:
+            phist {[ndarray]} -- Histogram of intensity.
+            randNumFilePath {[str]} -- Random table file path. If not None, read this table 
+                                       instead of using numpy random number function.
+            histogram_len {[int]} -- Nuber of bins in histogram.
+            debugLevel {[int]} -- Show the information under the running.
+
+        Returns:
+            [int] -- Index of bin at the valley.
+        """
+
+        # Parameters to decide the signal of bright star
+        slide = int(0.1*histogram_len)       
+        stepsize = int(0.06*histogram_len)
+        nwalk = int(1.56*histogram_len)
+
         # Parameters for random walk search
         start = int(histogram_len/2.1)
         end = slide + 25  # Go back 
@@ -231,34 +368,54 @@ class Image(object):
             if (debugLevel >=3):
                 print("Valley is not found. Use minind = %f." % minind)
 
-        # Get the threshold value of bright star
-        pval = cen[int(minind)]
+        return minind
 
-        # Get the binary image
-        imgBinary = tempImage.copy()
-        imgBinary[tempImage > max(0, pval - 1e-8)] = 1
-        imgBinary[tempImage < pval] = 0
+    def __searchValleyOtsu(self, phist):
+        """
 
-        # Calculate the weighting radius
-        realR = np.sqrt(np.sum(imgBinary) / np.pi)
-    
-        # Calculate the center of mass
-        realcy, realcx = center_of_mass(imgBinary)
+        Search the valley in the histogram of intensity by the Otsu's threshold, which 
+        maximizes the between-class variance of two classes of bins. This is deterministic.
 
-        return realcx, realcy, realR, imgBinary
+        Arguments:
+            phist {[ndarray]} -- Histogram of intensity.
+
+        Returns:
+            [int] -- Index of bin at the valley.
+        """
 
-    def updateImage(self, image):
+        # Weights and means of the lower class (bins <= k) and the upper class
+        binIdx = np.arange(len(phist))
+        weight0 = np.cumsum(phist).astype(float)
+        weight1 = weight0[-1] - weight0
+        moment0 = np.cumsum(phist*binIdx).astype(float)
+        moment1 = moment0[-1] - moment0
+
+        # Between-class variance: w0*w1*(m0/w0 - m1/w1)^2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            varBetween = (moment0*weight1 - moment1*weight0)**2/(weight0*weight1)
+        varBetween[~np.isfinite(varBetween)] = -1
+
+        # The threshold is the upper edge of bin k
+        return int(np.argmax(varBetween[:-1])) + 1
+
+    def updateImage(self, image, imageVersion=None):
         """
         
         Update the image of donut.
         
         Arguments:
             image {[float]} -- Donut image.
+
+        Keyword Arguments:
+            imageVersion {[int]} -- Previous version of image if the donut image is the same as 
+                                    that version such as the copy of initial image. A new version 
+                                    is used if None. (default: {None})
         """
 
         # Update the image
         if (self.image is not None):
             self.image = image
+            self.__bumpVersion(imageVersion=imageVersion)
         else:
             print("The attribute:image is None. Use setImg() instead.")
 
@@ -293,6 +450,36 @@ class Image(object):
 
         return snr
 
+def convertImgFileToNpy(imageFile, npyFilePath=None):
+    """
+    
+    Convert the donut image file to the binary stamp (".npy"), which is memory-mapped when 
+    it is read by Image.setImg().
+    
+    Arguments:
+        imageFile {[str]} -- Path of image file (".txt" or ".fits").
+    
+    Keyword Arguments:
+        npyFilePath {[str]} -- Path of binary stamp. Replace the file extension of image file 
+                               with ".npy" if None. (default: {None})
+    
+    Returns:
+        [str] -- Path of binary stamp.
+    """
+
+    # Read the image in the orientation used by Image
+    img = Image()
+    img.setImg(imageFile=imageFile)
+
+    if (npyFilePath is None):
+        fileRoot = imageFile[:-len(".gz")] if imageFile.endswith(".gz") else imageFile
+        npyFilePath = os.path.splitext(fileRoot)[0] + ".npy"
+
+    # Store the C-contiguous array to map it without the copy
+    np.save(npyFilePath, np.ascontiguousarray(img.image, dtype=float))
+
+    return npyFilePath
+
 class ImageTest(unittest.TestCase):
     """
     Test functions in Image.
@@ -317,6 +504,23 @@ class ImageTest(unittest.TestCase):
         # There is the difference between intra and extra images
         self.img = Image()
         self.img.setImg(imageFile=imgFile)
+        self.imgFile = imgFile
+
+    def testNpyFile(self):
+
+        # Convert the text image to the binary stamp
+        npyFilePath = convertImgFileToNpy(self.imgFile, npyFilePath="testImage.npy")
+
+        npyImg = Image()
+        npyImg.setImg(imageFile=npyFilePath)
+        self.assertTrue(isinstance(npyImg.image, np.memmap))
+        self.assertFalse(npyImg.image.flags.writeable)
+        self.assertTrue(np.array_equal(npyImg.image, self.img.image))
+        self.assertEqual(npyImg.getCenterAndR_ef(valleySearch="otsu")[0:3], 
+                         self.img.getCenterAndR_ef(valleySearch="otsu")[0:3])
+
+        del npyImg
+        os.remove(npyFilePath)
 
     def testZeroImg(self):
 
@@ -347,6 +551,34 @@ class ImageTest(unittest.TestCase):
         self.assertEqual(int(realcy), 61)
         self.assertGreater(int(realR), 35)
 
+        # The Otsu's threshold is deterministic and gives the similar centroid
+        otsucx, otsucy, otsuR, otsuBinary = self.img.getCenterAndR_ef(checkEntropy=True, 
+                                                                      valleySearch="otsu")
+        self.assertEqual(self.img.getCenterAndR_ef(valleySearch="otsu")[0:3], 
+                         (otsucx, otsucy, otsuR))
+        self.assertLess(np.abs(otsucx-realcx), 0.2)
+        self.assertLess(np.abs(otsucy-realcy), 0.2)
+        self.assertLess(np.abs(otsuR-realR), 1.5)
+
+        self.assertRaises(ValueError, self.img.getCenterAndR_ef, valleySearch="mean")
+
+        # The result of unchanged image is memoized
+        result = self.img.getCenterAndR_ef(checkEntropy=True)
+        self.assertEqual((realcx, realcy, realR), result[0:3])
+        self.assertTrue(self.img.getCenterAndR_ef(checkEntropy=True)[3] is result[3])
+        self.assertFalse(result[3].flags.writeable)
+
+        # The updated image has a new version
+        imageVersion = self.img.imageVersion
+        self.img.updateImage(np.roll(self.img.image, 2, axis=1))
+        self.assertNotEqual(self.img.imageVersion, imageVersion)
+        shiftcx = self.img.getCenterAndR_ef(checkEntropy=True, valleySearch="otsu")[0]
+        self.assertAlmostEqual(shiftcx-otsucx, 2)
+
+        # The restored version reuses the result
+        self.img.updateImage(np.roll(self.img.image, -2, axis=1), imageVersion=imageVersion)
+        self.assertTrue(self.img.getCenterAndR_ef(checkEntropy=True)[3] is result[3])
+
         # Calculate the S/N
         # Add the noise to the image
         noisedImg = self.img.image + np.random.random(self.img.image.shape)*0.1
@@ -6,13 +6,34 @@
 # @authors: Bo Xin & Chuck Claver
 # @       Large Synoptic Survey Telescope
 
-import os, unittest
+import os, sys, atexit, pickle, weakref, unittest
 import numpy as np
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # The shared memory needs Python 3.8 or later. The sensor grids are pickled with the 
+    # instrument instead.
+    shared_memory = None
+
 from lsst.ts.wep.cwfs.Tool import getConfigValue
 from lsst.ts.wep.Utility import getModulePath
 
 class Instrument(object):
+
+    # Names of sensor grids
+    GRID_NAME_LIST = ("xSensor", "ySensor", "xoSensor", "yoSensor")
+
+    # Parameters and read-only sensor grids of configured instruments shared by all 
+    # instances, keyed by the instrument file and sensor samples
+    _gridCache = dict()
+
+    # Released shared memory of sensor grids that can not be closed yet because the grids on 
+    # its buffer are still in use
+    _sharedMemoryList = []
+
+    # Instances using the sensor grids in the cache
+    _instanceSet = weakref.WeakSet()
   
     def __init__(self, instruFolder):
         """
@@ -55,30 +76,241 @@ class Instrument(object):
         # Directory to mask off-axis correction
         self.maskParam = os.path.join(self.instDir, instruName, "mask_migrate.txt")
 
-        # Get the instrument parameters
+        # Get the instrument parameters and sensor grids configured before
         sensorSamples = int(sensorSamples)
+        key = (self.filename, sensorSamples)
+        if key not in Instrument._gridCache:
+            Instrument._gridCache[key] = self.__makeGrid(sensorSamples)
+
+        self.__setGrid(Instrument._gridCache[key])
+
+    def __makeGrid(self, sensorSamples):
+        """
+        
+        Read the instrument parameters and construct the read-only sensor grids.
+        
+        Arguments:
+            sensorSamples {[int]} -- Dimension of image on sensor.
+        
+        Returns:
+            [dict] -- Instrument parameters ("parameter"), sensor grids, and shared memory 
+                      ("sharedMemory") of grids.
+        """
+
+        # Get the instrument parameters
         parameter = self.__readFile(sensorSamples)
-        self.parameter = parameter
 
         # Construct sensor coordinates
         sensorFactor = parameter["sensorFactor"]
         ySensor, xSensor = np.mgrid[-(sensorSamples/2-0.5):(sensorSamples/2 + 0.5),
                                               -(sensorSamples/2-0.5):(sensorSamples/2 + 0.5)]
-        self.xSensor = xSensor/(sensorSamples/2/sensorFactor)
-        self.ySensor = ySensor/(sensorSamples/2/sensorFactor)
+        xSensor = xSensor/(sensorSamples/2/sensorFactor)
+        ySensor = ySensor/(sensorSamples/2/sensorFactor)
         
         # Get the position index that is out of annular aperature range
         obscuration = parameter["obscuration"]
-        r2Sensor = self.xSensor**2 + self.ySensor**2
+        r2Sensor = xSensor**2 + ySensor**2
         idx = (r2Sensor > 1) | (r2Sensor < obscuration**2)   
     
         # o indicates annulus
-        self.xoSensor = self.xSensor.copy()  
-        self.yoSensor = self.ySensor.copy()
+        xoSensor = xSensor.copy()  
+        yoSensor = ySensor.copy()
 
         # Define the value to be NaN if it is not in pupul
-        self.xoSensor[idx] = np.nan
-        self.yoSensor[idx] = np.nan
+        xoSensor[idx] = np.nan
+        yoSensor[idx] = np.nan
+
+        entry = {"parameter": parameter, "xSensor": xSensor, "ySensor": ySensor, 
+                 "xoSensor": xoSensor, "yoSensor": yoSensor, "sharedMemory": None, 
+                 "ownerPid": None}
+
+        # The grids are shared by all instances
+        for name in self.GRID_NAME_LIST:
+            entry[name].setflags(write=False)
+
+        return entry
+
+    def __setGrid(self, entry):
+        """
+        
+        Use the instrument parameters and sensor grids of configured instrument.
+        
+        Arguments:
+            entry {[dict]} -- Configured instrument in the cache.
+        """
+
+        self.parameter = dict(entry["parameter"])
+        for name in self.GRID_NAME_LIST:
+            setattr(self, name, entry[name])
+
+        Instrument._instanceSet.add(self)
+
+    def shareGrid(self):
+        """
+        
+        Move the sensor grids of configured instrument to the shared memory. The pickled 
+        instrument then carries the name of shared memory instead of the grids, and the 
+        instrument unpickled in the worker process attaches to the existing buffer. The 
+        shared memory is reused by the later calls until releaseSharedGrid().
+        
+        Returns:
+            [str] -- Name of shared memory. None if the shared memory is not supported.
+        """
+
+        entry = Instrument._gridCache[(self.filename, self.parameter["sensorSamples"])]
+        if (shared_memory is not None and entry["sharedMemory"] is None):
+            gridList = [entry[name] for name in self.GRID_NAME_LIST]
+            shm = shared_memory.SharedMemory(create=True, 
+                                             size=sum([grid.nbytes for grid in gridList]))
+
+            gridBuffer = self.__getGridBuffer(shm, self.parameter["sensorSamples"])
+            gridBuffer[:] = gridList
+            gridBuffer.setflags(write=False)
+
+            entry.update(zip(self.GRID_NAME_LIST, gridBuffer))
+            entry["sharedMemory"] = shm
+            entry["ownerPid"] = os.getpid()
+
+        self.__setGrid(entry)
+
+        if (entry["sharedMemory"] is None):
+            return None
+        else:
+            return entry["sharedMemory"].name
+
+    @staticmethod
+    def releaseSharedGrid():
+        """
+        
+        Unlink the shared memory of sensor grids created by this process. The grids in the 
+        cache and instances are replaced by the private read-only copies, and the shared 
+        memory is closed. If other arrays still refer to its buffer, it is closed by the later 
+        call after they are gone. This is called at the exit of process.
+        """
+
+        for entry in Instrument._gridCache.values():
+            shm = entry["sharedMemory"]
+            if (shm is None or entry["ownerPid"] != os.getpid()):
+                continue
+
+            sharedGridMap = dict()
+            for name in Instrument.GRID_NAME_LIST:
+                sharedGridMap[name] = entry[name]
+
+                grid = np.array(entry[name])
+                grid.setflags(write=False)
+                entry[name] = grid
+
+            for inst in list(Instrument._instanceSet):
+                for name in Instrument.GRID_NAME_LIST:
+                    if (getattr(inst, name) is sharedGridMap[name]):
+                        setattr(inst, name, entry[name])
+
+            del sharedGridMap
+
+            entry["sharedMemory"] = None
+            entry["ownerPid"] = None
+
+            shm.unlink()
+            Instrument._sharedMemoryList.append(shm)
+
+        # Close the released shared memory not in use
+        sharedMemoryList = []
+        for shm in Instrument._sharedMemoryList:
+            try:
+                shm.close()
+            except BufferError:
+                sharedMemoryList.append(shm)
+
+        Instrument._sharedMemoryList = sharedMemoryList
+
+    def __getGridBuffer(self, shm, sensorSamples):
+        """
+        
+        Get the sensor grids on the shared memory.
+        
+        Arguments:
+            shm {[SharedMemory]} -- Shared memory of sensor grids.
+            sensorSamples {[int]} -- Dimension of image on sensor.
+        
+        Returns:
+            [ndarray] -- Sensor grids in the order of GRID_NAME_LIST.
+        """
+
+        # The grids hold the buffer of shared memory, so it can not be closed under them
+        gridBuffer = np.frombuffer(shm.buf, dtype=float, 
+                                   count=len(self.GRID_NAME_LIST)*sensorSamples**2)
+
+        return gridBuffer.reshape(len(self.GRID_NAME_LIST), sensorSamples, sensorSamples)
+
+    def __attachGrid(self, name, parameter):
+        """
+        
+        Attach to the sensor grids on the shared memory created by another process.
+        
+        Arguments:
+            name {[str]} -- Name of shared memory.
+            parameter {[dict]} -- Instrument parameters.
+        
+        Returns:
+            [dict] -- Configured instrument in the cache.
+        """
+
+        # The worker processes share the resource tracker of the process that creates the 
+        # shared memory, which unlinks it by releaseSharedGrid()
+        shm = shared_memory.SharedMemory(name=name)
+
+        gridBuffer = self.__getGridBuffer(shm, parameter["sensorSamples"])
+        gridBuffer.setflags(write=False)
+
+        entry = {"parameter": parameter, "sharedMemory": shm, "ownerPid": None}
+        entry.update(zip(self.GRID_NAME_LIST, gridBuffer))
+
+        return entry
+
+    def __getstate__(self):
+        """
+        
+        Get the state to pickle. The sensor grids on the shared memory are replaced by the 
+        name of shared memory.
+        
+        Returns:
+            [dict] -- State of instrument.
+        """
+
+        state = self.__dict__.copy()
+        if (self.parameter is None):
+            return state
+
+        entry = Instrument._gridCache.get((self.filename, self.parameter["sensorSamples"]))
+        if (entry is not None and entry["sharedMemory"] is not None and 
+                self.xSensor is entry["xSensor"]):
+            for name in self.GRID_NAME_LIST:
+                state[name] = None
+            state["sharedGridName"] = entry["sharedMemory"].name
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        
+        Set the state from unpickling. Attach to the sensor grids on the shared memory if 
+        they are not in the cache of this process.
+        
+        Arguments:
+            state {[dict]} -- State of instrument.
+        """
+
+        state = state.copy()
+        sharedGridName = state.pop("sharedGridName", None)
+        self.__dict__.update(state)
+
+        if (sharedGridName is not None):
+            key = (self.filename, self.parameter["sensorSamples"])
+            if key not in Instrument._gridCache:
+                Instrument._gridCache[key] = self.__attachGrid(sharedGridName, self.parameter)
+
+            self.__setGrid(Instrument._gridCache[key])
 
     def __readFile(self, sensorSamples):
         """
@@ -118,6 +350,9 @@ class Instrument(object):
 
         return parameter
 
+# Unlink the shared memory of sensor grids at the exit of process
+atexit.register(Instrument.releaseSharedGrid)
+
 class InstrumentTest(unittest.TestCase):
     """
     Test functions in Instrument.
@@ -139,6 +374,88 @@ class InstrumentTest(unittest.TestCase):
         inst.config(self.instruName, 120)
         self.assertEqual(inst.parameter["sensorSamples"], 120)
 
+        # The configured sensor grids are shared and read-only
+        instOther = Instrument(self.instruFolder)
+        instOther.config(self.instruName, 120)
+        self.assertTrue(instOther.xoSensor is inst.xoSensor)
+        self.assertFalse(inst.xSensor.flags.writeable)
+        self.assertEqual(np.sum(np.isnan(inst.xoSensor)), np.sum(np.isnan(inst.yoSensor)))
+
+        instOther.config(self.instruName, 60)
+        self.assertEqual(instOther.xSensor.shape, (60, 60))
+        self.assertEqual(inst.xSensor.shape, (120, 120))
+
+    def testSharedGrid(self):
+
+        inst = Instrument(self.instruFolder)
+        inst.config(self.instruName, 120)
+        xoSensor = inst.xoSensor
+
+        name = inst.shareGrid()
+        key = (inst.filename, 120)
+        try:
+            self.assertTrue(np.array_equal(inst.xoSensor, xoSensor, equal_nan=True))
+
+            # The shared memory is reused
+            self.assertEqual(inst.shareGrid(), name)
+
+            # The pickled instrument carries the name of shared memory only
+            data = pickle.dumps(inst)
+            self.assertLess(len(data), xoSensor.nbytes)
+
+            # Attach to the shared memory if the grids are not in the cache
+            entry = Instrument._gridCache.pop(key)
+            try:
+                instWorker = pickle.loads(data)
+                workerEntry = Instrument._gridCache[key]
+                self.assertEqual(workerEntry["sharedMemory"].name, name)
+                self.assertEqual(workerEntry["ownerPid"], None)
+                self.assertTrue(np.array_equal(instWorker.yoSensor, inst.yoSensor, 
+                                               equal_nan=True))
+                self.assertFalse(instWorker.xSensor.flags.writeable)
+            finally:
+                Instrument._gridCache[key] = entry
+
+            workerShm = workerEntry["sharedMemory"]
+            del instWorker, workerEntry
+            workerShm.close()
+
+        finally:
+            Instrument.releaseSharedGrid()
+
+        # The grids in the cache are private again
+        self.assertEqual(Instrument._gridCache[key]["sharedMemory"], None)
+        self.assertFalse(Instrument._gridCache[key]["xoSensor"].flags.writeable)
+        self.assertTrue(np.array_equal(inst.xoSensor, xoSensor, equal_nan=True))
+
+        # The instruments use the private grids, and the shared memory is closed
+        self.assertTrue(inst.xoSensor is Instrument._gridCache[key]["xoSensor"])
+        self.assertEqual(len(Instrument._sharedMemoryList), 0)
+
+        # The shared memory in use by other arrays is closed after they are gone
+        inst.shareGrid()
+        xoSensorShared = inst.xoSensor[1:]
+        Instrument.releaseSharedGrid()
+        self.assertEqual(len(Instrument._sharedMemoryList), 1)
+
+        del xoSensorShared
+        Instrument.releaseSharedGrid()
+        self.assertEqual(len(Instrument._sharedMemoryList), 0)
+
+    def testSharedGridNotSupported(self):
+
+        from unittest import mock
+
+        inst = Instrument(self.instruFolder)
+        inst.config(self.instruName, 120)
+
+        # The sensor grids are pickled without the shared memory
+        with mock.patch.object(sys.modules[__name__], "shared_memory", None):
+            self.assertEqual(inst.shareGrid(), None)
+
+        instWorker = pickle.loads(pickle.dumps(inst))
+        self.assertTrue(np.array_equal(instWorker.xoSensor, inst.xoSensor, equal_nan=True))
+
 if __name__ == "__main__":
 
     # Do the unit test
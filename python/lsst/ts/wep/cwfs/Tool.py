@@ -7,7 +7,8 @@
 # Refactored by Te-Wei Tsai at June, 2017
 ##
 
-import os, unittest
+import os, unittest, hashlib
+from collections import OrderedDict
 import numpy as np
 from scipy.integrate import nquad
 
@@ -54,6 +55,7 @@ def ZernikeAnnularGrad(Z, x, y, e, axis, nMax=22):
         y {[float]} -- y coordinate on pupil plane.
         e {[float]} -- Obscuration value. It is 0.61 in LSST.
         axis {[string]} -- Integration direction. It can be "dx", "dy", "dx2", "dy2", or "dxy".
+                           The enum in cyMath such as cyMath.AXIS_DX is also accepted.
 
     Keyword arguments:
         nMax {[int]} -- Maximum number of Zernike terms. (default: {22})
@@ -95,6 +97,71 @@ def ZernikeAnnularJacobian(Z, x, y, e, order, nMax=22):
     return cyMath.ZernikeAnnularJacobian(Z, x.flatten(), y.flatten(), e, 
                                          order).reshape(x.shape)
 
+def ZernikeAnnularEvalBasis(x, y, e, numTerms):
+    """
+    
+    Evaluate each term of annular Zernike polynomials. This is equivalent to calling
+    ZernikeAnnularEval() with the coefficient of a single term to be 1 for each term,
+    but all terms are calculated in one pass over the points.
+    
+    Arguments:
+        x {[float]} -- x coordinate on pupil plane.
+        y {[float]} -- y coordinate on pupil plane.
+        e {[float]} -- Obscuration value. It is 0.61 in LSST.
+        numTerms {[int]} -- Number of annular Zernike terms. It should not be more than 28.
+    
+    Returns:
+        [ndarray] -- Annular Zernike polynomials in the dimension of (numTerms,) + x.shape.
+    
+    Raises:
+        ValueError -- x and y do not have the same size.
+    """
+
+    # Check the dimensions of x and y are the same or not
+    if (x.shape != y.shape):
+        raise ValueError("x & y are not the same size.")
+
+    # Calculate the basis
+    basis = cyMath.ZernikeAnnularEvalBasis(np.ascontiguousarray(x, dtype=float).ravel(), 
+                                           np.ascontiguousarray(y, dtype=float).ravel(), 
+                                           e, int(numTerms))
+
+    return basis.reshape((int(numTerms),) + x.shape)
+
+def ZernikeAnnularGradBasis(x, y, e, axis, numTerms):
+    """
+    
+    Evaluate the gradient of each term of annular Zernike polynomials in a certain direction. 
+    This is equivalent to calling ZernikeAnnularGrad() with the coefficient of a single term 
+    to be 1 for each term, but all terms are calculated in one pass over the points.
+    
+    Arguments:
+        x {[float]} -- x coordinate on pupil plane.
+        y {[float]} -- y coordinate on pupil plane.
+        e {[float]} -- Obscuration value. It is 0.61 in LSST.
+        axis {[string]} -- Integration direction. It can be "dx", "dy", "dx2", "dy2", or "dxy".
+                           The enum in cyMath such as cyMath.AXIS_DX is also accepted.
+        numTerms {[int]} -- Number of annular Zernike terms. It should not be more than 22.
+    
+    Returns:
+        [ndarray] -- Gradient of annular Zernike polynomials in the dimension of 
+                     (numTerms,) + x.shape.
+    
+    Raises:
+        ValueError -- x and y do not have the same size.
+    """
+
+    # Check the dimensions of x and y are the same or not
+    if (x.shape != y.shape):
+        raise ValueError("x & y are not the same size.")
+
+    # Calculate the basis
+    basis = cyMath.ZernikeAnnularGradBasis(np.ascontiguousarray(x, dtype=float).ravel(), 
+                                           np.ascontiguousarray(y, dtype=float).ravel(), 
+                                           e, axis, int(numTerms))
+
+    return basis.reshape((int(numTerms),) + x.shape)
+
 def ZernikeAnnularFit(S, x, y, numTerms, e, nMax=28):
     """
     
@@ -130,15 +197,10 @@ def ZernikeAnnularFit(S, x, y, numTerms, e, nMax=28):
     yFinite = yFinite[finiteIndex]
 
     # Do the fitting
-    H = np.zeros([len(SFinite), numTerms])
-
-    for ii in range(numTerms):
-        Z = np.zeros(numTerms)
-        Z[ii] = 1
-        H[:, ii] = ZernikeAnnularEval(Z, xFinite, yFinite, e, nMax=nMax)
+    H = ZernikeAnnularEvalBasis(xFinite, yFinite, e, numTerms).T
 
     # Solve the equation: H*Z = S => Z = H^(-1)S
-    Z = np.linalg.lstsq(H, S)[0]
+    Z = np.linalg.lstsq(H, SFinite)[0]
 
     return Z
 
@@ -259,6 +321,106 @@ def ZernikeMaskedFit(S, x, y, numTerms, mask, e, nMax=28):
     # Calculate coefficients of normal/ spherical Zernike polynomials
     return ZernikeAnnularFit(S, x, y, numTerms, e, nMax=nMax)
 
+class ZernikeAnnularFitter(object):
+
+    def __init__(self, x, y, cacheSize=8):
+        """
+
+        Reusable least-squares fitter of annular Zernike polynomials on the fixed coordinates.
+        The pseudo-inverse of design matrix is cached and keyed by the fitted points (mask),
+        obscuration, and number of terms. The later fit with the same keys is a single
+        matrix-vector product.
+
+        Arguments:
+            x {[ndarray]} -- Normalized x coordinate between -1 and 1 (pupil coordinate).
+            y {[ndarray]} -- Normalized y coordinate between -1 and 1 (pupil coordinate).
+
+        Keyword Arguments:
+            cacheSize {[int]} -- Maximum number of cached pseudo-inverses. (default: {8})
+
+        Raises:
+            ValueError -- x and y do not have the same size.
+        """
+
+        # Check the dimensions of x and y are the same or not
+        if (np.shape(x) != np.shape(y)):
+            raise ValueError("x & y are not the same size.")
+
+        # Keep the coordinates read-only because the cache depends on them
+        self.x = np.array(x, dtype=float)
+        self.y = np.array(y, dtype=float)
+        self.x.setflags(write=False)
+        self.y.setflags(write=False)
+
+        self.cacheSize = int(cacheSize)
+        self._pinvCache = OrderedDict()
+
+    def fit(self, S, numTerms, e, mask=None):
+        """
+
+        Get the coefficients of annular Zernike polynomials by fitting the wavefront surface.
+        This is the same as ZernikeAnnularFit() if mask is None and ZernikeMaskedFit()
+        otherwise.
+
+        Arguments:
+            S {[ndarray]} -- Wavefront surface to be fitted.
+            numTerms {[int]} -- Number of annular Zernike terms used in the fit.
+            e {[float]} -- Obscuration ratio of annular Zernikes.
+
+        Keyword Arguments:
+            mask {[ndarray]} -- Mask used. It follows the convention of ZernikeMaskedFit().
+                                (default: {None})
+
+        Returns:
+            [ndarray] -- Coefficients of annular Zernike polynomials by the fitting.
+        """
+
+        # Get the points in the fit. ZernikeMaskedFit() takes S[i, j] for mask[j, i] != 0.
+        fitIdx = np.isfinite(S + self.x + self.y)
+        if (mask is not None):
+            fitIdx &= (np.transpose(mask) != 0)
+
+        # Solve the equation: H*Z = S => Z = H^(-1)S
+        pinvH = self.__getPinv(fitIdx, numTerms, e)
+
+        return pinvH.dot(S[fitIdx])
+
+    def __getPinv(self, fitIdx, numTerms, e):
+        """
+
+        Get the pseudo-inverse of design matrix of the fit from the cache, or calculate it.
+
+        Arguments:
+            fitIdx {[ndarray]} -- Boolean index of the points in the fit.
+            numTerms {[int]} -- Number of annular Zernike terms used in the fit.
+            e {[float]} -- Obscuration ratio of annular Zernikes.
+
+        Returns:
+            [ndarray] -- Pseudo-inverse of design matrix (numTerms x number of points).
+        """
+
+        # Construct the key of cache
+        maskHash = hashlib.sha1(np.packbits(fitIdx).tobytes()).hexdigest()
+        key = (maskHash, float(e), int(numTerms))
+
+        # Return the cached pseudo-inverse if it exists
+        if key in self._pinvCache:
+            self._pinvCache.move_to_end(key)
+            return self._pinvCache[key]
+
+        # Design matrix
+        H = ZernikeAnnularEvalBasis(self.x[fitIdx], self.y[fitIdx], e, numTerms).T
+
+        pinvH = np.linalg.pinv(H)
+        pinvH.setflags(write=False)
+
+        # Put into the cache and evict the least-recently-used one if needed
+        self._pinvCache[key] = pinvH
+        while (len(self._pinvCache) > self.cacheSize):
+            self._pinvCache.popitem(last=False)
+
+        return pinvH
+
 def __checkPrecondition(Z, x, y, nMax=22):
     """
     
@@ -526,6 +688,41 @@ class ToolTest(unittest.TestCase):
                     orthogonality = nquad(funcOrtho, [[e ,1 ],[0 ,2*np.pi]])[0]
                     self.assertAlmostEqual(orthogonality, 0)
 
+        # Check the basis of all terms is the same as the evaluation term by term
+        zkBasis = ZernikeAnnularEvalBasis(self.xx, self.yy, e, 28)
+        dxBasis = ZernikeAnnularGradBasis(self.xx, self.yy, e, "dx", 22)
+        self.assertEqual(zkBasis.shape, (28,) + self.xx.shape)
+        for ii in range(22):
+            Z = np.zeros(22)
+            Z[ii] = 1
+            self.assertTrue(np.array_equal(zkBasis[ii], ZernikeAnnularEval(Z, self.xx, self.yy, e)))
+            self.assertTrue(np.array_equal(dxBasis[ii], ZernikeAnnularGrad(Z, self.xx, self.yy, e, "dx")))
+
+        # Check the result does not depend on the number of threads
+        Z = np.random.rand(22)
+        dxy = ZernikeAnnularGrad(Z, self.xx, self.yy, e, "dxy")
+        cyMath.setNumThreads(4)
+        try:
+            self.assertEqual(cyMath.getNumThreads(), 4)
+            self.assertTrue(np.array_equal(dxy, ZernikeAnnularGrad(Z, self.xx, self.yy, e, "dxy")))
+            self.assertTrue(np.array_equal(dxy, ZernikeAnnularGrad(Z, self.xx, self.yy, e, cyMath.AXIS_DXY)))
+        finally:
+            cyMath.setNumThreads(1)
+        self.assertRaises(ValueError, ZernikeAnnularGrad, Z, self.xx, self.yy, e, "dz")
+
+        # Check the cached fitter is the same as the direct fitting
+        fitter = ZernikeAnnularFitter(self.xx, self.yy)
+        surface = ZernikeAnnularEval(Z, self.xx, self.yy, e)
+        mask = (np.sqrt(self.xx**2 + self.yy**2) <= 1).astype(int)
+        mask[:, :150] = 0
+        zkMasked = ZernikeMaskedFit(surface, self.xx, self.yy, 22, mask, e)
+        self.assertTrue(np.allclose(fitter.fit(surface, 22, e, mask=mask), zkMasked))
+        self.assertTrue(np.allclose(fitter.fit(2*surface, 22, e, mask=mask), 2*zkMasked))
+        self.assertTrue(np.allclose(fitter.fit(surface, 22, e),
+                                    ZernikeAnnularFit(surface.ravel(), self.xx.ravel(),
+                                                      self.yy.ravel(), 22, e)))
+        self.assertEqual(len(fitter._pinvCache), 2)
+
         # Increase the dimension
         ZmapInc = padArray(Zmap, Zmap.shape[0]+20)
         self.assertAlmostEqual(ZmapInc.shape[0], Zmap.shape[0]+20)
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
-# This is to optimize the speed of calculation related to annular Zernike polynomials
+# This is to optimize the speed of calculation related to annular Zernike polynomials.
+# The kernels release the GIL and split the points over the OpenMP threads when the 
+# module is built with OpenMP (see builder/setup.py).
 
-cdef extern from "math.h":  
+cdef extern from "math.h" nogil:  
     double sqrt(double theta)
     double sin(double theta)
     double cos(double theta)
@@ -12,6 +14,67 @@ from numpy cimport ndarray
 import numpy as np
 cimport numpy as np
 cimport cython
+from cython.parallel cimport prange
+
+# Axis of the derivative
+cpdef enum:
+    AXIS_DX = 0
+    AXIS_DY = 1
+    AXIS_DX2 = 2
+    AXIS_DY2 = 3
+    AXIS_DXY = 4
+
+# Type of Jacobian
+cpdef enum:
+    JACOBIAN_1ST = 0
+    JACOBIAN_2ND = 1
+
+_AXIS = {"dx": AXIS_DX, "dy": AXIS_DY, "dx2": AXIS_DX2, "dy2": AXIS_DY2, "dxy": AXIS_DXY}
+_JACOBIAN = {"1st": JACOBIAN_1ST, "2nd": JACOBIAN_2ND}
+
+# Number of threads used by the kernels
+cdef int _numThreads = 1
+
+def setNumThreads(int numThreads):
+    """
+    
+    Set the number of threads used by the kernels. It only takes effect when the module 
+    is built with OpenMP.
+    
+    Arguments:
+        numThreads {[int]} -- Number of threads.
+    
+    Raises:
+        ValueError -- The number of threads is less than 1.
+    """
+
+    global _numThreads
+
+    if (numThreads < 1):
+        raise ValueError("Number of threads should be at least 1.")
+
+    _numThreads = numThreads
+
+def getNumThreads():
+    """
+    
+    Get the number of threads used by the kernels.
+    
+    Returns:
+        [int] -- Number of threads.
+    """
+
+    return _numThreads
+
+cdef int _getCode(value, dict codes) except -1:
+
+    # The value can be the enum directly or its name
+    if (value in codes.values()):
+        return value
+    elif (value in codes):
+        return codes[value]
+    else:
+        raise ValueError("Unknown value: %s. It should be one of %s." % (value, list(codes)))
 
 @cython.boundscheck(False)
 def ZernikeAnnularJacobian(ndarray[np.float64_t, ndim=1] Z not None, 
@@ -21,12 +84,16 @@ def ZernikeAnnularJacobian(ndarray[np.float64_t, ndim=1] Z not None,
     cdef Py_ssize_t n = x.shape[0]  
     cdef ndarray[np.float64_t, ndim=1] out = np.zeros_like(x)
     
-    _ZernikeAnnularJacobian(&out[0], &Z[0], &x[0], &y[0], e, atype, n)
+    cdef int atypeCode = _getCode(atype, _JACOBIAN)
+    cdef double eVal = e
+
+    with nogil:
+        _ZernikeAnnularJacobian(&out[0], &Z[0], &x[0], &y[0], eVal, atypeCode, n)
     
     return out
 
-cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, double e, 
-                             str atype, int n):
+cdef void _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, double e, 
+                                  int atype, int n) noexcept nogil:
 
     # Parameters of constant
     cdef double e2 = e**2
@@ -92,9 +159,9 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
     cdef double x2, y2, x4, y4, xy, r2, r4, x6, y6, temp, x_c, y_c
     cdef int ii
 
-    if (atype == "1st"):
+    if (atype == JACOBIAN_1ST):
         
-        for ii in range(n):   
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
         
             x_c = x[ii]
             y_c = y[ii]
@@ -107,51 +174,51 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
             y4 = y2 * y2
         
             temp = Z[0] * 0 * x_c  # to make d an array with the same size as x
-            temp += Z[1] * 0
-            temp += Z[2] * 0
+            temp = temp + (Z[1] * 0)
+            temp = temp + (Z[2] * 0)
             
-            temp += Z[3] * sqrt_3 * 8 / den1
-            temp += Z[4] * sqrt_6 * 0
-            temp += Z[5] * sqrt_6 * 0
+            temp = temp + (Z[3] * sqrt_3 * 8 / den1)
+            temp = temp + (Z[4] * sqrt_6 * 0)
+            temp = temp + (Z[5] * sqrt_6 * 0)
             
             
-            temp += Z[6] * sqrt_8 * 24 * y_c * (1 + e2) / den2
-            temp += Z[7] * sqrt_8 * 24 * x_c * (1 + e2) / den2
-            temp += Z[8] * sqrt_8 * 0
-            temp += Z[9] * sqrt_8 * 0
+            temp = temp + (Z[6] * sqrt_8 * 24 * y_c * (1 + e2) / den2)
+            temp = temp + (Z[7] * sqrt_8 * 24 * x_c * (1 + e2) / den2)
+            temp = temp + (Z[8] * sqrt_8 * 0)
+            temp = temp + (Z[9] * sqrt_8 * 0)
             
-            temp += Z[10] * sqrt_5 * (96 * r2 - 24 * (1 + e2)) / den3
+            temp = temp + (Z[10] * sqrt_5 * (96 * r2 - 24 * (1 + e2)) / den3)
         
-            temp += Z[11] * sqrt_10 * 48 * (x2 - y2) * \
-                    (1 + e2 + e4) * num4 / den4
-            temp += Z[12] * sqrt_10 * 96 * xy * (1 + e2 + e4) * num4 / den4
-            temp += Z[13] * sqrt_10 * 0
-            temp += Z[14] * sqrt_10 * 0
+            temp = temp + (Z[11] * sqrt_10 * 48 * (x2 - y2) * \
+                    (1 + e2 + e4) * num4 / den4)
+            temp = temp + (Z[12] * sqrt_10 * 96 * xy * (1 + e2 + e4) * num4 / den4)
+            temp = temp + (Z[13] * sqrt_10 * 0)
+            temp = temp + (Z[14] * sqrt_10 * 0)
             
-            temp += Z[15] * sqrt_12 * 48 * x_c * (
+            temp = temp + (Z[15] * sqrt_12 * 48 * x_c * (
                     5 * r2 * (1 + 4 * e2 + e4) - 2 *
-                    (1 + 4 * e2 + 4 * e4 + e6)) * num5 / den5
-            temp += Z[16] * sqrt_12 * 48 * y_c * (
+                    (1 + 4 * e2 + 4 * e4 + e6)) * num5 / den5)
+            temp = temp + (Z[16] * sqrt_12 * 48 * y_c * (
                     5 * r2 * (1 + 4 * e2 + e4) - 2 *
-                    (1 + 4 * e2 + 4 * e4 + e6)) * num5 / den5
+                    (1 + 4 * e2 + 4 * e4 + e6)) * num5 / den5)
                     
-            temp += Z[17] * sqrt_12 * 80.0 * x_c * \
-                    (x2 - 3.0 * y2) * (1 + e2) * (1 + e4) * num6 / den6
-            temp += Z[18] * sqrt_12 * 80.0 * y_c * \
-                    (3 * x2 - y2) * (1 + e2) * (1 + e4) * num6 / den6
-            temp += Z[19] * sqrt_12 * 0
-            temp += Z[20] * sqrt_12 * 0
-            
-            temp += Z[21] * sqrt_7 * 48 * (
+            temp = temp + (Z[17] * sqrt_12 * 80.0 * x_c * \
+                    (x2 - 3.0 * y2) * (1 + e2) * (1 + e4) * num6 / den6)
+            temp = temp + (Z[18] * sqrt_12 * 80.0 * y_c * \
+                    (3 * x2 - y2) * (1 + e2) * (1 + e4) * num6 / den6)
+            temp = temp + (Z[19] * sqrt_12 * 0)
+            temp = temp + (Z[20] * sqrt_12 * 0)
+            
+            temp = temp + (Z[21] * sqrt_7 * 48 * (
                     e4 - 10 * e2 * x2 - 10 * e2 * y2 +
                     3 * e2 + 15 * x4 + 30 * x2 * y2 - 10 * x2 +
-                    15 * y4 - 10 * y2 + 1) / den7
+                    15 * y4 - 10 * y2 + 1) / den7)
         
             out[ii] = temp
     
-    elif (atype == "2nd"):
+    elif (atype == JACOBIAN_2ND):
         
-        for ii in range(n):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             
             x_c = x[ii]
             y_c = y[ii]
@@ -166,44 +233,44 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
             y6 = y4 * y2
         
             temp = Z[0]**2 * 0 * x_c  # to make d an array with the same size as x
-            temp += Z[1]**2 * 0
-            temp += Z[2]**2 * 0
+            temp = temp + (Z[1]**2 * 0)
+            temp = temp + (Z[2]**2 * 0)
 
-            temp += Z[3]**2 * (3) * 16 / den1 / den1
+            temp = temp + (Z[3]**2 * (3) * 16 / den1 / den1)
             
-            temp += Z[4]**2 * (6) * (-4) / den2_2
-            temp += Z[5]**2 * (6) * (-4) / den2_2
+            temp = temp + (Z[4]**2 * (6) * (-4) / den2_2)
+            temp = temp + (Z[5]**2 * (6) * (-4) / den2_2)
             
             
-            temp += Z[6]**2 * (8) * (108 * y2 - 36 * x2) * (1 + e2) / den2_3
-            temp += Z[7]**2 * (8) * (108 * x2 - 36 * y2) * (1 + e2) / den2_3
+            temp = temp + (Z[6]**2 * (8) * (108 * y2 - 36 * x2) * (1 + e2) / den2_3)
+            temp = temp + (Z[7]**2 * (8) * (108 * x2 - 36 * y2) * (1 + e2) / den2_3)
             
             
-            temp += Z[8]**2 * (8) * (-36 * r2) / den2_4
-            temp += Z[9]**2 * (8) * (-36 * r2) / den2_4
+            temp = temp + (Z[8]**2 * (8) * (-36 * r2) / den2_4)
+            temp = temp + (Z[9]**2 * (8) * (-36 * r2) / den2_4)
             
-            temp += Z[10]**2 * (5) * 144 * (1 + e2 - 2 * r2) * \
-                    (1 + e2 - 6 * r2) / den2_5
+            temp = temp + (Z[10]**2 * (5) * 144 * (1 + e2 - 2 * r2) * \
+                    (1 + e2 - 6 * r2) / den2_5)
                 
-            temp += Z[11]**2 * (10) * 36 * (
+            temp = temp + (Z[11]**2 * (10) * 36 * (
                     8 * (1 + e2 + e4) * x2 - 1 - e2 - e4 - e6) * \
-                    (1 + e2 + e4 + e6 - 8 * (1 + e2 + e4) * y2) * num2_6 / den2_6
-            temp += Z[12]**2 * (10) * 36 * (
+                    (1 + e2 + e4 + e6 - 8 * (1 + e2 + e4) * y2) * num2_6 / den2_6)
+            temp = temp + (Z[12]**2 * (10) * 36 * (
                     -4 * (x_c - y_c)**2 * (e4 + e2 + 1) + 1 + e2 + e4 + e6) * \
-                    (4 * (x_c + y_c)**2 * (e4 + e2 + 1) - 1 - e2 - e4 - e6) * num2_6 / den2_6
+                    (4 * (x_c + y_c)**2 * (e4 + e2 + 1) - 1 - e2 - e4 - e6) * num2_6 / den2_6)
                 
-            temp += Z[13]**2 * (10) * (-144) * r2**2 / den2_7
-            temp += Z[14]**2 * (10) * (-144) * r2**2 / den2_7
+            temp = temp + (Z[13]**2 * (10) * (-144) * r2**2 / den2_7)
+            temp = temp + (Z[14]**2 * (10) * (-144) * r2**2 / den2_7)
 
-            temp += Z[15]**2 * (12) * 64 * (
+            temp = temp + (Z[15]**2 * (12) * 64 * (
                     (3 * e6 - 5 * e4 * r2 + 12 * e4 - 20 * e2 * r2 +
                      12 * e2 - 5 * r2 + 3) *
                      (9 * e6 * x2 - 3 * e6 * y2 - 25 * e4 * x4 - 20 * e4 * x2 * y2 +
                       36 * e4 * x2 + 5 * e4 * y4 - 12 * e4 * y2 - 100 * e2 * x4 -
                       80 * e2 * x2 * y2 + 36 * e2 * x2 + 20 * e2 * y4 -
                       12 * e2 * y2 - 25 * x4 - 20 * x2 * y2 +
-                      9 * x2 + 5 * y4 - 3 * y2)) * num2_8 / den2_8
-            temp += Z[16]**2 * (12) * 64 * (
+                      9 * x2 + 5 * y4 - 3 * y2)) * num2_8 / den2_8)
+            temp = temp + (Z[16]**2 * (12) * 64 * (
                     -(3 * e6 - 5 * e4 * r2 + 12 * e4 - 20 * e2 * r2 + 12 * e2 -
                       5 * r2 + 3) * (3 * e6 * x2 - 9 * e6 * y2 - 5 * e4 * x4 +
                                      20 * e4 * x2 * y2 + 12 * e4 * x2 + 25 * e4 * y4 -
@@ -211,9 +278,9 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
                                      12 * e2 * x2 + 100 * e2 * y4 -
                                      36 * e2 * y2 - 5 * x4 +
                                      20 * x2 * y2 + 3 * x2 + 25 * y4 -
-                                     9 * y2)) * num2_8 / den2_8
+                                     9 * y2)) * num2_8 / den2_8)
                 
-            temp += Z[17]**2 * (12) * 16.0 * (
+            temp = temp + (Z[17]**2 * (12) * 16.0 * (
                     - 36 * e16 * x2 - 36 * e16 * y2 + 180 * e14 * x4 +
                     360 * e14 * x2 * y2 - 72 * e14 * x2 +
                     180 * e14 * y4 - 72 * e14 * y2 - 125 * e12 * x6 -
@@ -235,8 +302,8 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
                     72 * e2 * x2 - 450 * e2 * y6 + 360 * e2 * y4 - 72 * e2 *
                     y2 - 125 * x6 - 1275 * x4 * y2 + 180 * x4 + 225 * x2 * y4 +
                     360 * x2 * y2 - 36 * x2 - 225 * y6 + 180 * y4 -
-                    36 * y2) * num2_9 / den2_9
-            temp += Z[18]**2 * (12) * 16.0 * ((
+                    36 * y2) * num2_9 / den2_9)
+            temp = temp + (Z[18]**2 * (12) * 16.0 * ((
                     - 225 * e12 - 450 * e10 - 675 * e8 - 900 * e6 - 675 * e4 -
                     450 * e2 - 225) * x6 +
                     (180 * e14 + 225 * e12 * y2 + 360 * e12 + 450 * e10 * y2 +
@@ -255,16 +322,16 @@ cdef _ZernikeAnnularJacobian(double *out, double *Z, double *x, double *y, doubl
                       e8 * y6 + 720 * e8 * y4 - 180 * e8 * y2 - 500 * e6 * y6 +
                       720 * e6 * y4 - 144 * e6 * y2 - 375 * e4 * y6 + 540 * e4 * y4 -
                       108 * e4 * y2 - 250 * e2 * y6 + 360 * e2 * y4 - 72 * e2 * y2 -
-                      125 * y6 + 180 * y4 - 36 * y2) * num2_9 / den2_9
+                      125 * y6 + 180 * y4 - 36 * y2) * num2_9 / den2_9)
 
-            temp += Z[19]**2 * (12) * (-400) * r2**3 / den2_10
-            temp += Z[20]**2 * (12) * (-400) * r2**3 / den2_10
+            temp = temp + (Z[19]**2 * (12) * (-400) * r2**3 / den2_10)
+            temp = temp + (Z[20]**2 * (12) * (-400) * r2**3 / den2_10)
         
-            temp += Z[21]**2 * (7) * 576 * ((
+            temp = temp + (Z[21]**2 * (7) * 576 * ((
                     e4 - 5 * e2 * x2 - 5 * e2 * y2 + 3 * e2 + 5 * x4 +
                     10 * x2 * y2 - 5 * x2 + 5 * y4 - 5 * y2 + 1) *
                     (e4 - 15 * e2 * x2 - 15 * e2 * y2 + 3 * e2 +
-                     25 * x4 + 50 * x2 * y2 - 15 * x2 + 25 * y4 - 15 * y2 + 1)) / den2_11
+                     25 * x4 + 50 * x2 * y2 - 15 * x2 + 25 * y4 - 15 * y2 + 1)) / den2_11)
         
             out[ii] = temp
         
@@ -274,12 +341,16 @@ def ZernikeAnnularGrad(ndarray[np.float64_t, ndim=1] Z not None, ndarray[np.floa
     cdef Py_ssize_t n = x.shape[0]  
     cdef ndarray[np.float64_t, ndim=1] d = np.zeros_like(x)
     
-    _ZernikeAnnularGrad(&d[0], &Z[0], &x[0], &y[0], e, axis, n)
+    cdef int axisCode = _getCode(axis, _AXIS)
+    cdef double eVal = e
+
+    with nogil:
+        _ZernikeAnnularGrad(&d[0], &Z[0], &x[0], &y[0], eVal, axisCode, n)
     
     return d
 
-cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e, 
-                         str axis, int n):
+cdef void _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e, 
+                              int axis, int n) noexcept nogil:
 
     # Parameters of constant
     cdef double e2 = e**2
@@ -326,9 +397,9 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
     cdef double x2, y2, x4, y4, xy, r2, r4, temp, x_c, y_c
     cdef int ii
     
-    if (axis == "dx"):
+    if (axis == AXIS_DX):
                 
-        for ii in range(n):        
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             x_c = x[ii]
             y_c = y[ii]
             
@@ -341,65 +412,65 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
             
             temp = Z[0] * 0 * x_c  # to make d an array with the same size as x
             
-            temp += Z[1] * 2 * 1 / den1
-            temp += Z[2] * 2 * 0
+            temp = temp + (Z[1] * 2 * 1 / den1)
+            temp = temp + (Z[2] * 2 * 0)
 
-            temp += Z[3] * sqrt_3 * 4 * x_c / den2
+            temp = temp + (Z[3] * sqrt_3 * 4 * x_c / den2)
           
-            temp += Z[4] * sqrt_6 * 2 * y_c / den3
-            temp += Z[5] * sqrt_6 * 2 * x_c / den3
+            temp = temp + (Z[4] * sqrt_6 * 2 * y_c / den3)
+            temp = temp + (Z[5] * sqrt_6 * 2 * x_c / den3)
             
-            temp += Z[6] * sqrt_8 * 6 * xy * (1 + e2) / den4
-            temp += Z[7] * sqrt_8 * ((9 * x2 + 3 * y2 - 2) *
-                                         (1 + e2) - 2 * e4) / den4
+            temp = temp + (Z[6] * sqrt_8 * 6 * xy * (1 + e2) / den4)
+            temp = temp + (Z[7] * sqrt_8 * ((9 * x2 + 3 * y2 - 2) *
+                                         (1 + e2) - 2 * e4) / den4)
         
-            temp += Z[8] * sqrt_8 * 6 * xy / den5
-            temp += Z[9] * sqrt_8 * (3 * x2 - 3 * y2) / den5
+            temp = temp + (Z[8] * sqrt_8 * 6 * xy / den5)
+            temp = temp + (Z[9] * sqrt_8 * (3 * x2 - 3 * y2) / den5)
             
-            temp += Z[10] * sqrt_5 * 12 * x_c * (2 * r2 - 1 - e2) / den6
+            temp = temp + (Z[10] * sqrt_5 * 12 * x_c * (2 * r2 - 1 - e2) / den6)
             
-            temp += Z[11] * sqrt_10 * (x_c * (16 * x2 - 6) *
-                                           (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7
-            temp += Z[12] * sqrt_10 * (y_c * (24 * x2 + 8 * y2 - 6) *
-                                           (1 + e2 + e4) - 6 * y_c * e6) * num7 / den7
+            temp = temp + (Z[11] * sqrt_10 * (x_c * (16 * x2 - 6) *
+                                           (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7)
+            temp = temp + (Z[12] * sqrt_10 * (y_c * (24 * x2 + 8 * y2 - 6) *
+                                           (1 + e2 + e4) - 6 * y_c * e6) * num7 / den7)
                      
-            temp += Z[13] * sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8
-            temp += Z[14] * sqrt_10 * 4 * y_c * (3 * x2 - y2) / den8
+            temp = temp + (Z[13] * sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8)
+            temp = temp + (Z[14] * sqrt_10 * 4 * y_c * (3 * x2 - y2) / den8)
             
-            temp += Z[15] * sqrt_12 * (
+            temp = temp + (Z[15] * sqrt_12 * (
                     3 * e8 - 36 * e6 * x2 - 12 * e6 * y2 + 12 * e6 +
                     50 * e4 * x4 + 60 * e4 * x2 * y2 - 144 * e4 * x2 +
                     10 * e4 * y4 - 48 * e4 * y2 + 30 * e4 + 200 * e2 * x4 + 240 *
                     e2 * x2 * y2 - 144 * e2 * x2 + 40 * e2 * y4 - 48 * e2 * y2 +
                     12 * e2 + 50 * x4 + 60 * x2 * y2 - 36 * x2 +
-                    10 * y4 - 12 * y2 + 3) * num9 / den9
-            temp += Z[16] * sqrt_12 * (
+                    10 * y4 - 12 * y2 + 3) * num9 / den9)
+            temp = temp + (Z[16] * sqrt_12 * (
                     8 * xy * (5 * r2 * (1 + 4 * e2 + e4) -
-                          (3 + 12 * e2 + 12 * e4 + 3 * e6))) * num9 / den9
+                          (3 + 12 * e2 + 12 * e4 + 3 * e6))) * num9 / den9)
            
-            temp += Z[17] * sqrt_12 * (
+            temp = temp + (Z[17] * sqrt_12 * (
                     25 * (e6 + e4 + e2 + 1) * x4 +
                     (- 12 * e8 - 30 * e6 * y2 - 12 * e6 - 30 * e4 * y2 - 12 * e4 -
                      30 * e2 * y2 - 12 * e2 - 30 * y2 - 12) * x2 + 12 * e8 * y2 -
                      15 * e6 * y4 + 12 * e6 * y2 - 15 * e4 * y4 + 12 * e4 * y2 -
-                     15 * e2 * y4 + 12 * e2 * y2 - 15 * y4 + 12 * y2) * num10 / den10
-            temp += Z[18] * sqrt_12 * (
+                     15 * e2 * y4 + 12 * e2 * y2 - 15 * y4 + 12 * y2) * num10 / den10)
+            temp = temp + (Z[18] * sqrt_12 * (
                     4.0 * xy * (15 * (e6 + e4 + e2 + 1) * x2 - 6 * e8 + 5 * e6 * y2 -
                             6 * e6 + 5 * e4 * y2 - 6 * e4 + 5 * e2 * y2 -
-                            6 * e2 + 5 * y2 - 6)) * num10 / den10
+                            6 * e2 + 5 * y2 - 6)) * num10 / den10)
             
-            temp += Z[19] * sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11
-            temp += Z[20] * sqrt_12 * 20 * xy * (x2 - y2) / den11
+            temp = temp + (Z[19] * sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11)
+            temp = temp + (Z[20] * sqrt_12 * 20 * xy * (x2 - y2) / den11)
             
-            temp += Z[21] * sqrt_7 * 24 * x_c * (
+            temp = temp + (Z[21] * sqrt_7 * 24 * x_c * (
                     e4 - e2 * (5 * y2 - 3) + 5 * x4 - 5 * y2 + 5 * y4 -
-                    x2 * (5 * e2 - 10 * y2 + 5) + 1) / den12    
+                    x2 * (5 * e2 - 10 * y2 + 5) + 1) / den12)
                     
             d[ii] = temp        
     
-    elif (axis == "dy"):
+    elif (axis == AXIS_DY):
               
-        for ii in range(n):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             
             x_c = x[ii]
             y_c = y[ii]
@@ -413,68 +484,68 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
             
             temp = Z[0] * 0 * x_c   # to make d an array with the same size as x
             
-            temp += Z[1] * 2 * 0
-            temp += Z[2] * 2 * 1 / den1
+            temp = temp + (Z[1] * 2 * 0)
+            temp = temp + (Z[2] * 2 * 1 / den1)
             
-            temp += Z[3] * sqrt_3 * 4 * y_c / den2
+            temp = temp + (Z[3] * sqrt_3 * 4 * y_c / den2)
             
-            temp += Z[4] * sqrt_6 * 2 * x_c / den3
-            temp += Z[5] * sqrt_6 * (-2) * y_c / den3
+            temp = temp + (Z[4] * sqrt_6 * 2 * x_c / den3)
+            temp = temp + (Z[5] * sqrt_6 * (-2) * y_c / den3)
             
-            temp += Z[6] * sqrt_8 * ((1 + e2) *
-                                         (3 * x2 + 9 * y2 - 2) - 2 * e4) / den4
-            temp += Z[7] * sqrt_8 * 6 * xy * (1 + e2) / den4
+            temp = temp + (Z[6] * sqrt_8 * ((1 + e2) *
+                                         (3 * x2 + 9 * y2 - 2) - 2 * e4) / den4)
+            temp = temp + (Z[7] * sqrt_8 * 6 * xy * (1 + e2) / den4)
             
-            temp += Z[8] * sqrt_8 * (3 * x2 - 3 * y2) / den5
-            temp += Z[9] * sqrt_8 * (-6) * xy / den5
+            temp = temp + (Z[8] * sqrt_8 * (3 * x2 - 3 * y2) / den5)
+            temp = temp + (Z[9] * sqrt_8 * (-6) * xy / den5)
             
-            temp += Z[10] * sqrt_5 * 12 * y_c * (2 * r2 - 1 - e2) / den6
+            temp = temp + (Z[10] * sqrt_5 * 12 * y_c * (2 * r2 - 1 - e2) / den6)
             
-            temp += Z[11] * sqrt_10 * (y_c * (6 - 16 * y2) *
-                                           (1 + e2 + e4) + 6 * y_c * e6) * num7 / den7
-            temp += Z[12] * sqrt_10 * (x_c * (8 * x2 + 24 * y2 - 6) *
-                                           (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7
+            temp = temp + (Z[11] * sqrt_10 * (y_c * (6 - 16 * y2) *
+                                           (1 + e2 + e4) + 6 * y_c * e6) * num7 / den7)
+            temp = temp + (Z[12] * sqrt_10 * (x_c * (8 * x2 + 24 * y2 - 6) *
+                                           (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7)
         
-            temp += Z[13] * sqrt_10 * 4 * y_c * (y2 - 3 * x2) / den8
-            temp += Z[14] * sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8
+            temp = temp + (Z[13] * sqrt_10 * 4 * y_c * (y2 - 3 * x2) / den8)
+            temp = temp + (Z[14] * sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8)
 
-            temp += Z[15] * sqrt_12 * (
+            temp = temp + (Z[15] * sqrt_12 * (
                     -x_c * (24 * y_c + 4 * e2 * (24 * y_c - 40 * y_c * r2) +
                           2 * e4 * (48 * y_c - 20 * y_c * r2) + 24 * e6 * y_c -
-                          40 * y_c * r2)) * num9 / den9
-            temp += Z[16] * sqrt_12 * (
+                          40 * y_c * r2)) * num9 / den9)
+            temp = temp + (Z[16] * sqrt_12 * (
                     3 * e8 - 12 * e6 * x2 - 36 * e6 * y2 + 12 * e6 + 10 * e4 * x4 +
                     60 * e4 * x2 * y2 - 48 * e4 * x2 +
                     50 * e4 * y4 - 144 * e4 * y2 + 30 * e4 + 40 * e2 * x4 + 240 *
                     e2 * x2 * y2 - 48 * e2 * x2 + 200 * e2 * y4 - 144 * e2 * y2 +
                     12 * e2 + 10 * x4 + 60 * x2 * y2 - 12 * x2 +
-                    50 * y4 - 36 * y2 + 3) * num9 / den9
+                    50 * y4 - 36 * y2 + 3) * num9 / den9)
 
-            temp += Z[17] * sqrt_12 * (
+            temp = temp + (Z[17] * sqrt_12 * (
                     4.0 * xy * ((- 5) * (e6 + e4 + e2 + 1) * x2 + 6 * e8 -
                             15 * e6 * y2 + 6 * e6 - 15 * e4 * y2 +
                             6 * e4 - 15 * e2 * y2 + 6 * e2 -
-                            15 * y2 + 6)) * num10 / den10
-            temp += Z[18] * sqrt_12 * (
+                            15 * y2 + 6)) * num10 / den10)
+            temp = temp + (Z[18] * sqrt_12 * (
                     - 12 * e8 * x2 + 12 * e8 * y2 + 15 * e6 * x4 +
                     30 * e6 * x2 * y2 - 12 * e6 * x2 - 25 * e6 * y4 +
                     12 * e6 * y2 + 15 * e4 * x4 + 30 * e4 * x2 * y2 - 12 * e4 * x2 -
                     25 * e4 * y4 + 12 * e4 * y2 + 15 * e2 * x4 + 30 * e2 * x2 * y2 -
                     12 * e2 * x2 - 25 * e2 * y4 + 12 * e2 * y2 + 15 * x4 +
-                    30 * x2 * y2 - 12 * x2 - 25 * y4 + 12 * y2) * num10 / den10
+                    30 * x2 * y2 - 12 * x2 - 25 * y4 + 12 * y2) * num10 / den10)
                     
-            temp += Z[19] * sqrt_12 * 20 * xy * (y2 - x2) / den11
-            temp += Z[20] * sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11
+            temp = temp + (Z[19] * sqrt_12 * 20 * xy * (y2 - x2) / den11)
+            temp = temp + (Z[20] * sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11)
             
-            temp += Z[21] * sqrt_7 * 24 * y_c * (
+            temp = temp + (Z[21] * sqrt_7 * 24 * y_c * (
                 e4 - e2 * (5 * x2 - 3) - 5 * x2 + 5 * x4 + 5 * y4 -
-                y2 * (5 * e2 - 10 * x2 + 5) + 1) / den12
+                y2 * (5 * e2 - 10 * x2 + 5) + 1) / den12)
         
             d[ii] = temp 
         
-    elif (axis == "dx2"):
+    elif (axis == AXIS_DX2):
                 
-        for ii in range(n):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             
             x_c = x[ii]
             y_c = y[ii]
@@ -488,60 +559,60 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
             r4 = r2 * r2
         
             temp = Z[0] * 0 * x_c  # to make d an array with the same size as x
-            temp += Z[1] * 0
-            temp += Z[2] * 0
+            temp = temp + (Z[1] * 0)
+            temp = temp + (Z[2] * 0)
             
-            temp += Z[3] * sqrt_3 * 4 / den2
-            temp += Z[4] * 0
+            temp = temp + (Z[3] * sqrt_3 * 4 / den2)
+            temp = temp + (Z[4] * 0)
             
-            temp += Z[5] * sqrt_6 * 2 / den3
+            temp = temp + (Z[5] * sqrt_6 * 2 / den3)
             
-            temp += Z[6] * sqrt_8 * 6 * y_c * (1 + e2) / den4
-            temp += Z[7] * sqrt_8 * 18 * x_c * (1 + e2) / den4
+            temp = temp + (Z[6] * sqrt_8 * 6 * y_c * (1 + e2) / den4)
+            temp = temp + (Z[7] * sqrt_8 * 18 * x_c * (1 + e2) / den4)
             
-            temp += Z[8] * sqrt_8 * 6 * y_c / den5
-            temp += Z[9] * sqrt_8 * 6 * x_c / den5
+            temp = temp + (Z[8] * sqrt_8 * 6 * y_c / den5)
+            temp = temp + (Z[9] * sqrt_8 * 6 * x_c / den5)
         
-            temp += Z[10] * sqrt_5 * 12 * (6 * x2 + 2 * y2 - e2 - 1) / den6
+            temp = temp + (Z[10] * sqrt_5 * 12 * (6 * x2 + 2 * y2 - e2 - 1) / den6)
             
-            temp += Z[11] * sqrt_10 * ((48 * x2 - 6) *
-                                           (1 + e2 + e4) - 6 * e6) * num7 / den7
-            temp += Z[12] * sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7
+            temp = temp + (Z[11] * sqrt_10 * ((48 * x2 - 6) *
+                                           (1 + e2 + e4) - 6 * e6) * num7 / den7)
+            temp = temp + (Z[12] * sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7)
             
-            temp += Z[13] * sqrt_10 * 12 * (x2 - y2) / den8
-            temp += Z[14] * sqrt_10 * 24 * xy / den8
+            temp = temp + (Z[13] * sqrt_10 * 12 * (x2 - y2) / den8)
+            temp = temp + (Z[14] * sqrt_10 * 24 * xy / den8)
         
-            temp += Z[15] * sqrt_12 * (
+            temp = temp + (Z[15] * sqrt_12 * (
                     -8 * x_c * (9 * e6 - 25 * e4 * x2 - 15 * e4 * y2 + 36 * e4 -
                           100 * e2 * x2 - 60 * e2 * y2 + 36 * e2 - 25 * x2 -
-                          15 * y2 + 9)) * num9 / den9
-            temp += Z[16] * sqrt_12 * (
+                          15 * y2 + 9)) * num9 / den9)
+            temp = temp + (Z[16] * sqrt_12 * (
                     -8 * y_c * (3 * e6 - 15 * e4 * x2 - 5 * e4 * y2 + 12 * e4 -
                           60 * e2 * x2 - 20 * e2 * y2 + 12 * e2 - 15 * x2 -
-                          5 * y2 + 3)) * num9 / den9
+                          5 * y2 + 3)) * num9 / den9)
            
-            temp += Z[17] * sqrt_12 * (
+            temp = temp + (Z[17] * sqrt_12 * (
                     -4 * x_c * (6 * e8 - 25 * e6 * x2 + 15 * e6 * y2 + 6 * e6 -
                           25 * e4 * x2 + 15 * e4 * y2 + 6 * e4 - 25 * e2 * x2 +
                           15 * e2 * y2 + 6 * e2 - 25 * x2 +
-                          15 * y2 + 6)) * num10 / den10
-            temp += Z[18] * sqrt_12 * (
+                          15 * y2 + 6)) * num10 / den10)
+            temp = temp + (Z[18] * sqrt_12 * (
                     -4 * y_c * (6 * e8 - 45 * e6 * x2 - 5 * e6 * y2 + 6 * e6 -
                           45 * e4 * x2 - 5 * e4 * y2 + 6 * e4 - 45 * e2 * x2 -
-                          5 * e2 * y2 + 6 * e2 - 45 * x2 - 5 * y2 + 6)) * num10 / den10
+                          5 * e2 * y2 + 6 * e2 - 45 * x2 - 5 * y2 + 6)) * num10 / den10)
                     
-            temp += Z[19] * sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11
-            temp += Z[20] * sqrt_12 * 20 * y_c * (3 * x2 - y2) / den11
+            temp = temp + (Z[19] * sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11)
+            temp = temp + (Z[20] * sqrt_12 * 20 * y_c * (3 * x2 - y2) / den11)
             
-            temp += Z[21] * sqrt_7 * (
+            temp = temp + (Z[21] * sqrt_7 * (
                     480 * x2 * r2 + 120 * r4 + 24 * e4 - 360 * x2 - 120 * y2 -
-                    3 * e2 * (120 * x2 + 40 * y2 - 24) + 24) / den12
+                    3 * e2 * (120 * x2 + 40 * y2 - 24) + 24) / den12)
         
             d[ii] = temp
                 
-    elif (axis == "dy2"):
+    elif (axis == AXIS_DY2):
             
-        for ii in range(n):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             
             x_c = x[ii]
             y_c = y[ii]
@@ -555,61 +626,61 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
             r4 = r2 * r2
             
             temp = Z[0] * 0 * x_c  # to make d an array with the same size as x
-            temp += Z[1] * 0
-            temp += Z[2] * 0
+            temp = temp + (Z[1] * 0)
+            temp = temp + (Z[2] * 0)
           
-            temp += Z[3] * sqrt_3 * 4 / den2
-            temp += Z[4] * 0
+            temp = temp + (Z[3] * sqrt_3 * 4 / den2)
+            temp = temp + (Z[4] * 0)
             
-            temp += Z[5] * sqrt_6 * (-2) / den3
+            temp = temp + (Z[5] * sqrt_6 * (-2) / den3)
             
-            temp += Z[6] * sqrt_8 * (1 + e2) * 18 * y_c / den4
-            temp += Z[7] * sqrt_8 * 6 * x_c * (1 + e2) / den4
+            temp = temp + (Z[6] * sqrt_8 * (1 + e2) * 18 * y_c / den4)
+            temp = temp + (Z[7] * sqrt_8 * 6 * x_c * (1 + e2) / den4)
             
-            temp += Z[8] * sqrt_8 * (-6) * y_c / den5
-            temp += Z[9] * sqrt_8 * (-6) * x_c / den5
+            temp = temp + (Z[8] * sqrt_8 * (-6) * y_c / den5)
+            temp = temp + (Z[9] * sqrt_8 * (-6) * x_c / den5)
             
-            temp += Z[10] * sqrt_5 * 12 * (2 * x2 + 6 * y2 - e2 - 1) / den6
+            temp = temp + (Z[10] * sqrt_5 * 12 * (2 * x2 + 6 * y2 - e2 - 1) / den6)
             
-            temp += Z[11] * sqrt_10 * ((6 - 48 * y2) *
-                                           (1 + e2 + e4) + 6 * e6) * num7 / den7
-            temp += Z[12] * sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7
+            temp = temp + (Z[11] * sqrt_10 * ((6 - 48 * y2) *
+                                           (1 + e2 + e4) + 6 * e6) * num7 / den7)
+            temp = temp + (Z[12] * sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7)
             
-            temp += Z[13] * sqrt_10 * 12 * (y2 - x2) / den8
-            temp += Z[14] * sqrt_10 * (-24) * xy / den8
+            temp = temp + (Z[13] * sqrt_10 * 12 * (y2 - x2) / den8)
+            temp = temp + (Z[14] * sqrt_10 * (-24) * xy / den8)
             
-            temp += Z[15] * sqrt_12 * (
+            temp = temp + (Z[15] * sqrt_12 * (
                     -8 * x_c * (3 * e6 - 5 * e4 * x2 - 15 * e4 * y2 + 12 * e4 -
                           20 * e2 * x2 - 60 * e2 * y2 + 12 * e2 - 5 * x2 -
-                          15 * y2 + 3)) * num9 / den9
-            temp += Z[16] * sqrt_12 * (
+                          15 * y2 + 3)) * num9 / den9)
+            temp = temp + (Z[16] * sqrt_12 * (
                     -8 * y_c * (9 * e6 - 15 * e4 * x2 - 25 * e4 * y2 + 36 * e4 -
                           60 * e2 * x2 - 100 * e2 * y2 + 36 * e2 - 15 * x2 -
-                          25 * y2 + 9)) * num9 / den9
+                          25 * y2 + 9)) * num9 / den9)
               
-            temp += Z[17] * sqrt_12 * (
+            temp = temp + (Z[17] * sqrt_12 * (
                     4 * x_c * (6 * e8 - 5 * e6 * x2 - 45 * e6 * y2 + 6 * e6 -
                          5 * e4 * x2 - 45 * e4 * y2 + 6 * e4 - 5 * e2 * x2 -
                          45 * e2 * y2 + 6 * e2 - 5 * x2 - 45 * y2 +
-                         6)) * num10 / den10
-            temp += Z[18] * sqrt_12 * (
+                         6)) * num10 / den10)
+            temp = temp + (Z[18] * sqrt_12 * (
                     4 * y_c * (6 * e8 + 15 * e6 * x2 - 25 * e6 * y2 + 6 * e6 +
                          15 * e4 * x2 - 25 * e4 * y2 + 6 * e4 + 15 * e2 * x2 -
                          25 * e2 * y2 + 6 * e2 + 15 * x2 - 25 * y2 +
-                         6)) * num10 / den10
+                         6)) * num10 / den10)
          
-            temp += Z[19] * sqrt_12 * 20 * x_c * (3 * y2 - x2) / den11
-            temp += Z[20] * sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11
+            temp = temp + (Z[19] * sqrt_12 * 20 * x_c * (3 * y2 - x2) / den11)
+            temp = temp + (Z[20] * sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11)
             
-            temp += Z[21] * sqrt_7 * (
+            temp = temp + (Z[21] * sqrt_7 * (
                     480 * y2 * r2 + 120 * r4 + 24 * e4 - 120 * x2 - 360 * y2 -
-                    3 * e2 * (40 * x2 + 120 * y2 - 24) + 24) / den12
+                    3 * e2 * (40 * x2 + 120 * y2 - 24) + 24) / den12)
             
             d[ii] = temp
             
-    elif (axis == "dxy"):
+    elif (axis == AXIS_DXY):
                    
-        for ii in range(n):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             
             x_c = x[ii]
             y_c = y[ii]
@@ -623,63 +694,530 @@ cdef _ZernikeAnnularGrad(double *d, double *Z, double *x, double *y, double e,
             r4 = r2 * r2
              
             temp = Z[0] * 0 * x_c  # to make d an array with the same size as x
-            temp += Z[1] * 0
-            temp += Z[2] * 0
-            temp += Z[3] * 0
+            temp = temp + (Z[1] * 0)
+            temp = temp + (Z[2] * 0)
+            temp = temp + (Z[3] * 0)
             
-            temp += Z[4] * sqrt_6 * 2 / den3
-            temp += Z[5] * 0
+            temp = temp + (Z[4] * sqrt_6 * 2 / den3)
+            temp = temp + (Z[5] * 0)
             
-            temp += Z[6] * sqrt_8 * (1 + e2) * (6 * x_c) / den4
-            temp += Z[7] * sqrt_8 * 6 * y_c * (1 + e2) / den4
+            temp = temp + (Z[6] * sqrt_8 * (1 + e2) * (6 * x_c) / den4)
+            temp = temp + (Z[7] * sqrt_8 * 6 * y_c * (1 + e2) / den4)
            
-            temp += Z[8] * sqrt_8 * 6 * x_c / den5
-            temp += Z[9] * sqrt_8 * (-6) * y_c / den5
+            temp = temp + (Z[8] * sqrt_8 * 6 * x_c / den5)
+            temp = temp + (Z[9] * sqrt_8 * (-6) * y_c / den5)
             
-            temp += Z[10] * sqrt_5 * 48 * xy / den6
+            temp = temp + (Z[10] * sqrt_5 * 48 * xy / den6)
         
-            temp += Z[11] * sqrt_10 * 0
-            temp += Z[12] * sqrt_10 * ((24 * x2 + 24 * y2 - 6) *
-                                           (1 + e2 + e4) - 6 * e6) * num7 / den7
+            temp = temp + (Z[11] * sqrt_10 * 0)
+            temp = temp + (Z[12] * sqrt_10 * ((24 * x2 + 24 * y2 - 6) *
+                                           (1 + e2 + e4) - 6 * e6) * num7 / den7)
                      
-            temp += Z[13] * sqrt_10 * (-24) * xy / den8
-            temp += Z[14] * sqrt_10 * 12 * (x2 - y2) / den8
+            temp = temp + (Z[13] * sqrt_10 * (-24) * xy / den8)
+            temp = temp + (Z[14] * sqrt_10 * 12 * (x2 - y2) / den8)
             
-            temp += Z[15] * sqrt_12 * (
+            temp = temp + (Z[15] * sqrt_12 * (
                     -8 * y_c * (3 * e6 - 15 * e4 * x2 - 5 * e4 * y2 + 12 * e4 -
                           60 * e2 * x2 - 20 * e2 * y2 + 12 * e2 - 15 * x2 -
-                          5 * y2 + 3)) * num9 / den9
-            temp += Z[16] * sqrt_12 * (
+                          5 * y2 + 3)) * num9 / den9)
+            temp = temp + (Z[16] * sqrt_12 * (
                     -8 * x_c * (3 * e6 - 5 * e4 * x2 - 15 * e4 * y2 + 12 * e4 -
                           20 * e2 * x2 - 60 * e2 * y2 + 12 * e2 - 5 * x2 -
-                          15 * y2 + 3)) * num9 / den9
+                          15 * y2 + 3)) * num9 / den9)
                     
-            temp += Z[17] * sqrt_12 * (
+            temp = temp + (Z[17] * sqrt_12 * (
                     12 * y_c * (2 * e8 - 5 * e6 * r2 + 2 * e6 - 5 * e4 * r2 + 2 * e4 -
-                          5 * e2 * r2 + 2 * e2 - 5 * r2 + 2)) * num10 / den10
-            temp += Z[18] * sqrt_12 * (
+                          5 * e2 * r2 + 2 * e2 - 5 * r2 + 2)) * num10 / den10)
+            temp = temp + (Z[18] * sqrt_12 * (
                     -12 * x_c * (2 * e8 - 5 * e6 * r2 + 2 * e6 -
                            5 * e4 * r2 + 2 * e4 - 5 * e2 * r2 + 2 * e2 -
-                           5 * r2 + 2)) * num10 / den10
+                           5 * r2 + 2)) * num10 / den10)
       
-            temp += Z[19] * sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11
-            temp += Z[20] * sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11
+            temp = temp + (Z[19] * sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11)
+            temp = temp + (Z[20] * sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11)
             
-            temp += Z[21] * sqrt_7 * 240 * xy * (2 * r2 - 1 - e2) / den12
+            temp = temp + (Z[21] * sqrt_7 * 240 * xy * (2 * r2 - 1 - e2) / den12)
     
             d[ii] = temp
 
+def ZernikeAnnularGradBasis(ndarray[np.float64_t, ndim=1] x not None, 
+                            ndarray[np.float64_t, ndim=1] y not None, e, axis, int nTerms):
+
+    if ((nTerms < 1) or (nTerms > 22)):
+        raise ValueError("Number of terms should be between 1 and 22.")
+
+    cdef Py_ssize_t n = x.shape[0]
+    cdef ndarray[np.float64_t, ndim=2] d = np.zeros((nTerms, n))
+    cdef int axisCode = _getCode(axis, _AXIS)
+    cdef double eVal = e
+
+    if (n > 0):
+        with nogil:
+            _ZernikeAnnularGradBasis(&d[0, 0], &x[0], &y[0], eVal, axisCode, nTerms, n)
+
+    return d
+
+cdef void _ZernikeAnnularGradBasis(double *d, double *x, double *y, double e, int axis, 
+                                   int nTerms, int n) noexcept nogil:
+
+    # Parameters of constant
+    cdef double e2 = e**2
+    cdef double e4 = e2*e2
+    cdef double e6 = e4*e2
+    cdef double e8 = e6*e2
+    cdef double e10 = e8*e2
+    cdef double e12 = e10*e2
+    
+    cdef double sqrt_3 = sqrt(3)
+    cdef double sqrt_5 = sqrt(5)
+    cdef double sqrt_6 = sqrt(6)
+    cdef double sqrt_7 = sqrt(7)
+    cdef double sqrt_8 = sqrt(8)
+    cdef double sqrt_10 = sqrt(10)
+    cdef double sqrt_12 = sqrt(12)
+
+    cdef double den1 = sqrt(1 + e2)
+    cdef double den2 = 1 - e2
+    cdef double den3 = sqrt(1 + e2 + e4)
+    cdef double den4 = sqrt((1 - e2)**2 * (1 + e2) * (1 + 4 * e2 + e4))
+    cdef double den5 = sqrt(1 + e2 + e4 + e6)
+    cdef double den6 = (1 - e2)**2
+    
+    cdef double den7 = (1 - e2)**3 * (1 + e2 + e4)
+    cdef double num7 = sqrt((1 - e2)**4 * (1 + e2 + e4) /
+                      (1 + 4 * e2 + 10 * e4 + 4 * e6 + e8))
+    
+    cdef double den8 = sqrt(1 + e2 + e4 + e6 + e8)
+    
+    cdef double den9 = (1 - e2)**3 * (1 + 4 * e2 + e4)
+    cdef double num9 = sqrt((1 - e2)**2 * (1 + 4 * e2 + e4) /
+                      (1 + 9 * e2 + 9 * e4 + e6))
+    
+    cdef double den10 = (1 - e2)**4 * (1 + e2) * (1 + e4)
+    cdef double num10 = sqrt((1 - e2)**6 * (1 + e2) * (1 + e4) /
+                      (1 + 4 * e2 + 10 * e4 + 20 * e6 + 10 * e8 +
+                       4 * e10 + e12))
+    
+    cdef double den11 = sqrt(1 + e2 + e4 + e6 + e8 + e10)
+    cdef double den12 = (1 - e2)**3
+
+    # Parameters in loop
+    cdef double x2, y2, x4, y4, xy, r2, r4, zero, x_c, y_c
+    cdef int ii
+    
+    if (axis == AXIS_DX):
+
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
+
+            x_c = x[ii]
+            y_c = y[ii]
+
+            x2 = x_c * x_c
+            y2 = y_c * y_c
+            x4 = x2 * x2
+            y4 = y2 * y2
+            xy = x_c * y_c
+            r2 = x2 + y2
+
+            # Used to keep NaN of the input coordinate in all terms
+            zero = 0 * x_c
+
+            d[ii] = 0 + zero
+            if (nTerms > 1):
+                d[1*n + ii] = 2 * 1 / den1 + zero
+            if (nTerms > 2):
+                d[2*n + ii] = 2 * 0 + zero
+            if (nTerms > 3):
+                d[3*n + ii] = sqrt_3 * 4 * x_c / den2 + zero
+            if (nTerms > 4):
+                d[4*n + ii] = sqrt_6 * 2 * y_c / den3 + zero
+            if (nTerms > 5):
+                d[5*n + ii] = sqrt_6 * 2 * x_c / den3 + zero
+            if (nTerms > 6):
+                d[6*n + ii] = sqrt_8 * 6 * xy * (1 + e2) / den4 + zero
+            if (nTerms > 7):
+                d[7*n + ii] = sqrt_8 * ((9 * x2 + 3 * y2 - 2) *
+                                     (1 + e2) - 2 * e4) / den4 + zero
+            if (nTerms > 8):
+                d[8*n + ii] = sqrt_8 * 6 * xy / den5 + zero
+            if (nTerms > 9):
+                d[9*n + ii] = sqrt_8 * (3 * x2 - 3 * y2) / den5 + zero
+            if (nTerms > 10):
+                d[10*n + ii] = sqrt_5 * 12 * x_c * (2 * r2 - 1 - e2) / den6 + zero
+            if (nTerms > 11):
+                d[11*n + ii] = sqrt_10 * (x_c * (16 * x2 - 6) *
+                                       (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7 + zero
+            if (nTerms > 12):
+                d[12*n + ii] = sqrt_10 * (y_c * (24 * x2 + 8 * y2 - 6) *
+                                       (1 + e2 + e4) - 6 * y_c * e6) * num7 / den7 + zero
+            if (nTerms > 13):
+                d[13*n + ii] = sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8 + zero
+            if (nTerms > 14):
+                d[14*n + ii] = sqrt_10 * 4 * y_c * (3 * x2 - y2) / den8 + zero
+            if (nTerms > 15):
+                d[15*n + ii] = sqrt_12 * (
+                    3 * e8 - 36 * e6 * x2 - 12 * e6 * y2 + 12 * e6 +
+                    50 * e4 * x4 + 60 * e4 * x2 * y2 - 144 * e4 * x2 +
+                    10 * e4 * y4 - 48 * e4 * y2 + 30 * e4 + 200 * e2 * x4 + 240 *
+                    e2 * x2 * y2 - 144 * e2 * x2 + 40 * e2 * y4 - 48 * e2 * y2 +
+                    12 * e2 + 50 * x4 + 60 * x2 * y2 - 36 * x2 +
+                    10 * y4 - 12 * y2 + 3) * num9 / den9 + zero
+            if (nTerms > 16):
+                d[16*n + ii] = sqrt_12 * (
+                    8 * xy * (5 * r2 * (1 + 4 * e2 + e4) -
+                      (3 + 12 * e2 + 12 * e4 + 3 * e6))) * num9 / den9 + zero
+            if (nTerms > 17):
+                d[17*n + ii] = sqrt_12 * (
+                    25 * (e6 + e4 + e2 + 1) * x4 +
+                    (- 12 * e8 - 30 * e6 * y2 - 12 * e6 - 30 * e4 * y2 - 12 * e4 -
+                    30 * e2 * y2 - 12 * e2 - 30 * y2 - 12) * x2 + 12 * e8 * y2 -
+                    15 * e6 * y4 + 12 * e6 * y2 - 15 * e4 * y4 + 12 * e4 * y2 -
+                    15 * e2 * y4 + 12 * e2 * y2 - 15 * y4 + 12 * y2) * num10 / den10 + zero
+            if (nTerms > 18):
+                d[18*n + ii] = sqrt_12 * (
+                    4.0 * xy * (15 * (e6 + e4 + e2 + 1) * x2 - 6 * e8 + 5 * e6 * y2 -
+                        6 * e6 + 5 * e4 * y2 - 6 * e4 + 5 * e2 * y2 -
+                        6 * e2 + 5 * y2 - 6)) * num10 / den10 + zero
+            if (nTerms > 19):
+                d[19*n + ii] = sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11 + zero
+            if (nTerms > 20):
+                d[20*n + ii] = sqrt_12 * 20 * xy * (x2 - y2) / den11 + zero
+            if (nTerms > 21):
+                d[21*n + ii] = sqrt_7 * 24 * x_c * (
+                    e4 - e2 * (5 * y2 - 3) + 5 * x4 - 5 * y2 + 5 * y4 -
+                    x2 * (5 * e2 - 10 * y2 + 5) + 1) / den12 + zero
+
+    elif (axis == AXIS_DY):
+
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
+
+            x_c = x[ii]
+            y_c = y[ii]
+
+            x2 = x_c * x_c
+            y2 = y_c * y_c
+            x4 = x2 * x2
+            y4 = y2 * y2
+            xy = x_c * y_c
+            r2 = x2 + y2
+
+            # Used to keep NaN of the input coordinate in all terms
+            zero = 0 * x_c
+
+            d[ii] = 0 + zero
+            if (nTerms > 1):
+                d[1*n + ii] = 2 * 0 + zero
+            if (nTerms > 2):
+                d[2*n + ii] = 2 * 1 / den1 + zero
+            if (nTerms > 3):
+                d[3*n + ii] = sqrt_3 * 4 * y_c / den2 + zero
+            if (nTerms > 4):
+                d[4*n + ii] = sqrt_6 * 2 * x_c / den3 + zero
+            if (nTerms > 5):
+                d[5*n + ii] = sqrt_6 * (-2) * y_c / den3 + zero
+            if (nTerms > 6):
+                d[6*n + ii] = sqrt_8 * ((1 + e2) *
+                                     (3 * x2 + 9 * y2 - 2) - 2 * e4) / den4 + zero
+            if (nTerms > 7):
+                d[7*n + ii] = sqrt_8 * 6 * xy * (1 + e2) / den4 + zero
+            if (nTerms > 8):
+                d[8*n + ii] = sqrt_8 * (3 * x2 - 3 * y2) / den5 + zero
+            if (nTerms > 9):
+                d[9*n + ii] = sqrt_8 * (-6) * xy / den5 + zero
+            if (nTerms > 10):
+                d[10*n + ii] = sqrt_5 * 12 * y_c * (2 * r2 - 1 - e2) / den6 + zero
+            if (nTerms > 11):
+                d[11*n + ii] = sqrt_10 * (y_c * (6 - 16 * y2) *
+                                       (1 + e2 + e4) + 6 * y_c * e6) * num7 / den7 + zero
+            if (nTerms > 12):
+                d[12*n + ii] = sqrt_10 * (x_c * (8 * x2 + 24 * y2 - 6) *
+                                       (1 + e2 + e4) - 6 * x_c * e6) * num7 / den7 + zero
+            if (nTerms > 13):
+                d[13*n + ii] = sqrt_10 * 4 * y_c * (y2 - 3 * x2) / den8 + zero
+            if (nTerms > 14):
+                d[14*n + ii] = sqrt_10 * 4 * x_c * (x2 - 3 * y2) / den8 + zero
+            if (nTerms > 15):
+                d[15*n + ii] = sqrt_12 * (
+                    -x_c * (24 * y_c + 4 * e2 * (24 * y_c - 40 * y_c * r2) +
+                      2 * e4 * (48 * y_c - 20 * y_c * r2) + 24 * e6 * y_c -
+                      40 * y_c * r2)) * num9 / den9 + zero
+            if (nTerms > 16):
+                d[16*n + ii] = sqrt_12 * (
+                    3 * e8 - 12 * e6 * x2 - 36 * e6 * y2 + 12 * e6 + 10 * e4 * x4 +
+                    60 * e4 * x2 * y2 - 48 * e4 * x2 +
+                    50 * e4 * y4 - 144 * e4 * y2 + 30 * e4 + 40 * e2 * x4 + 240 *
+                    e2 * x2 * y2 - 48 * e2 * x2 + 200 * e2 * y4 - 144 * e2 * y2 +
+                    12 * e2 + 10 * x4 + 60 * x2 * y2 - 12 * x2 +
+                    50 * y4 - 36 * y2 + 3) * num9 / den9 + zero
+            if (nTerms > 17):
+                d[17*n + ii] = sqrt_12 * (
+                    4.0 * xy * ((- 5) * (e6 + e4 + e2 + 1) * x2 + 6 * e8 -
+                        15 * e6 * y2 + 6 * e6 - 15 * e4 * y2 +
+                        6 * e4 - 15 * e2 * y2 + 6 * e2 -
+                        15 * y2 + 6)) * num10 / den10 + zero
+            if (nTerms > 18):
+                d[18*n + ii] = sqrt_12 * (
+                    - 12 * e8 * x2 + 12 * e8 * y2 + 15 * e6 * x4 +
+                    30 * e6 * x2 * y2 - 12 * e6 * x2 - 25 * e6 * y4 +
+                    12 * e6 * y2 + 15 * e4 * x4 + 30 * e4 * x2 * y2 - 12 * e4 * x2 -
+                    25 * e4 * y4 + 12 * e4 * y2 + 15 * e2 * x4 + 30 * e2 * x2 * y2 -
+                    12 * e2 * x2 - 25 * e2 * y4 + 12 * e2 * y2 + 15 * x4 +
+                    30 * x2 * y2 - 12 * x2 - 25 * y4 + 12 * y2) * num10 / den10 + zero
+            if (nTerms > 19):
+                d[19*n + ii] = sqrt_12 * 20 * xy * (y2 - x2) / den11 + zero
+            if (nTerms > 20):
+                d[20*n + ii] = sqrt_12 * 5 * (x2 * (x2 - 6 * y2) + y4) / den11 + zero
+            if (nTerms > 21):
+                d[21*n + ii] = sqrt_7 * 24 * y_c * (
+                    e4 - e2 * (5 * x2 - 3) - 5 * x2 + 5 * x4 + 5 * y4 -
+                    y2 * (5 * e2 - 10 * x2 + 5) + 1) / den12 + zero
+
+    elif (axis == AXIS_DX2):
+
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
+
+            x_c = x[ii]
+            y_c = y[ii]
+
+            x2 = x_c * x_c
+            y2 = y_c * y_c
+            x4 = x2 * x2
+            y4 = y2 * y2
+            xy = x_c * y_c
+            r2 = x2 + y2
+            r4 = r2 * r2
+
+            # Used to keep NaN of the input coordinate in all terms
+            zero = 0 * x_c
+
+            d[ii] = 0 + zero
+            if (nTerms > 1):
+                d[1*n + ii] = 0 + zero
+            if (nTerms > 2):
+                d[2*n + ii] = 0 + zero
+            if (nTerms > 3):
+                d[3*n + ii] = sqrt_3 * 4 / den2 + zero
+            if (nTerms > 4):
+                d[4*n + ii] = 0 + zero
+            if (nTerms > 5):
+                d[5*n + ii] = sqrt_6 * 2 / den3 + zero
+            if (nTerms > 6):
+                d[6*n + ii] = sqrt_8 * 6 * y_c * (1 + e2) / den4 + zero
+            if (nTerms > 7):
+                d[7*n + ii] = sqrt_8 * 18 * x_c * (1 + e2) / den4 + zero
+            if (nTerms > 8):
+                d[8*n + ii] = sqrt_8 * 6 * y_c / den5 + zero
+            if (nTerms > 9):
+                d[9*n + ii] = sqrt_8 * 6 * x_c / den5 + zero
+            if (nTerms > 10):
+                d[10*n + ii] = sqrt_5 * 12 * (6 * x2 + 2 * y2 - e2 - 1) / den6 + zero
+            if (nTerms > 11):
+                d[11*n + ii] = sqrt_10 * ((48 * x2 - 6) *
+                                       (1 + e2 + e4) - 6 * e6) * num7 / den7 + zero
+            if (nTerms > 12):
+                d[12*n + ii] = sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7 + zero
+            if (nTerms > 13):
+                d[13*n + ii] = sqrt_10 * 12 * (x2 - y2) / den8 + zero
+            if (nTerms > 14):
+                d[14*n + ii] = sqrt_10 * 24 * xy / den8 + zero
+            if (nTerms > 15):
+                d[15*n + ii] = sqrt_12 * (
+                    -8 * x_c * (9 * e6 - 25 * e4 * x2 - 15 * e4 * y2 + 36 * e4 -
+                      100 * e2 * x2 - 60 * e2 * y2 + 36 * e2 - 25 * x2 -
+                      15 * y2 + 9)) * num9 / den9 + zero
+            if (nTerms > 16):
+                d[16*n + ii] = sqrt_12 * (
+                    -8 * y_c * (3 * e6 - 15 * e4 * x2 - 5 * e4 * y2 + 12 * e4 -
+                      60 * e2 * x2 - 20 * e2 * y2 + 12 * e2 - 15 * x2 -
+                      5 * y2 + 3)) * num9 / den9 + zero
+            if (nTerms > 17):
+                d[17*n + ii] = sqrt_12 * (
+                    -4 * x_c * (6 * e8 - 25 * e6 * x2 + 15 * e6 * y2 + 6 * e6 -
+                      25 * e4 * x2 + 15 * e4 * y2 + 6 * e4 - 25 * e2 * x2 +
+                      15 * e2 * y2 + 6 * e2 - 25 * x2 +
+                      15 * y2 + 6)) * num10 / den10 + zero
+            if (nTerms > 18):
+                d[18*n + ii] = sqrt_12 * (
+                    -4 * y_c * (6 * e8 - 45 * e6 * x2 - 5 * e6 * y2 + 6 * e6 -
+                      45 * e4 * x2 - 5 * e4 * y2 + 6 * e4 - 45 * e2 * x2 -
+                      5 * e2 * y2 + 6 * e2 - 45 * x2 - 5 * y2 + 6)) * num10 / den10 + zero
+            if (nTerms > 19):
+                d[19*n + ii] = sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11 + zero
+            if (nTerms > 20):
+                d[20*n + ii] = sqrt_12 * 20 * y_c * (3 * x2 - y2) / den11 + zero
+            if (nTerms > 21):
+                d[21*n + ii] = sqrt_7 * (
+                    480 * x2 * r2 + 120 * r4 + 24 * e4 - 360 * x2 - 120 * y2 -
+                    3 * e2 * (120 * x2 + 40 * y2 - 24) + 24) / den12 + zero
+
+    elif (axis == AXIS_DY2):
+
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
+
+            x_c = x[ii]
+            y_c = y[ii]
+
+            x2 = x_c * x_c
+            y2 = y_c * y_c
+            x4 = x2 * x2
+            y4 = y2 * y2
+            xy = x_c * y_c
+            r2 = x2 + y2
+            r4 = r2 * r2
+
+            # Used to keep NaN of the input coordinate in all terms
+            zero = 0 * x_c
+
+            d[ii] = 0 + zero
+            if (nTerms > 1):
+                d[1*n + ii] = 0 + zero
+            if (nTerms > 2):
+                d[2*n + ii] = 0 + zero
+            if (nTerms > 3):
+                d[3*n + ii] = sqrt_3 * 4 / den2 + zero
+            if (nTerms > 4):
+                d[4*n + ii] = 0 + zero
+            if (nTerms > 5):
+                d[5*n + ii] = sqrt_6 * (-2) / den3 + zero
+            if (nTerms > 6):
+                d[6*n + ii] = sqrt_8 * (1 + e2) * 18 * y_c / den4 + zero
+            if (nTerms > 7):
+                d[7*n + ii] = sqrt_8 * 6 * x_c * (1 + e2) / den4 + zero
+            if (nTerms > 8):
+                d[8*n + ii] = sqrt_8 * (-6) * y_c / den5 + zero
+            if (nTerms > 9):
+                d[9*n + ii] = sqrt_8 * (-6) * x_c / den5 + zero
+            if (nTerms > 10):
+                d[10*n + ii] = sqrt_5 * 12 * (2 * x2 + 6 * y2 - e2 - 1) / den6 + zero
+            if (nTerms > 11):
+                d[11*n + ii] = sqrt_10 * ((6 - 48 * y2) *
+                                       (1 + e2 + e4) + 6 * e6) * num7 / den7 + zero
+            if (nTerms > 12):
+                d[12*n + ii] = sqrt_10 * 48 * xy * (1 + e2 + e4) * num7 / den7 + zero
+            if (nTerms > 13):
+                d[13*n + ii] = sqrt_10 * 12 * (y2 - x2) / den8 + zero
+            if (nTerms > 14):
+                d[14*n + ii] = sqrt_10 * (-24) * xy / den8 + zero
+            if (nTerms > 15):
+                d[15*n + ii] = sqrt_12 * (
+                    -8 * x_c * (3 * e6 - 5 * e4 * x2 - 15 * e4 * y2 + 12 * e4 -
+                      20 * e2 * x2 - 60 * e2 * y2 + 12 * e2 - 5 * x2 -
+                      15 * y2 + 3)) * num9 / den9 + zero
+            if (nTerms > 16):
+                d[16*n + ii] = sqrt_12 * (
+                    -8 * y_c * (9 * e6 - 15 * e4 * x2 - 25 * e4 * y2 + 36 * e4 -
+                      60 * e2 * x2 - 100 * e2 * y2 + 36 * e2 - 15 * x2 -
+                      25 * y2 + 9)) * num9 / den9 + zero
+            if (nTerms > 17):
+                d[17*n + ii] = sqrt_12 * (
+                    4 * x_c * (6 * e8 - 5 * e6 * x2 - 45 * e6 * y2 + 6 * e6 -
+                     5 * e4 * x2 - 45 * e4 * y2 + 6 * e4 - 5 * e2 * x2 -
+                     45 * e2 * y2 + 6 * e2 - 5 * x2 - 45 * y2 +
+                     6)) * num10 / den10 + zero
+            if (nTerms > 18):
+                d[18*n + ii] = sqrt_12 * (
+                    4 * y_c * (6 * e8 + 15 * e6 * x2 - 25 * e6 * y2 + 6 * e6 +
+                     15 * e4 * x2 - 25 * e4 * y2 + 6 * e4 + 15 * e2 * x2 -
+                     25 * e2 * y2 + 6 * e2 + 15 * x2 - 25 * y2 +
+                     6)) * num10 / den10 + zero
+            if (nTerms > 19):
+                d[19*n + ii] = sqrt_12 * 20 * x_c * (3 * y2 - x2) / den11 + zero
+            if (nTerms > 20):
+                d[20*n + ii] = sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11 + zero
+            if (nTerms > 21):
+                d[21*n + ii] = sqrt_7 * (
+                    480 * y2 * r2 + 120 * r4 + 24 * e4 - 120 * x2 - 360 * y2 -
+                    3 * e2 * (40 * x2 + 120 * y2 - 24) + 24) / den12 + zero
+
+    elif (axis == AXIS_DXY):
+
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
+
+            x_c = x[ii]
+            y_c = y[ii]
+
+            x2 = x_c * x_c
+            y2 = y_c * y_c
+            x4 = x2 * x2
+            y4 = y2 * y2
+            xy = x_c * y_c
+            r2 = x2 + y2
+            r4 = r2 * r2
+
+            # Used to keep NaN of the input coordinate in all terms
+            zero = 0 * x_c
+
+            d[ii] = 0 + zero
+            if (nTerms > 1):
+                d[1*n + ii] = 0 + zero
+            if (nTerms > 2):
+                d[2*n + ii] = 0 + zero
+            if (nTerms > 3):
+                d[3*n + ii] = 0 + zero
+            if (nTerms > 4):
+                d[4*n + ii] = sqrt_6 * 2 / den3 + zero
+            if (nTerms > 5):
+                d[5*n + ii] = 0 + zero
+            if (nTerms > 6):
+                d[6*n + ii] = sqrt_8 * (1 + e2) * (6 * x_c) / den4 + zero
+            if (nTerms > 7):
+                d[7*n + ii] = sqrt_8 * 6 * y_c * (1 + e2) / den4 + zero
+            if (nTerms > 8):
+                d[8*n + ii] = sqrt_8 * 6 * x_c / den5 + zero
+            if (nTerms > 9):
+                d[9*n + ii] = sqrt_8 * (-6) * y_c / den5 + zero
+            if (nTerms > 10):
+                d[10*n + ii] = sqrt_5 * 48 * xy / den6 + zero
+            if (nTerms > 11):
+                d[11*n + ii] = sqrt_10 * 0 + zero
+            if (nTerms > 12):
+                d[12*n + ii] = sqrt_10 * ((24 * x2 + 24 * y2 - 6) *
+                                       (1 + e2 + e4) - 6 * e6) * num7 / den7 + zero
+            if (nTerms > 13):
+                d[13*n + ii] = sqrt_10 * (-24) * xy / den8 + zero
+            if (nTerms > 14):
+                d[14*n + ii] = sqrt_10 * 12 * (x2 - y2) / den8 + zero
+            if (nTerms > 15):
+                d[15*n + ii] = sqrt_12 * (
+                    -8 * y_c * (3 * e6 - 15 * e4 * x2 - 5 * e4 * y2 + 12 * e4 -
+                      60 * e2 * x2 - 20 * e2 * y2 + 12 * e2 - 15 * x2 -
+                      5 * y2 + 3)) * num9 / den9 + zero
+            if (nTerms > 16):
+                d[16*n + ii] = sqrt_12 * (
+                    -8 * x_c * (3 * e6 - 5 * e4 * x2 - 15 * e4 * y2 + 12 * e4 -
+                      20 * e2 * x2 - 60 * e2 * y2 + 12 * e2 - 5 * x2 -
+                      15 * y2 + 3)) * num9 / den9 + zero
+            if (nTerms > 17):
+                d[17*n + ii] = sqrt_12 * (
+                    12 * y_c * (2 * e8 - 5 * e6 * r2 + 2 * e6 - 5 * e4 * r2 + 2 * e4 -
+                      5 * e2 * r2 + 2 * e2 - 5 * r2 + 2)) * num10 / den10 + zero
+            if (nTerms > 18):
+                d[18*n + ii] = sqrt_12 * (
+                    -12 * x_c * (2 * e8 - 5 * e6 * r2 + 2 * e6 -
+                       5 * e4 * r2 + 2 * e4 - 5 * e2 * r2 + 2 * e2 -
+                       5 * r2 + 2)) * num10 / den10 + zero
+            if (nTerms > 19):
+                d[19*n + ii] = sqrt_12 * 20 * y_c * (y2 - 3 * x2) / den11 + zero
+            if (nTerms > 20):
+                d[20*n + ii] = sqrt_12 * 20 * x_c * (x2 - 3 * y2) / den11 + zero
+            if (nTerms > 21):
+                d[21*n + ii] = sqrt_7 * 240 * xy * (2 * r2 - 1 - e2) / den12 + zero
+
 def ZernikeAnnularEval(ndarray[np.float64_t, ndim=1] Z not None, ndarray[np.float64_t, ndim=1] x not None, 
                        ndarray[np.float64_t, ndim=1] y not None, e):
 
     cdef Py_ssize_t n = x.shape[0]  
     cdef ndarray[np.float64_t, ndim=1] S = np.zeros_like(x)
     
-    _ZernikeAnnularEval(&S[0], &Z[0], &x[0], &y[0], e, n)
+    cdef double eVal = e
+
+    with nogil:
+        _ZernikeAnnularEval(&S[0], &Z[0], &x[0], &y[0], eVal, n)
     
     return S
 
-cdef _ZernikeAnnularEval(double *S, double *Z, double *x, double *y, double e, int n):
+cdef void _ZernikeAnnularEval(double *S, double *Z, double *x, double *y, double e, 
+                              int n) noexcept nogil:
     
     # Parameters of constant
     cdef double e2 = e**2
@@ -742,7 +1280,7 @@ cdef _ZernikeAnnularEval(double *S, double *Z, double *x, double *y, double e, i
     cdef double temp, numQ, x_c, y_c, Rnl
     cdef int ii
     
-    for ii in range(n):
+    for ii in prange(n, schedule="static", num_threads=_numThreads):
         
         x_c = x[ii]
         y_c = y[ii]
@@ -778,86 +1316,292 @@ cdef _ZernikeAnnularEval(double *S, double *Z, double *x, double *y, double e, i
         temp = Z[0] * (1 + 0 * x_c)
 
         Rnl = 2 * r / den1
-        temp += Z[1] * Rnl * c
-        temp += Z[2] * Rnl * s
+        temp = temp + (Z[1] * Rnl * c)
+        temp = temp + (Z[2] * Rnl * s)
         
-        temp += Z[3] * sqrt_3 * (2 * r2 - 1 - e2) / den2
+        temp = temp + (Z[3] * sqrt_3 * (2 * r2 - 1 - e2) / den2)
         
         Rnl = sqrt_6 * r2 / den3
-        temp += Z[4] * Rnl * s2
-        temp += Z[5] * Rnl * c2
+        temp = temp + (Z[4] * Rnl * s2)
+        temp = temp + (Z[5] * Rnl * c2)
         
         Rnl = sqrt_8 * (3 * r3 - 2 * r - 2 * e4 * r + e2 * r * (3 * r2 - 2)) / den4
-        temp += Z[6] * Rnl * s
-        temp += Z[7] * Rnl * c
+        temp = temp + (Z[6] * Rnl * s)
+        temp = temp + (Z[7] * Rnl * c)
         
         Rnl = sqrt_8 * r3 / den5
-        temp += Z[8] * Rnl * s3
-        temp += Z[9] * Rnl * c3
+        temp = temp + (Z[8] * Rnl * s3)
+        temp = temp + (Z[9] * Rnl * c3)
         
-        temp += Z[10] * sqrt_5 * (6 * r4 - 6 * r2 + 1 +
-                                      e4 + e2 * (4 - 6 * r2)) / den6
+        temp = temp + (Z[10] * sqrt_5 * (6 * r4 - 6 * r2 + 1 +
+                                      e4 + e2 * (4 - 6 * r2)) / den6)
     
         Rnl = sqrt_10 * (4 * r4 - 3 * r2 - 3 * e6 * r2 - e2 * r2 * (3 - 4 * r2) -
                          e4 * r2 * (3 - 4 * r2)) * num7 / den7
-        temp += Z[11] * Rnl * c2                
-        temp += Z[12] * Rnl * s2
+        temp = temp + (Z[11] * Rnl * c2)
+        temp = temp + (Z[12] * Rnl * s2)
 
         Rnl = sqrt_10 * r4 / den8
-        temp += Z[13] * Rnl * c4
-        temp += Z[14] * Rnl * s4
+        temp = temp + (Z[13] * Rnl * c4)
+        temp = temp + (Z[14] * Rnl * s4)
 
         numQ = 10 * r5 - 12 * r3 + 3 * r + 3 * e8 * r - 12 * e6 * r * (r2 - 1) + \
                 2 * e4 * r * (15 - 24 * r2 + 5 * r4) + \
                 4 * e2 * r * (3 - 12 * r2 + 10 * r4)
         Rnl = sqrt_12 * num9E * numQ / den9
-        temp += Z[15] * Rnl * c
-        temp += Z[16] * Rnl * s
+        temp = temp + (Z[15] * Rnl * c)
+        temp = temp + (Z[16] * Rnl * s)
         
         numQ = r3 * (5 * r2 - 4 - 4 * e8 - e2 * (4 - 5 * r2) -
                      e4 * (4 - 5 * r2) - e6 * (4 - 5 * r2))
         Rnl = sqrt_12 * num10E * numQ / den10
-        temp += Z[17] * Rnl * c3
-        temp += Z[18] * Rnl * s3
+        temp = temp + (Z[17] * Rnl * c3)
+        temp = temp + (Z[18] * Rnl * s3)
         
         Rnl = sqrt_12 * r5 / den11
-        temp += Z[19] * Rnl * c5
-        temp += Z[20] * Rnl * s5
+        temp = temp + (Z[19] * Rnl * c5)
+        temp = temp + (Z[20] * Rnl * s5)
                 
-        temp += Z[21] * sqrt_7 * (
+        temp = temp + (Z[21] * sqrt_7 * (
                   20 * r6 - 30 * r4 + 12 * r2 - 1 - e6 +
-                  3 * e4 * (-3 + 4 * r2) - 3 * e2 * (3 - 12 * r2 + 10 * r4)) / den12
+                  3 * e4 * (-3 + 4 * r2) - 3 * e2 * (3 - 12 * r2 + 10 * r4)) / den12)
 
         Rnl = sqrt_14 * ( num11a*r6 + num11b*r4 + num11c*r2 ) / den13
-        temp += Z[22] * Rnl * s2
-        temp += Z[23] * Rnl * c2
+        temp = temp + (Z[22] * Rnl * s2)
+        temp = temp + (Z[23] * Rnl * c2)
 
         Rnl = sqrt_14 * ( 6*r6 + num12*r4 ) / den14
-        temp += Z[24] * Rnl * s4
-        temp += Z[25] * Rnl * c4
+        temp = temp + (Z[24] * Rnl * s4)
+        temp = temp + (Z[25] * Rnl * c4)
         
         Rnl = sqrt_14 * num13 * r6
-        temp += Z[26] * Rnl * s6
-        temp += Z[27] * Rnl * c6
+        temp = temp + (Z[26] * Rnl * s6)
+        temp = temp + (Z[27] * Rnl * c6)
                 
         S[ii] = temp
 
+def ZernikeAnnularEvalBasis(ndarray[np.float64_t, ndim=1] x not None, 
+                            ndarray[np.float64_t, ndim=1] y not None, e, int nTerms):
+
+    if ((nTerms < 1) or (nTerms > 28)):
+        raise ValueError("Number of terms should be between 1 and 28.")
+
+    cdef Py_ssize_t n = x.shape[0]
+    cdef ndarray[np.float64_t, ndim=2] S = np.zeros((nTerms, n))
+    cdef double eVal = e
+
+    if (n > 0):
+        with nogil:
+            _ZernikeAnnularEvalBasis(&S[0, 0], &x[0], &y[0], eVal, nTerms, n)
+
+    return S
+
+cdef void _ZernikeAnnularEvalBasis(double *S, double *x, double *y, double e, int nTerms, 
+                                   int n) noexcept nogil:
+    
+    # Parameters of constant
+    cdef double e2 = e**2
+    cdef double e4 = e2*e2
+    cdef double e6 = e4*e2
+    cdef double e8 = e6*e2
+    cdef double e10 = e8*e2
+    cdef double e12 = e10*e2
+    cdef double e14 = e12*e2
+    
+    cdef double sqrt_3 = sqrt(3)
+    cdef double sqrt_5 = sqrt(5)
+    cdef double sqrt_6 = sqrt(6)
+    cdef double sqrt_7 = sqrt(7)
+    cdef double sqrt_8 = sqrt(8)
+    cdef double sqrt_10 = sqrt(10)
+    cdef double sqrt_12 = sqrt(12)
+    cdef double sqrt_14 = sqrt(14)
+    
+    cdef double den1 = sqrt(1 + e2)
+    cdef double den2 = 1 - e2
+    cdef double den3 = sqrt(1 + e2 + e4)
+    cdef double den4 = sqrt((1 - e2)**2 * (1 + e2) * (1 + 4 * e2 + e4))
+    cdef double den5 = sqrt(1 + e2 + e4 + e6)
+    cdef double den6 = (1 - e2)**2
+    
+    cdef double den7 = (1 - e2)**3 * (1 + e2 + e4)
+    cdef double num7 = sqrt((1 - e2)**4 * (1 + e2 + e4) /
+                   (1 + 4 * e2 + 10 * e4 + 4 * e6 + e8))
+    
+    cdef double den8 = sqrt(1 + e2 + e4 + e6 + e8)
+    
+    cdef double den9 = (1 - e2)**3 * (1 + 4 * e2 + e4)
+    cdef double num9E = sqrt((1 - e2)**2 * (1 + 4 * e2 + e4) /
+                    (1 + 9 * e2 + 9 * e4 + e6))
+    
+    cdef double den10 = (1 - e2)**4 * (1 + e2) * (1 + e4)
+    cdef double num10E = sqrt((1 - e2)**6 * (1 + e2) * (1 + e4) /
+                     (1 + 4 * e2 + 10 * e4 + 20 * e6 + 10 * e8 + 4 * e10 + e12))
+
+    cdef double den11 = sqrt(1 + e2 + e4 + e6 + e8 + e10)
+    cdef double den12 = (1 - e2)**3
+
+    cdef double num11a = 15 * (1 + 4*e2 + 10*e4 + 4*e6 + e8)
+    cdef double num11b = -20 * (1 + 4*e2 + 10*e4 + 10*e6 + 4*e8 + e10)
+    cdef double num11c = 6 * (1 + 4*e2 + 10*e4 + 20*e6 + 10*e8 +4*e10 + e12)
+    cdef double den13 = (1-e2)**2 * sqrt((1 + 4*e2 + 10*e4 + 4*e6 + e8) * (1 + 9*e2 + 45*e4 + 65*e6 + 45*e8 + 9*e10 + e12))
+
+    cdef double num12 = -5 * (1 - e12) / (1 - e10)
+    cdef double den14 = sqrt( 1 / (1-e2) * ( 36*(1-e14) - ( 35 * (1 - e12)**2 ) / (1 - e10) ) )
+
+    cdef double num13 = sqrt( (1 - e2) / (1 - e14) )
+   
+    # Parameter in loop
+    cdef double r, r2, r3, r4, r5, r6
+    cdef double t, t2, t3, t4, t5, t6    
+    cdef double s, s2, s3, s4, s5, s6
+    cdef double c, c2, c3, c4, c5, c6
+   
+    cdef double numQ, x_c, y_c, Rnl
+    cdef int ii
+    
+    for ii in prange(n, schedule="static", num_threads=_numThreads):
+        
+        x_c = x[ii]
+        y_c = y[ii]
+        
+        r2 = x_c**2 + y_c**2
+        r = sqrt(r2)
+        r3 = r2 * r
+        r4 = r2 * r2
+        r5 = r3 * r2
+        r6 = r3 * r3
+        
+        t = atan2(y_c, x_c)
+        s = sin(t)
+        c = cos(t)
+            
+        t2 = 2*t
+        t3 = 3*t
+        t4 = 4*t
+        t5 = 5*t
+        t6 = 6*t
+        
+        s2 = sin(t2)
+        c2 = cos(t2)
+        s3 = sin(t3)
+        c3 = cos(t3)
+        s4 = sin(t4)
+        c4 = cos(t4)
+        s5 = sin(t5)
+        c5 = cos(t5)
+        s6 = sin(t6)
+        c6 = cos(t6)
+        
+        S[ii] = 1 + 0 * x_c
+
+        Rnl = 2 * r / den1
+        if (nTerms > 1):
+            S[1*n + ii] = Rnl * c
+        if (nTerms > 2):
+            S[2*n + ii] = Rnl * s
+        
+        if (nTerms > 3):
+            S[3*n + ii] = sqrt_3 * (2 * r2 - 1 - e2) / den2
+        
+        Rnl = sqrt_6 * r2 / den3
+        if (nTerms > 4):
+            S[4*n + ii] = Rnl * s2
+        if (nTerms > 5):
+            S[5*n + ii] = Rnl * c2
+        
+        Rnl = sqrt_8 * (3 * r3 - 2 * r - 2 * e4 * r + e2 * r * (3 * r2 - 2)) / den4
+        if (nTerms > 6):
+            S[6*n + ii] = Rnl * s
+        if (nTerms > 7):
+            S[7*n + ii] = Rnl * c
+        
+        Rnl = sqrt_8 * r3 / den5
+        if (nTerms > 8):
+            S[8*n + ii] = Rnl * s3
+        if (nTerms > 9):
+            S[9*n + ii] = Rnl * c3
+        
+        if (nTerms > 10):
+            S[10*n + ii] = sqrt_5 * (6 * r4 - 6 * r2 + 1 +
+                              e4 + e2 * (4 - 6 * r2)) / den6
+    
+        Rnl = sqrt_10 * (4 * r4 - 3 * r2 - 3 * e6 * r2 - e2 * r2 * (3 - 4 * r2) -
+                         e4 * r2 * (3 - 4 * r2)) * num7 / den7
+        if (nTerms > 11):
+            S[11*n + ii] = Rnl * c2
+        if (nTerms > 12):
+            S[12*n + ii] = Rnl * s2
+
+        Rnl = sqrt_10 * r4 / den8
+        if (nTerms > 13):
+            S[13*n + ii] = Rnl * c4
+        if (nTerms > 14):
+            S[14*n + ii] = Rnl * s4
+
+        numQ = 10 * r5 - 12 * r3 + 3 * r + 3 * e8 * r - 12 * e6 * r * (r2 - 1) + \
+                2 * e4 * r * (15 - 24 * r2 + 5 * r4) + \
+                4 * e2 * r * (3 - 12 * r2 + 10 * r4)
+        Rnl = sqrt_12 * num9E * numQ / den9
+        if (nTerms > 15):
+            S[15*n + ii] = Rnl * c
+        if (nTerms > 16):
+            S[16*n + ii] = Rnl * s
+        
+        numQ = r3 * (5 * r2 - 4 - 4 * e8 - e2 * (4 - 5 * r2) -
+                     e4 * (4 - 5 * r2) - e6 * (4 - 5 * r2))
+        Rnl = sqrt_12 * num10E * numQ / den10
+        if (nTerms > 17):
+            S[17*n + ii] = Rnl * c3
+        if (nTerms > 18):
+            S[18*n + ii] = Rnl * s3
+        
+        Rnl = sqrt_12 * r5 / den11
+        if (nTerms > 19):
+            S[19*n + ii] = Rnl * c5
+        if (nTerms > 20):
+            S[20*n + ii] = Rnl * s5
+                
+        if (nTerms > 21):
+            S[21*n + ii] = sqrt_7 * (
+                      20 * r6 - 30 * r4 + 12 * r2 - 1 - e6 +
+                      3 * e4 * (-3 + 4 * r2) - 3 * e2 * (3 - 12 * r2 + 10 * r4)) / den12
+
+        Rnl = sqrt_14 * ( num11a*r6 + num11b*r4 + num11c*r2 ) / den13
+        if (nTerms > 22):
+            S[22*n + ii] = Rnl * s2
+        if (nTerms > 23):
+            S[23*n + ii] = Rnl * c2
+
+        Rnl = sqrt_14 * ( 6*r6 + num12*r4 ) / den14
+        if (nTerms > 24):
+            S[24*n + ii] = Rnl * s4
+        if (nTerms > 25):
+            S[25*n + ii] = Rnl * c4
+        
+        Rnl = sqrt_14 * num13 * r6
+        if (nTerms > 26):
+            S[26*n + ii] = Rnl * s6
+        if (nTerms > 27):
+            S[27*n + ii] = Rnl * c6
+
 def poly10_2D(ndarray[np.float64_t, ndim=1] c not None, ndarray[np.float64_t, 
                 ndim=1] x not None, ndarray[np.float64_t, ndim=1] y not None):
    
     cdef Py_ssize_t n = x.shape[0]  
     cdef ndarray[np.float64_t, ndim=1] cy_out = np.zeros_like(x) 
     
-    _poly10_2D(&cy_out[0], &c[0], &x[0], &y[0], n)
+    with nogil:
+        _poly10_2D(&cy_out[0], &c[0], &x[0], &y[0], n)
 
     return cy_out
         
-cdef _poly10_2D(double *cy_out, double *c, double *x, double *y, int n):
+cdef void _poly10_2D(double *cy_out, double *c, double *x, double *y, int n) noexcept nogil:
     
     cdef double x_c, y_c
     cdef int ii
     
-    for ii in range(n):
+    for ii in prange(n, schedule="static", num_threads=_numThreads):
         x_c = x[ii]
         y_c = y[ii]
         cy_out[ii] = c[0] + c[1] * x_c + c[2] * y_c + c[3] * x_c * x_c + \
@@ -889,17 +1633,20 @@ def poly10Grad(ndarray[np.float64_t, ndim=1] c not None, ndarray[np.float64_t,
     cdef Py_ssize_t n = x.shape[0]  
     cdef ndarray[np.float64_t, ndim=1] cy_out = np.zeros_like(x)
     
-    _poly10Grad(&cy_out[0], &c[0], &x[0], &y[0], axis, n)
+    cdef int axisCode = _getCode(axis, _AXIS)
+
+    with nogil:
+        _poly10Grad(&cy_out[0], &c[0], &x[0], &y[0], axisCode, n)
     
     return cy_out
     
-cdef _poly10Grad(double *cy_out, double *c, double *x, double *y, str axis, int n):
+cdef void _poly10Grad(double *cy_out, double *c, double *x, double *y, int axis, int n) noexcept nogil:
     
     cdef double x_c, y_c
     cdef int ii
     
-    if (axis == "dx"):
-        for ii in range(n):
+    if (axis == AXIS_DX):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             x_c = x[ii]
             y_c = y[ii]
             cy_out[ii] = c[1] + c[3] * 2 * x_c + c[4] * y_c + c[6] * 3 * x_c**2 + \
@@ -927,8 +1674,8 @@ cdef _poly10Grad(double *cy_out, double *c, double *x, double *y, str axis, int
                          c[58] * 7 * x_c**6 * y_c**3 + c[59] * 6 * x_c**5 * y_c**4 + \
                          c[60] * 5 * x_c**4 * y_c**5 + c[61] * 4 * x_c**3 * y_c**6 + \
                          c[62] * 3 * x_c**2 * y_c**7 + c[63] * 2 * x_c * y_c**8 + c[64] * y_c**9
-    elif (axis == "dy"):
-        for ii in range(n):
+    elif (axis == AXIS_DY):
+        for ii in prange(n, schedule="static", num_threads=_numThreads):
             x_c = x[ii]
             y_c = y[ii]
             cy_out[ii] = c[2] + c[4] * x_c + c[5] * 2 * y_c + c[7] * x_c**2 + \
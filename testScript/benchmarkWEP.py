@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+# This script is to benchmark the cwfs solver and the pipeline functions that run without the
+# LSST DM stack. The results are appended to a JSON history to compare with the previous runs.
+
+import os, io, time, json, argparse, platform, subprocess
+from contextlib import redirect_stdout
+from datetime import datetime
+import numpy as np
+
+from lsst.ts.wep.WFEstimator import WFEstimator
+from lsst.ts.wep.cwfs.Tool import ZernikeAnnularGrad, ZernikeAnnularJacobian, \
+                                  ZernikeAnnularEvalBasis
+from lsst.ts.wep.cwfs.lib.cyMath import poly10_2D, poly10Grad
+from lsst.ts.wep.deblend.AdapThresImage import AdapThresImage
+from lsst.ts.wep.deblend.BlendedImageDecorator import BlendedImageDecorator
+from lsst.ts.wep.bsc.StarData import StarData
+from lsst.ts.wep.Utility import getModulePath
+
+# Test images of each optical model: (image folder, image name, fieldXY in degree)
+TEST_IMAGE = {"paraxial": ("F1.23_1mm_v61", "z7_0.25_", 0),
+              "onAxis": ("LSST_C_SN26", "z7_0.25_", 0),
+              "offAxis": ("LSST_NE_SN25", "z11_0.25_", 1.185)}
+
+def _getWfsEst(modulePath, solver, opticalModel):
+    """
+
+    Get the configured wavefront estimator and the intra- and extra-focal images.
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+        solver {[str]} -- Poisson solver. It can be "exp", "fft", or "dct".
+        opticalModel {[str]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
+
+    Returns:
+        [WFEstimator] -- Configured wavefront estimator.
+        [ndarray] -- Intra-focal image.
+        [ndarray] -- Extra-focal image.
+        [list] -- Field x, y in degree.
+    """
+
+    wfsEst = WFEstimator(os.path.join(modulePath, "algoData", "cwfs", "instruData"),
+                         os.path.join(modulePath, "algoData", "cwfs", "algo"))
+    wfsEst.config(solver=solver, opticalModel=opticalModel)
+
+    imageFolderName, imageName, fieldXY = TEST_IMAGE[opticalModel]
+    imageFolderPath = os.path.join(modulePath, "test", "testImages", imageFolderName)
+    fieldXY = [fieldXY, fieldXY]
+    wfsEst.setImg(fieldXY, imageFile=os.path.join(imageFolderPath, imageName + "intra.txt"),
+                  defocalType="intra")
+    wfsEst.setImg(fieldXY, imageFile=os.path.join(imageFolderPath, imageName + "extra.txt"),
+                  defocalType="extra")
+
+    return wfsEst, wfsEst.ImgIntra.image.copy(), wfsEst.ImgExtra.image.copy(), fieldXY
+
+def _setupRunIt(modulePath, solver, opticalModel):
+    """
+
+    Set up the benchmark of Algorithm.runIt() through WFEstimator.calWfsErr().
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+        solver {[str]} -- Poisson solver. It can be "exp", "fft", or "dct".
+        opticalModel {[str]} -- Optical model. It can be "paraxial", "onAxis", or "offAxis".
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    wfsEst, intraImg, extraImg, fieldXY = _getWfsEst(modulePath, solver, opticalModel)
+
+    def run():
+        wfsEst.setImg(fieldXY, image=intraImg, defocalType="intra")
+        wfsEst.setImg(fieldXY, image=extraImg, defocalType="extra")
+        wfsEst.reset()
+        wfsEst.calWfsErr()
+
+    return run
+
+def _setupCompensate(modulePath):
+    """
+
+    Set up the benchmark of CompensationImageDecorator.compensate() with the off-axis model.
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    # Run the estimation once to get the masks, off-axis correction, and Zk to compensate
+    wfsEst, intraImg, extraImg, fieldXY = _getWfsEst(modulePath, "exp", "offAxis")
+    wfsEst.calWfsErr()
+    zcomp = wfsEst.algo.zcomp.copy()
+
+    img = wfsEst.ImgIntra
+    def run():
+        img.updateImage(img.image0.copy())
+        img.compensate(wfsEst.inst, wfsEst.algo, zcomp, wfsEst.opticalModel)
+
+    return run
+
+def _setupCyMath():
+    """
+
+    Set up the benchmark of cyMath kernels on the 120x120 grid.
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    xx, yy = np.meshgrid(np.linspace(-1, 1, 120), np.linspace(-1, 1, 120))
+    x = xx.ravel()
+    y = yy.ravel()
+    Z = np.random.RandomState(0).rand(22)
+    c = np.random.RandomState(1).rand(66)
+
+    def run():
+        ZernikeAnnularGrad(Z, x, y, 0.61, "dx")
+        ZernikeAnnularJacobian(Z, x, y, 0.61, "1st")
+        ZernikeAnnularEvalBasis(x, y, 0.61, 22)
+        poly10_2D(c, x, y)
+        poly10Grad(c, x, y, "dx")
+
+    return run
+
+def _setupGetCenterAndR(modulePath):
+    """
+
+    Set up the benchmark of Image.getCenterAndR_ef().
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    img = AdapThresImage()
+    img.setImg(imageFile=os.path.join(modulePath, "test", "testImages", "LSST_NE_SN25",
+                                      "z11_0.25_intra.txt"))
+
+    def run():
+        # Bump the image version, so each run recomputes instead of hitting the memo
+        img.updateImage(img.image)
+        img.getCenterAndR_ef(checkEntropy=True)
+
+    return run
+
+def _setupDeblend(modulePath):
+    """
+
+    Set up the benchmark of deblending the synthetic blended donut generated by
+    AdapThresImage.generateMultiDonut().
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    img = AdapThresImage()
+    img.setImg(imageFile=os.path.join(modulePath, "test", "testImages", "LSST_NE_SN25",
+                                      "z11_0.25_intra.txt"))
+    image, imageMain, imageNeighbor, neighborX, neighborY = img.generateMultiDonut(1.3, 0.1, 0.0)
+
+    def run():
+        blendImage = BlendedImageDecorator()
+        blendImage.setImg(image=image)
+        blendImage.deblendDonut([neighborX, neighborY], 0.1)
+
+    return run
+
+def _setupGetNeighboringStar(numOfStar=20000, numOfCandidate=500):
+    """
+
+    Set up the benchmark of StarData.getNeighboringStar() on the synthetic stars in a
+    4k x 4k sensor.
+
+    Keyword Arguments:
+        numOfStar {[int]} -- Number of stars. (default: {20000})
+        numOfCandidate {[int]} -- Number of candidate stars. (default: {500})
+
+    Returns:
+        [function] -- Function to benchmark.
+    """
+
+    randState = np.random.RandomState(0)
+    mag = (randState.rand(numOfStar)*10 + 10).tolist()
+    stars = StarData(list(range(numOfStar)), randState.rand(numOfStar).tolist(),
+                     randState.rand(numOfStar).tolist(), mag, mag, mag, mag, mag, mag)
+    stars.populateRAData((randState.rand(numOfStar)*4000).tolist())
+    stars.populateDeclData((randState.rand(numOfStar)*4000).tolist())
+    indexCandidate = list(range(numOfCandidate))
+
+    def run():
+        stars.getNeighboringStar(indexCandidate, 160, "r", 99)
+
+    return run
+
+def getBenchmarkCase(modulePath):
+    """
+
+    Get the benchmark cases. The setup of case is only done when the case is run.
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+
+    Returns:
+        [list] -- Benchmark cases in (case name, function to set up the case).
+    """
+
+    caseList = []
+    for solver in ("exp", "fft"):
+        for opticalModel in ("paraxial", "onAxis", "offAxis"):
+            caseList.append(("runIt.%s.%s" % (solver, opticalModel),
+                             lambda solver=solver, opticalModel=opticalModel:
+                                 _setupRunIt(modulePath, solver, opticalModel)))
+
+    caseList += [("compensate.offAxis", lambda: _setupCompensate(modulePath)),
+                 ("cyMath", _setupCyMath),
+                 ("getCenterAndR_ef", lambda: _setupGetCenterAndR(modulePath)),
+                 ("deblendDonut", lambda: _setupDeblend(modulePath)),
+                 ("getNeighboringStar", _setupGetNeighboringStar)]
+
+    return caseList
+
+def runBenchmark(caseList, numOfRun=5, seed=0):
+    """
+
+    Run the benchmark cases.
+
+    Arguments:
+        caseList {[list]} -- Benchmark cases in (case name, function to set up the case).
+
+    Keyword Arguments:
+        numOfRun {[int]} -- Number of timed runs of each case after one warm-up run.
+                            (default: {5})
+        seed {[int]} -- Seed of random number before each run. (default: {0})
+
+    Returns:
+        [dict] -- Best, median, and mean wall time in second of each case.
+    """
+
+    result = dict()
+    for caseName, setupFunc in caseList:
+
+        # Do not show the information in the functions
+        with redirect_stdout(io.StringIO()):
+            np.random.seed(seed)
+            run = setupFunc()
+
+            # Warm up the caches
+            np.random.seed(seed)
+            run()
+
+            wallTime = []
+            for ii in range(numOfRun):
+                np.random.seed(seed)
+                startTime = time.perf_counter()
+                run()
+                wallTime.append(time.perf_counter() - startTime)
+
+        result[caseName] = {"best": float(np.min(wallTime)),
+                            "median": float(np.median(wallTime)),
+                            "mean": float(np.mean(wallTime)),
+                            "numOfRun": numOfRun}
+
+    return result
+
+def getEnvironment(modulePath):
+    """
+
+    Get the environment of benchmark to compare the results.
+
+    Arguments:
+        modulePath {[str]} -- Path of WEP module.
+
+    Returns:
+        [dict] -- Environment of benchmark.
+    """
+
+    try:
+        gitCommit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=modulePath,
+                                            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        gitCommit = None
+
+    return {"time": datetime.now().isoformat(timespec="seconds"),
+            "gitCommit": gitCommit,
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "numOfCpu": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__}
+
+def readHistory(filePath):
+    """
+
+    Read the benchmark history.
+
+    Arguments:
+        filePath {[str]} -- Path of JSON history file.
+
+    Returns:
+        [list] -- Benchmark records. It is empty if there is no file.
+    """
+
+    if (not os.path.isfile(filePath)):
+        return []
+
+    with open(filePath) as fid:
+        return json.load(fid)
+
+def writeHistory(filePath, history):
+    """
+
+    Write the benchmark history.
+
+    Arguments:
+        filePath {[str]} -- Path of JSON history file.
+        history {[list]} -- Benchmark records.
+    """
+
+    with open(filePath, "w") as fid:
+        json.dump(history, fid, indent=2)
+
+def compareResult(result, refResult):
+    """
+
+    Compare the benchmark result with the reference one.
+
+    Arguments:
+        result {[dict]} -- Benchmark result.
+        refResult {[dict]} -- Reference benchmark result.
+
+    Returns:
+        [dict] -- Ratio of best wall time to the reference of each common case.
+    """
+
+    return {caseName: result[caseName]["best"]/refResult[caseName]["best"]
+            for caseName in result if caseName in refResult}
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the cwfs solver and pipeline.")
+    parser.add_argument("--history", default="benchmarkHistory.json",
+                        help="JSON history file to append the result.")
+    parser.add_argument("--numOfRun", type=int, default=5, help="Number of timed runs.")
+    parser.add_argument("--case", default="",
+                        help="Only run the cases whose names contain this string.")
+    parser.add_argument("--noSave", action="store_true", help="Do not append to the history.")
+    args = parser.parse_args()
+
+    # Get the path of module
+    modulePath = getModulePath()
+
+    # Run the benchmark
+    caseList = [case for case in getBenchmarkCase(modulePath) if args.case in case[0]]
+    result = runBenchmark(caseList, numOfRun=args.numOfRun)
+
+    # Compare with the previous record in the same host
+    history = readHistory(args.history)
+    environment = getEnvironment(modulePath)
+    refRecord = None
+    for record in reversed(history):
+        if (record["environment"]["host"] == environment["host"]):
+            refRecord = record
+            break
+    ratio = compareResult(result, refRecord["result"]) if (refRecord is not None) else dict()
+
+    print("%-24s %10s %10s %8s" % ("case", "best (s)", "median (s)", "ratio"))
+    for caseName, stat in result.items():
+        ratioStr = "%8.2f" % ratio[caseName] if (caseName in ratio) else "%8s" % "-"
+        print("%-24s %10.4f %10.4f %s" % (caseName, stat["best"], stat["median"], ratioStr))
+
+    # Append the result to the history
+    if (not args.noSave):
+        history.append({"environment": environment, "result": result})
+        writeHistory(args.history, history)
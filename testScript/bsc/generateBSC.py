@@ -69,6 +69,9 @@ if __name__ == "__main__":
     # Connect to database
     brightStarDatabase.connect(databaseHost,databaseUser, databasePassword, databaseName)
     bscDatabase.connect(dbAdress)
+
+    # Reduce the disk writes for the offline build
+    bscDatabase.setBulkInsertPragma()
     
     t0 = time.time()
     # Generate the local database
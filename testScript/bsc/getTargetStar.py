@@ -76,7 +76,7 @@ def getTargetStar(database, tableName, camera, RA, Dec, cameraRotation, cameraMJ
         stars = database.query(tableName, cameraFilter, wavefrontSensor[0], wavefrontSensor[1], 
                                wavefrontSensor[2], wavefrontSensor[3])
 
-        starsQueried = len(stars.RA)
+        starsQueried = stars.getNumOfStar()
         print("\t\tStars queried: %d" % starsQueried)
         
         # Populate detector information for the stars
@@ -89,7 +89,7 @@ def getTargetStar(database, tableName, camera, RA, Dec, cameraRotation, cameraMJ
         camera.removeStarsNotOnDetectorSimple(stars, obs, offset)
         starMap[detector] = stars
         
-        starsOnDetector = len(stars.RA)
+        starsOnDetector = stars.getNumOfStar()
         print("\t\tStars on detector: %d" % starsOnDetector)
     
         # Check the candidate of bright stars based on the magnitude
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# This script is to add the spatial index and unique index of (ra, decl) to the bright star
+# catalog tables in the existed local database, which are created by
+# LocalDatabaseDecorator.createTable() for the new tables already.
+
+import sys, sqlite3, argparse
+from lsst.ts.wep.LocalDatabaseDecorator import LocalDatabaseDecorator
+
+def migrateBscIndex(dbAdress, tableNameList=None, drop=False, removeDuplicate=False):
+    """
+
+    Create (or drop) the spatial index and unique index of bright star catalog tables in the
+    local database.
+
+    Arguments:
+        dbAdress {[str]} -- Path of local sqlite3 database.
+
+    Keyword Arguments:
+        tableNameList {[list]} -- Table names. Use "BrightStarCatalog" with all filters in the
+                                  database if None. (default: {None})
+        drop {[bool]} -- Drop the indexes instead. (default: {False})
+        removeDuplicate {[bool]} -- Remove the duplicated stars except the one with the
+                                    smallest id to create the unique index. (default: {False})
+
+    Returns:
+        [list] -- Tables changed.
+
+    Raises:
+        ValueError -- There are duplicated stars in the table and removeDuplicate is False.
+                      The tables before it are migrated already and this table is not changed.
+    """
+
+    db = LocalDatabaseDecorator()
+    db.connect(dbAdress)
+
+    try:
+        if (tableNameList is None):
+            tableNameList = ["BrightStarCatalog" + aFilter.upper() for aFilter in
+                             (db.FilterU, db.FilterG, db.FilterR, db.FilterI, db.FilterZ,
+                              db.FilterY)]
+
+        changedTableList = []
+        for tableName in tableNameList:
+
+            if (not db.checkTableInDb(tableName)):
+                continue
+
+            if (drop):
+                db.dropSpatialIndex(tableName)
+                db.dropUniqueIndex(tableName)
+                changedTableList.append(tableName)
+
+            else:
+                # Create the unique index first to find the duplicated stars before the
+                # spatial index is built
+                try:
+                    isCreated = db.createUniqueIndex(tableName, removeDuplicate=removeDuplicate)
+                except sqlite3.IntegrityError:
+                    raise ValueError("There are duplicated stars in '%s'. " % tableName +
+                                     "Use --dedup to remove them.")
+
+                isCreated = db.createSpatialIndex(tableName) or isCreated
+                if (isCreated):
+                    changedTableList.append(tableName)
+
+    finally:
+        db.disconnect()
+
+    return changedTableList
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Add the indexes to the local bright star catalog.")
+    parser.add_argument("dbAdress", help="Path of local database.")
+    parser.add_argument("--table", nargs="+", default=None,
+                        help="Table names. All BrightStarCatalog tables by default.")
+    parser.add_argument("--drop", action="store_true",
+                        help="Drop the indexes instead.")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Remove the duplicated stars to create the unique index.")
+    args = parser.parse_args()
+
+    try:
+        changedTableList = migrateBscIndex(args.dbAdress, tableNameList=args.table,
+                                           drop=args.drop, removeDuplicate=args.dedup)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    for tableName in changedTableList:
+        print(tableName)
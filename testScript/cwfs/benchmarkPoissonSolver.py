@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# This script is to benchmark the Poisson solvers ("exp", "fft", and "dct") on the test images.
+
+import os, io, time
+from contextlib import redirect_stdout
+import numpy as np
+from runWEP import runWEP, getStampFileName
+from lsst.ts.wep.Utility import getModulePath
+
+# Test images: (image folder, image name, fieldXY in degree, optical model)
+TEST_CASE = [("LSST_NE_SN25", "z11_0.25_", 1.185, "offAxis"),
+             ("F1.23_1mm_v61", "z7_0.25_", 0, "paraxial"),
+             ("LSST_C_SN26", "z7_0.25_", 0, "onAxis")]
+
+def benchmarkPoissonSolver(instruFolder, algoFolderPath, instruName, imageFolder, validationDir,
+                           solvers=("exp", "fft", "dct"), numOfRun=1, seed=0):
+    """
+
+    Run the wavefront estimation with each Poisson solver on the test images, and compare the
+    wall time and the difference with the validation data.
+
+    Arguments:
+        instruFolder {[string]} -- Path to instrument folder.
+        algoFolderPath {[string]} -- Path to algorithm folder.
+        instruName {[string]} -- Instrument name. It is "lsst" in the baseline.
+        imageFolder {[string]} -- Path to the folder of test images.
+        validationDir {[string]} -- Path to the folder of validation data.
+
+    Keyword Arguments:
+        solvers {[tuple]} -- Poisson solvers to benchmark. (default: {("exp", "fft", "dct")})
+        numOfRun {[int]} -- Number of runs to get the best wall time. (default: {1})
+        seed {[int]} -- Seed of random number used in the image centroid. (default: {0})
+
+    Returns:
+        [list] -- Benchmark result of each case in (image folder, solver, wall time in second,
+                  dict of RMS difference in nm with the validation data of each solver).
+    """
+
+    result = []
+    for imageFolderName, imageName, fieldXY, opticalModel in TEST_CASE:
+        for solver in solvers:
+
+            # Take the best wall time of runs
+            wallTime = np.inf
+            for ii in range(numOfRun):
+                np.random.seed(seed)
+                startTime = time.time()
+
+                # Do not show the Zk of each run
+                imageFolderPath = os.path.join(imageFolder, imageFolderName)
+                with redirect_stdout(io.StringIO()):
+                    zer4UpNm = runWEP(instruFolder, algoFolderPath, instruName, solver,
+                                      imageFolderPath,
+                                      getStampFileName(imageFolderPath, imageName + "intra"),
+                                      getStampFileName(imageFolderPath, imageName + "extra"),
+                                      [[fieldXY, fieldXY], [fieldXY, fieldXY]], opticalModel)
+                wallTime = min(wallTime, time.time() - startTime)
+
+            # Compare with the available validation data
+            rms = dict()
+            for refSolver in ("exp", "fft"):
+                refFilePath = os.path.join(validationDir, "%s_%s%s.txt" % (imageFolderName,
+                                                                           imageName, refSolver))
+                if (os.path.isfile(refFilePath)):
+                    rms[refSolver] = np.sqrt(np.mean((zer4UpNm - np.loadtxt(refFilePath))**2))
+
+            result.append((imageFolderName, solver, wallTime, rms))
+
+    return result
+
+if __name__ == "__main__":
+
+    # Get the path of module
+    modulePath = getModulePath()
+
+    # Information of benchmark
+    instruFolder = os.path.join(modulePath, "algoData", "cwfs", "instruData")
+    algoFolderPath = os.path.join(modulePath, "algoData", "cwfs", "algo")
+    instruName = "lsst"
+    imageFolder = os.path.join(modulePath, "test", "testImages")
+    validationDir = os.path.join(imageFolder, "validation")
+
+    # Run the benchmark and show the result
+    result = benchmarkPoissonSolver(instruFolder, algoFolderPath, instruName, imageFolder,
+                                    validationDir, numOfRun=3)
+
+    print("%-15s %-6s %10s   %s" % ("image", "solver", "time (s)", "RMS difference (nm)"))
+    for imageFolderName, solver, wallTime, rms in result:
+        rmsStr = ", ".join(["%s: %.2f" % (key, value) for key, value in sorted(rms.items())])
+        print("%-15s %-6s %10.3f   %s" % (imageFolderName, solver, wallTime, rmsStr))
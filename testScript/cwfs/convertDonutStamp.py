@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# This script is to convert the text donut stamps to the binary stamps (".npy"), which are
+# memory-mapped by Image.setImg() instead of parsing the text.
+
+import os, argparse
+from lsst.ts.wep.cwfs.Image import convertImgFileToNpy
+from lsst.ts.wep.Utility import getModulePath
+
+def convertDonutStamp(imageFolder, overwrite=False):
+    """
+
+    Convert the intra- and extra-focal text stamps ("*_intra.txt" and "*_extra.txt") in the
+    folder and its subfolders to the binary stamps next to them.
+
+    Arguments:
+        imageFolder {[string]} -- Path to the folder of donut stamps.
+
+    Keyword Arguments:
+        overwrite {[bool]} -- Convert the stamp even if the binary stamp is newer than the
+                              text one. (default: {False})
+
+    Returns:
+        [list] -- Paths of converted binary stamps.
+    """
+
+    npyFilePathList = []
+    for dirPath, dirNames, fileNames in os.walk(imageFolder):
+        for fileName in sorted(fileNames):
+
+            # Only the donut stamps are converted
+            if (not fileName.endswith(("_intra.txt", "_extra.txt"))):
+                continue
+
+            imageFile = os.path.join(dirPath, fileName)
+            npyFilePath = os.path.splitext(imageFile)[0] + ".npy"
+            if (not overwrite and os.path.isfile(npyFilePath) and
+                    os.path.getmtime(npyFilePath) >= os.path.getmtime(imageFile)):
+                continue
+
+            npyFilePathList.append(convertImgFileToNpy(imageFile, npyFilePath=npyFilePath))
+
+    return npyFilePathList
+
+if __name__ == "__main__":
+
+    # Get the path of module
+    modulePath = getModulePath()
+
+    parser = argparse.ArgumentParser(description="Convert the text donut stamps to .npy.")
+    parser.add_argument("imageFolder", nargs="?",
+                        default=os.path.join(modulePath, "test", "testImages"),
+                        help="Folder of donut stamps.")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Convert the stamps that are up to date.")
+    args = parser.parse_args()
+
+    for npyFilePath in convertDonutStamp(args.imageFolder, overwrite=args.overwrite):
+        print(npyFilePath)
@@ -81,6 +81,26 @@ def runWEP(instruFolder, algoFolderPath, instruName, useAlgorithm, imageFolderPa
     # Return the Zernikes Zn (n>=4)
     return algo.zer4UpNm
 
+def getStampFileName(imageFolderPath, imageName):
+    """
+    
+    Get the file name of donut stamp. The binary stamp (".npy") converted by 
+    convertDonutStamp.py is used if it exists, which avoids parsing the text file.
+    
+    Arguments:
+        imageFolderPath {[string]} -- Path to image folder.
+        imageName {[string]} -- Image name without the file extension such as "z7_0.25_intra".
+    
+    Returns:
+        [string] -- File name of donut stamp.
+    """
+
+    npyFileName = imageName + ".npy"
+    if (os.path.isfile(os.path.join(imageFolderPath, npyFileName))):
+        return npyFileName
+    else:
+        return imageName + ".txt"
+
 def __outParam(algo, inst, I1, I2, opticalModel, filename=None):
     """
     
@@ -5,7 +5,7 @@
 import os, time, unittest
 import os
 import numpy as np
-from runWEP import runWEP
+from runWEP import runWEP, getStampFileName
 from lsst.ts.wep.Utility import getModulePath
 
 class TestFile(object): 
@@ -31,8 +31,8 @@ class DataWEP(object):
         self.instruName = InstruName
         self.useAlgorithm = TestFile.useAlgorithm
         self.imageFolderPath = os.path.join(ImageFolder,TestFile.imageFolderName)
-        self.intra_image_name = TestFile.imageName + "intra.txt"
-        self.extra_image_name = TestFile.imageName + "extra.txt"
+        self.intra_image_name = getStampFileName(self.imageFolderPath, TestFile.imageName + "intra")
+        self.extra_image_name = getStampFileName(self.imageFolderPath, TestFile.imageName + "extra")
         self.fieldXY = TestFile.fieldXY
         self.orientation = TestFile.orientation
         self.refFilePath = TestFile.refFilePath